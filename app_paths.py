@@ -0,0 +1,19 @@
+import os
+import sys
+
+# 指定程序目录的环境变量（基准测试和测试使用临时目录，不在源代码目录中写入缓存文件）
+APP_DIR_ENV = "DMCONTROL_APP_DIR"
+
+def get_app_dir():
+    """程序运行目录：环境变量 DMCONTROL_APP_DIR 指定的目录、打包后的可执行文件所在目录，或脚本所在目录"""
+    if os.environ.get(APP_DIR_ENV):
+        return os.environ[APP_DIR_ENV]
+    if hasattr(sys, 'frozen'):
+        # 如果是打包后的可执行文件，使用可执行文件所在目录
+        return os.path.dirname(os.path.abspath(sys.executable))
+    # 如果是脚本模式运行，使用脚本所在目录
+    return os.path.dirname(os.path.abspath(__file__))
+
+def app_path(filename):
+    """程序运行目录下的文件路径（配置文件、缓存文件等）"""
+    return os.path.join(get_app_dir(), filename)
@@ -0,0 +1,248 @@
+"""常驻后端进程：通过按行分隔的JSON协议处理设备查询和操作请求
+
+请求:  {"id": 1, "op": "status", "device_id": "USB\\VID_174C&PID_1153\\..."}
+       {"id": 2, "op": "disable", "device_id": "...", "confirm_timeout": 15}
+响应:  {"id": 1, "ok": true, "result": false}
+       {"id": 1, "ok": false, "error": "..."}
+
+支持的操作: ping, enumerate, list_usb, find, status, statuses, enable, disable, invalidate, metrics, events, health
+statuses 带 device_ids 参数，从同一个快照中查询多个设备，返回 {设备ID: 状态字典（带description）或null}
+enable/disable 带 confirm_timeout 时等待设备进入目标状态，结果为 TransitionResult 的字典
+events 带 since 参数，返回后端进程的快照比较得到的、序号大于 since 的设备插拔事件
+health 返回后端进程中未处于正常状态的熔断器（为空表示pnputil/devcon正常）
+客户端可以连续发送多个请求而不等待响应（流水线），响应按完成顺序返回，通过id对应
+"""
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import asdict
+
+from command_runner import backend_health
+from device_backend import disable_device, enable_device, find_devices_by_partial_id, list_all_usb_devices
+from device_dashboard import collect_statuses
+from device_inventory import DeviceInventory
+from device_transition import control_and_confirm
+from device_watch import HotplugMonitor
+from metrics import metrics
+
+# 启动常驻后端进程的命令行参数
+WORKER_FLAG = "--backend-worker"
+# 设备清单快照有效期（秒），由主程序通过环境变量传给后端进程（config.json中的 "inventory_ttl"）
+INVENTORY_TTL_ENV = "DMCONTROL_INVENTORY_TTL"
+DEFAULT_INVENTORY_TTL = 5.0
+
+class BackendWorkerError(Exception):
+    """后端进程返回错误或已退出"""
+
+def _handle_request(inventory, request, monitor=None):
+    """在后端进程中执行单个请求，返回结果"""
+    op = request.get("op")
+    device_id = request.get("device_id", "")
+
+    if op == "ping":
+        return os.getpid()
+    if op == "enumerate":
+        devices = inventory.snapshot() or {}
+        return [dict(asdict(record), state=record.state.value) for record in devices.values()]
+    if op == "list_usb":
+        return list_all_usb_devices()
+    if op == "find":
+        return find_devices_by_partial_id(device_id, inventory)
+    if op == "status":
+        status = inventory.query_status(device_id)
+        return None if status is None else status.to_dict()
+    if op == "statuses":
+        statuses = collect_statuses(inventory, request.get("device_ids", []))
+        if statuses is None:
+            raise RuntimeError("无法枚举设备")
+        return {device_id: None if status is None else dict(status.to_dict(), description=description)
+                for device_id, (status, description) in statuses.items()}
+    if op in ("enable", "disable"):
+        confirm_timeout = request.get("confirm_timeout")
+        if confirm_timeout:
+            result = asdict(control_and_confirm(device_id, op, confirm_timeout))
+        else:
+            result = enable_device(device_id) if op == "enable" else disable_device(device_id)
+        inventory.invalidate()
+        return result
+    if op == "invalidate":
+        inventory.invalidate()
+        return True
+    if op == "metrics":
+        return metrics.snapshot()
+    if op == "health":
+        return backend_health()
+    if op == "events":
+        events = monitor.events_since(request.get("since", 0)) if monitor is not None else []
+        return [asdict(event) for event in events]
+    raise ValueError(f"未知的操作: {op}")
+
+def _inventory_ttl_from_env():
+    try:
+        return float(os.environ.get(INVENTORY_TTL_ENV, "") or DEFAULT_INVENTORY_TTL)
+    except ValueError:
+        return DEFAULT_INVENTORY_TTL
+
+def serve(stdin=None, stdout=None, inventory_ttl=None, max_workers=4):
+    """后端进程主循环：读取请求，并发处理，写回响应，stdin关闭时退出
+
+    inventory_ttl 为None时使用环境变量 DMCONTROL_INVENTORY_TTL，没有时为5秒
+    """
+    if inventory_ttl is None:
+        inventory_ttl = _inventory_ttl_from_env()
+    stdin = stdin or io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    stdout = stdout or io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", line_buffering=True)
+    inventory = DeviceInventory(ttl=inventory_ttl)
+    monitor = HotplugMonitor()
+    monitor.attach(inventory)
+    write_lock = threading.Lock()
+
+    def respond(response):
+        line = json.dumps(response, ensure_ascii=False)
+        with write_lock:
+            stdout.write(line + "\n")
+            stdout.flush()
+
+    def process(request):
+        try:
+            result = _handle_request(inventory, request, monitor)
+            respond({"id": request.get("id"), "ok": True, "result": result})
+        except Exception as e:
+            respond({"id": request.get("id"), "ok": False, "error": str(e)})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for line in stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                respond({"id": None, "ok": False, "error": f"无效的请求: {e}"})
+                continue
+            executor.submit(process, request)
+
+def worker_command():
+    """启动后端进程的命令：打包后的程序使用自身可执行文件，脚本模式运行本模块"""
+    if hasattr(sys, 'frozen'):
+        return [sys.executable, WORKER_FLAG]
+    return [sys.executable, os.path.abspath(__file__)]
+
+class BackendWorkerClient:
+    """常驻后端进程的客户端，线程安全，支持流水线请求"""
+
+    def __init__(self, command=None, env=None):
+        self._command = command or worker_command()
+        self._env = env
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._process = None
+
+    def _ensure_started(self):
+        """后端进程未启动或已退出时（重新）启动，调用方需持有锁"""
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+
+        metrics.increment("spawns_total", tool="worker")
+        self._process = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            env=self._env,
+            # 避免打包后的窗口程序启动子进程时弹出控制台窗口
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        threading.Thread(target=self._read_responses, args=(self._process,), daemon=True).start()
+        return self._process
+
+    def _read_responses(self, process):
+        """读取后端进程的响应并交给对应请求的Future"""
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                _, future = self._pending.pop(response.get("id"), (None, None))
+            if future is None:
+                continue
+            if response.get("ok"):
+                future.set_result(response.get("result"))
+            else:
+                future.set_exception(BackendWorkerError(response.get("error", "未知错误")))
+
+        # 后端进程退出（或关闭了输出），发给该进程的所有未完成请求都失败，下一个请求启动新的后端进程
+        with self._lock:
+            if self._process is process:
+                self._process = None
+            lost = [request_id for request_id, (owner, _) in self._pending.items() if owner is process]
+            futures = [self._pending.pop(request_id)[1] for request_id in lost]
+        for future in futures:
+            future.set_exception(BackendWorkerError("后端进程已退出"))
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+    def submit(self, op, **params):
+        """发送请求但不等待结果，返回Future"""
+        return self._send(op, params)[1]
+
+    def _send(self, op, params):
+        """发送请求，返回 (请求id, Future)"""
+        future = Future()
+        with self._lock:
+            process = self._ensure_started()
+            request_id = next(self._ids)
+            self._pending[request_id] = (process, future)
+            try:
+                process.stdin.write(json.dumps({"id": request_id, "op": op, **params}, ensure_ascii=False) + "\n")
+                process.stdin.flush()
+            except OSError as e:
+                self._pending.pop(request_id, None)
+                future.set_exception(BackendWorkerError(f"无法发送请求: {e}"))
+        return request_id, future
+
+    def call(self, op, timeout=None, **params):
+        """发送请求并等待结果，超时时抛出 concurrent.futures.TimeoutError
+
+        超时的请求不再等待响应：从未完成的请求中移除，它的Future以 BackendWorkerError 结束，
+        后端进程之后返回的响应被丢弃，卡住的后端进程不会积累未完成的请求
+        """
+        request_id, future = self._send(op, params)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is not None:
+                future.set_exception(BackendWorkerError(f"请求超时: {op}"))
+            raise
+
+    def pending(self):
+        """尚未收到响应的请求数量"""
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        """关闭后端进程"""
+        with self._lock:
+            process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,85 @@
+"""多设备监控面板：每个周期一次枚举 vs 每个设备单独查询
+
+在合成的 pnputil 输出上通过假的 pnputil/devcon 运行，被监控的设备数量分别为 1、10、100、500，
+报告每个轮询周期的 p50 耗时和启动的进程数。逐个查询的方式（device_exists + get_device_state）
+每个设备至少启动2个进程，只在较小的设备数量上运行
+
+用法：python benchmarks/bench_dashboard.py [设备总数] [周期数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+# 缓存文件写入临时目录，不写入源代码目录
+os.environ.setdefault("DMCONTROL_APP_DIR", tempfile.mkdtemp(prefix="dmcontrol_bench_"))
+os.environ.setdefault("DMCONTROL_PNPUTIL", f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"')
+os.environ.setdefault("DMCONTROL_DEVCON", f'"{sys.executable}" "{os.path.join(HERE, "fake_devcon.py")}"')
+
+from device_backend import device_exists, get_device_state
+from device_dashboard import DeviceDashboard, collect_statuses
+from device_inventory import DeviceInventory
+from synthetic import synthetic_dump, synthetic_instance_ids
+
+MONITORED = (1, 10, 100, 500)
+# 逐个查询的方式只在不超过该数量时运行
+PER_DEVICE_LIMIT = 10
+
+def count_calls(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def measure(cycle, cycles, calls_path):
+    """预热一次后执行 cycles 个周期，返回 (p50毫秒, 每个周期的进程数)"""
+    cycle()
+    open(calls_path, "w").close()
+    latencies = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        cycle()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, count_calls(calls_path) / cycles
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    instance_ids = synthetic_instance_ids(total)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = os.path.join(workdir, "pnputil_enum.txt")
+        with open(fixture, "w", encoding="utf-8") as f:
+            f.write(synthetic_dump(total))
+        calls_path = os.path.join(workdir, "calls.txt")
+        os.environ["FAKE_PNPUTIL_FIXTURE"] = fixture
+        os.environ["FAKE_TOOL_CALLS"] = calls_path
+
+        print(f"设备总数: {total}, 每种方式 {cycles} 个周期")
+        for count in MONITORED:
+            # 均匀地选取被监控的设备
+            step = max(1, total // count)
+            device_ids = instance_ids[::step][:count]
+            inventory = DeviceInventory()
+            dashboard = DeviceDashboard([(device_id, "") for device_id in device_ids])
+
+            def dashboard_cycle():
+                # 模拟每个周期快照都已过期（最坏情况）：一次枚举，再从快照中查找所有设备
+                inventory.invalidate()
+                dashboard.apply(collect_statuses(inventory, device_ids))
+                dashboard.take_changes()
+
+            def per_device_cycle():
+                for device_id in device_ids:
+                    if device_exists(device_id):
+                        get_device_state(device_id)
+
+            p50, spawns = measure(dashboard_cycle, cycles, calls_path)
+            print(f"  监控 {count:4d} 个  一次枚举    p50 {p50:10.2f} ms   进程 {spawns:6.1f}/周期")
+            if count <= PER_DEVICE_LIMIT:
+                p50, spawns = measure(per_device_cycle, cycles, calls_path)
+                print(f"  监控 {count:4d} 个  逐个查询    p50 {p50:10.2f} ms   进程 {spawns:6.1f}/周期")
+
+if __name__ == "__main__":
+    main()
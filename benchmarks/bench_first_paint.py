@@ -0,0 +1,145 @@
+"""启动到第一次显示设备状态的时间（time-to-first-paint）：没有/有设备状态缓存时对比
+
+有图形界面环境时在子进程中创建主窗口（不请求管理员权限），由主窗口的子类记录第一次显示设备状态
+以及状态得到确认的时间，确认后关闭窗口；配置文件和缓存文件使用临时目录中的副本，不影响程序目录。
+没有图形界面环境时只测量显示所需的数据：读取缓存中的状态 vs 一次pnputil查询
+
+用法：python benchmarks/bench_first_paint.py [次数]
+默认通过 FAKE_PNPUTIL_LATENCY=1 模拟负载较高的机器
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from device_state import DeviceState, DeviceStatus
+from state_cache import DeviceStateCache
+
+DEVICE_ID = "USB\\VID_174C&PID_1153\\MSFT3023456789013B"
+
+ENV = dict(os.environ)
+# 缓存文件写入临时目录，不写入源代码目录
+ENV.setdefault("DMCONTROL_APP_DIR", tempfile.mkdtemp(prefix="dmcontrol_bench_"))
+ENV.setdefault("DMCONTROL_PNPUTIL", f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"')
+ENV.setdefault("FAKE_PNPUTIL_LATENCY", "1")
+
+# 使用临时的配置文件和缓存文件创建主窗口，把启动过程中的时间点按行追加到 sys.argv[3]
+GUI_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, %r)
+import device_config, state_cache
+device_config.config_store.path = sys.argv[1]
+state_cache.state_cache.path = sys.argv[2]
+import tkinter as tk
+from device_gui import DeviceControllerGUI
+
+class ProbeGUI(DeviceControllerGUI):
+    def _record_first_paint(self, source):
+        if not self._first_paint_done:
+            # 等界面处理完已排队的绘制后再记录
+            self.root.after_idle(self._probe, "first_paint", source)
+        super()._record_first_paint(source)
+
+    def _confirm_status(self):
+        super()._confirm_status()
+        self.root.after_idle(self._probe, "confirmed")
+
+    def _probe(self, event, source=None):
+        with open(sys.argv[3], "a", encoding="utf-8") as f:
+            f.write(json.dumps({"event": event, "source": source, "time": time.time()}) + "\\n")
+        # 状态得到确认后退出
+        if event == "confirmed":
+            self.root.after(0, self.on_closing)
+
+root = tk.Tk()
+app = ProbeGUI(root)
+root.protocol("WM_DELETE_WINDOW", app.on_closing)
+root.mainloop()
+""" % ROOT
+
+# 没有图形界面时只取得第一次显示所需的数据
+DATA_SCRIPT = """
+import sys
+sys.path.insert(0, %r)
+if sys.argv[1] == "cache":
+    from state_cache import DeviceStateCache
+    status = DeviceStateCache(sys.argv[2]).cached_status(sys.argv[3])[0]
+else:
+    from device_inventory import DeviceInventory
+    status = DeviceInventory().query_status(sys.argv[3])
+print(status.text(), flush=True)
+""" % ROOT
+
+def has_display():
+    result = subprocess.run([sys.executable, "-c", "import tkinter; tkinter.Tk().destroy()"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+def run_gui(workdir, use_cache):
+    """启动一次主窗口，返回 (第一次显示的来源, 第一次显示用时, 确认用时)"""
+    config_path = os.path.join(workdir, "config.json")
+    cache_path = os.path.join(workdir, "device_state_cache.json")
+    probe_path = os.path.join(workdir, "probe.jsonl")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({"use_full_id": True, "full_device_id": DEVICE_ID}, f)
+    if not use_cache and os.path.exists(cache_path):
+        os.remove(cache_path)
+    if os.path.exists(probe_path):
+        os.remove(probe_path)
+
+    start = time.time()
+    subprocess.run([sys.executable, "-c", GUI_SCRIPT, config_path, cache_path, probe_path], cwd=workdir,
+                   timeout=120, env=ENV, stdout=subprocess.DEVNULL)
+    events = {}
+    with open(probe_path, "r", encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            events[event["event"]] = event
+    first = events["first_paint"]
+    return first["source"], first["time"] - start, events["confirmed"]["time"] - start
+
+def run_data(workdir, mode):
+    """没有图形界面时：启动进程到得到第一次显示所需数据的时间"""
+    cache_path = os.path.join(workdir, "device_state_cache.json")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", DATA_SCRIPT, mode, cache_path, DEVICE_ID],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=ENV, cwd=workdir)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate()
+    return elapsed
+
+def p50(samples):
+    return sorted(samples)[len(samples) // 2] * 1000
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp(prefix="bench_first_paint_")
+    print(f"次数: {count}, pnputil延迟: {ENV['FAKE_PNPUTIL_LATENCY']} s")
+
+    if has_display():
+        for use_cache in (False, True):
+            runs = [run_gui(workdir, use_cache) for _ in range(count)]
+            name = "有缓存" if use_cache else "无缓存"
+            sources = ",".join(sorted({source for source, _, _ in runs}))
+            print(f"{name}  第一次显示状态 p50 {p50([r[1] for r in runs]):8.1f} ms ({sources})"
+                  f"   状态得到确认 p50 {p50([r[2] for r in runs]):8.1f} ms")
+        return
+
+    print("没有图形界面环境，只测量第一次显示所需的数据")
+    cache = DeviceStateCache(os.path.join(workdir, "device_state_cache.json"))
+    cache.update_status(DEVICE_ID, DeviceStatus(DeviceState.STARTED))
+    cache.flush()
+    live = [run_data(workdir, "live") for _ in range(count)]
+    cached = [run_data(workdir, "cache") for _ in range(count)]
+    print(f"无缓存（pnputil查询）  p50 {p50(live):8.1f} ms")
+    print(f"有缓存（读取缓存）      p50 {p50(cached):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""HTTP控制接口的负载测试：多个保持连接的客户端同时查询设备状态，报告吞吐量和尾部延迟
+
+在子进程中启动 serve 命令（使用假的pnputil，端口由系统分配），每个客户端在一个连接上连续发送
+GET /status（每隔若干个请求发送一次 GET /devices），结束后再做一次批量禁用/启用检查结果是否正确。
+同时统计pnputil的启动次数，所有客户端共用一份设备清单快照，启动次数约为 测试时长/快照有效时间
+
+用法：python benchmarks/bench_server.py [客户端数量] [测试时长(秒)]
+可通过 FAKE_PNPUTIL_LATENCY 模拟负载较高的机器
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+DEVICE_IDS = [
+    "USB\\VID_174C&PID_1153\\MSFT3023456789013B",
+    "USB\\VID_0BDA&PID_9210\\012345678901",
+    "USB\\VID_1A86&PID_7523\\5&1A2B3C4D&0&3",
+]
+
+# 每个客户端每隔多少个请求查询一次设备列表
+LIST_EVERY = 10
+
+async def request(reader, writer, method, path, body=None):
+    """在已有连接上发送一个请求，返回 (状态码, 响应数据)"""
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n"
+                 .encode("latin-1") + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def client(port, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    count = 0
+    try:
+        while time.perf_counter() < deadline:
+            if count % LIST_EVERY == 0:
+                path = "/devices"
+            else:
+                path = "/status?id=" + quote(DEVICE_IDS[count % len(DEVICE_IDS)], safe="")
+            count += 1
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, "GET", path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def check_batch(port):
+    """批量禁用再启用，返回错误列表"""
+    errors = []
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for action, disabled in (("disable", True), ("enable", False)):
+            status, results = await request(reader, writer, "POST", "/batch",
+                                             {"action": action, "device_ids": DEVICE_IDS, "wait": 5})
+            if status != 200 or not all(result["confirmed"] for result in results):
+                errors.append(f"批量{action}失败: {status} {results}")
+            for device_id in DEVICE_IDS:
+                _, (result,) = await request(reader, writer, "GET", "/status?id=" + quote(device_id, safe=""))
+                if result.get("disabled") is not disabled:
+                    errors.append(f"{action} 之后 {device_id} 的状态为 {result.get('state')}")
+    finally:
+        writer.close()
+    return errors
+
+def percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+async def run(port, clients, duration):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, start + duration, latencies, errors) for _ in range(clients)))
+    total = time.perf_counter() - start
+    return latencies, errors, total
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    workdir = tempfile.mkdtemp(prefix="bench_server_")
+    calls_path = os.path.join(workdir, "calls.txt")
+    env = dict(os.environ,
+               DMCONTROL_APP_DIR=workdir,
+               DMCONTROL_PNPUTIL=f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"',
+               DMCONTROL_DEVCON=f'"{sys.executable}" "{os.path.join(HERE, "fake_devcon.py")}"',
+               FAKE_PNPUTIL_STATE=os.path.join(workdir, "state.json"),
+               FAKE_TOOL_CALLS=calls_path)
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "disable_enable_usb_gui.py"), "serve", "--port", "0"],
+                              cwd=workdir, env=env, stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    try:
+        line = server.stdout.readline()
+        port = int(line.rstrip().rsplit(":", 1)[1])
+
+        latencies, errors, total = asyncio.run(run(port, clients, duration))
+        with open(calls_path, "r", encoding="utf-8") as f:
+            spawns = sum(1 for _ in f)
+        latencies.sort()
+        print(f"客户端: {clients}, 时长: {total:.1f} s, 请求: {len(latencies)}, 错误: {len(errors)}")
+        print(f"吞吐量: {len(latencies) / total:.1f} 次/秒")
+        print(f"延迟: p50 {percentile(latencies, 0.5):.2f} ms   p99 {percentile(latencies, 0.99):.2f} ms   "
+              f"p99.9 {percentile(latencies, 0.999):.2f} ms   最大 {latencies[-1] * 1000:.2f} ms")
+        print(f"pnputil启动次数: {spawns}")
+
+        batch_errors = asyncio.run(check_batch(port))
+        for error in batch_errors:
+            print(error)
+        print("批量禁用/启用检查: " + ("失败" if batch_errors else "通过"))
+    finally:
+        server.terminate()
+        server.wait()
+
+    if errors or batch_errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
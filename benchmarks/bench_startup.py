@@ -0,0 +1,74 @@
+"""对比命令行模式和图形界面模式的启动开销
+
+命令行模式：启动进程到输出第一条结果的时间（status 查询一个设备）
+图形界面模式：启动进程并导入tkinter和界面模块所需的时间（不创建窗口）
+同时用 -X importtime 检查命令行模式没有导入tkinter
+
+用法：python benchmarks/bench_startup.py [次数]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+ENTRY = os.path.join(ROOT, "disable_enable_usb_gui.py")
+DEVICE_ID = "USB\\VID_174C&PID_1153\\MSFT3023456789013B"
+
+ENV = dict(os.environ)
+# 缓存文件写入临时目录，不写入源代码目录
+ENV.setdefault("DMCONTROL_APP_DIR", tempfile.mkdtemp(prefix="dmcontrol_bench_"))
+ENV.setdefault("DMCONTROL_PNPUTIL", f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"')
+
+# 只导入图形界面模式用到的模块，不进入主循环
+GUI_IMPORT = (
+    "import sys; sys.path.insert(0, %r); "
+    "import disable_enable_usb_gui, tkinter, device_gui" % ROOT
+)
+
+def time_to_first_line(cmd):
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=ENV, cwd=ROOT)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate()
+    return elapsed
+
+def time_to_exit(cmd):
+    start = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=ENV, cwd=ROOT)
+    return time.perf_counter() - start
+
+def report(name, samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1000
+    print(f"{name:<32} p50 {p50:8.1f} ms   最快 {samples[0] * 1000:8.1f} ms")
+
+def imported_modules(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True, env=ENV, cwd=ROOT)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cli = [sys.executable, ENTRY, "status", DEVICE_ID]
+
+    print(f"次数: {count}")
+    report("命令行 status 首条结果", [time_to_first_line(cli) for _ in range(count)])
+    report("命令行 --help", [time_to_exit([sys.executable, ENTRY, "status", "--help"]) for _ in range(count)])
+    report("图形界面模式 导入模块", [time_to_exit([sys.executable, "-c", GUI_IMPORT]) for _ in range(count)])
+
+    modules = imported_modules([sys.executable, "-X", "importtime", ENTRY, "status", DEVICE_ID])
+    gui_modules = sorted(name for name in modules if name.startswith(("tkinter", "_tkinter", "device_gui")))
+    if gui_modules:
+        print(f"错误：命令行模式导入了图形界面模块: {', '.join(gui_modules)}")
+        sys.exit(1)
+    print("命令行模式没有导入tkinter")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""基准测试套件：在录制和合成的 pnputil 输出上测量解析吞吐量、查询延迟和启动的进程数量
+
+每种规模（录制的输出、100、5000、50000个设备）分别使用中文(zh-CN)和英文(en-US)输出，
+通过假的 pnputil/devcon 运行，报告每项操作的 次/秒、p50/p99 延迟和每次操作启动的进程数
+
+用法：
+    python benchmarks/bench_suite.py                          运行并输出结果
+    python benchmarks/bench_suite.py --save-baseline          保存为基线（默认 benchmarks/baseline.json）
+    python benchmarks/bench_suite.py --check                  与基线比较，有退化时退出码为1
+    python benchmarks/bench_suite.py --sizes recorded,100 --repeat 20 --latency 0.05
+    python benchmarks/bench_suite.py --backend wmi            使用进程内的WMI后端（假的 wmi 模块）
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+# 缓存文件写入临时目录，不写入源代码目录
+os.environ.setdefault("DMCONTROL_APP_DIR", tempfile.mkdtemp(prefix="dmcontrol_bench_"))
+os.environ.setdefault("DMCONTROL_PNPUTIL", f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"')
+os.environ.setdefault("DMCONTROL_DEVCON", f'"{sys.executable}" "{os.path.join(HERE, "fake_devcon.py")}"')
+# 假的 wmi 模块，只在 --backend wmi 时使用
+sys.path.insert(0, os.path.join(HERE, "fake_wmi"))
+
+import device_backend
+from device_backend import find_devices_by_partial_id, get_device_status, list_all_usb_devices
+from device_index import parse_instance_id
+from device_inventory import DeviceInventory
+from pnputil_parser import parse_devices
+from strategy_cache import StrategyCache
+from synthetic import synthetic_dump
+from wmi_backend import select_backend
+
+LOCALES = ("zh-CN", "en-US")
+DEFAULT_SIZES = ("recorded", "100", "5000", "50000")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+OPERATIONS = ("parse", "list_all_usb_devices", "find_devices_by_partial_id", "get_device_status", "refresh_cycle")
+
+# p50 的绝对变化小于该值(毫秒)时不算退化，避免小操作的抖动
+NOISE_FLOOR_MS = 2.0
+
+def fixture_cases(sizes, workdir):
+    """产出 (用例名, 录制输出文件) ，合成的输出写入临时目录"""
+    for size in sizes:
+        for locale in LOCALES:
+            if size == "recorded":
+                path = os.path.join(HERE, "fixtures", f"pnputil_enum_{locale}.txt")
+            else:
+                path = os.path.join(workdir, f"pnputil_enum_{size}_{locale}.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(synthetic_dump(int(size), locale))
+            yield f"{size}/{locale}", path
+
+def pick_target(records):
+    """选取位于输出中间的一个USB设备作为查询对象"""
+    usb = [record for record in records if parse_instance_id(record.instance_id).vid]
+    return usb[len(usb) // 2].instance_id
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def measure(fn, repeat, calls_path):
+    """预热一次后执行 repeat 次，返回吞吐量、延迟和每次操作启动的进程数"""
+    fn()
+    open(calls_path, "w").close()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+
+    with open(calls_path, "r", encoding="utf-8") as f:
+        # 假的 wmi 模块记录的查询不是进程
+        spawns = sum(1 for line in f if not line.startswith("wmi "))
+    latencies.sort()
+    return {
+        "ops_per_sec": round(repeat / total, 3),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "spawns_per_op": round(spawns / repeat, 2),
+    }
+
+def run_case(fixture, repeat, operations, calls_path):
+    """在一份录制输出上测量所有操作"""
+    os.environ["FAKE_PNPUTIL_FIXTURE"] = fixture
+    with open(fixture, "r", encoding="utf-8") as f:
+        text = f.read()
+    target = pick_target(parse_devices(text))
+    partial = "\\".join(target.split("\\")[:2])
+    # 与界面轮询相同的路径：快照过期后一次枚举，再从快照中查找设备
+    inventory = DeviceInventory()
+
+    def refresh_cycle():
+        inventory.invalidate()
+        inventory.query_status(target)
+
+    actions = {
+        "parse": lambda: parse_devices(text),
+        "list_all_usb_devices": list_all_usb_devices,
+        "find_devices_by_partial_id": lambda: find_devices_by_partial_id(partial),
+        "get_device_status": lambda: get_device_status(target),
+        "refresh_cycle": refresh_cycle,
+    }
+    return {op: measure(actions[op], repeat, calls_path) for op in operations}
+
+def compare(results, baseline, tolerance):
+    """返回相对基线的退化列表：p50 变慢超过容差，或每次操作启动的进程变多"""
+    regressions = []
+    for case, ops in results.items():
+        for op, current in ops.items():
+            base = baseline.get(case, {}).get(op)
+            if base is None:
+                continue
+            slower = current["p50_ms"] - base["p50_ms"]
+            if current["p50_ms"] > base["p50_ms"] * (1 + tolerance) and slower > NOISE_FLOOR_MS:
+                regressions.append(f"{case} {op}: p50 {base['p50_ms']:.3f} -> {current['p50_ms']:.3f} ms")
+            if current["spawns_per_op"] > base["spawns_per_op"]:
+                regressions.append(f"{case} {op}: 进程数 {base['spawns_per_op']} -> {current['spawns_per_op']}")
+    return regressions
+
+def print_results(case, results):
+    print(f"\n[{case}]")
+    for op, r in results.items():
+        print(f"  {op:<28} {r['ops_per_sec']:10.1f} 次/秒   p50 {r['p50_ms']:10.3f} ms"
+              f"   p99 {r['p99_ms']:10.3f} ms   进程 {r['spawns_per_op']:5.2f}/次")
+
+def main():
+    parser = argparse.ArgumentParser(description="USB设备控制器基准测试套件")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help="规模列表，recorded 表示录制的输出")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="要测量的操作")
+    parser.add_argument("--repeat", type=int, default=5, help="每项操作的执行次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="假的pnputil/devcon每次调用的额外延迟(秒)")
+    parser.add_argument("--backend", choices=("pnputil", "wmi"), default="pnputil", help="设备查询后端")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="文件", help="保存结果为基线")
+    parser.add_argument("--check", nargs="?", const=DEFAULT_BASELINE, metavar="文件", help="与基线比较")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="p50 允许变慢的比例")
+    options = parser.parse_args()
+
+    operations = [op for op in options.ops.split(",") if op]
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"未知的操作: {', '.join(sorted(unknown))}")
+
+    os.environ["FAKE_PNPUTIL_LATENCY"] = str(options.latency)
+    os.environ["FAKE_DEVCON_LATENCY"] = str(options.latency)
+    os.environ.pop("FAKE_PNPUTIL_STATE", None)
+
+    workdir = tempfile.mkdtemp(prefix="dmcontrol-bench-")
+    calls_path = os.path.join(workdir, "calls.txt")
+    os.environ["FAKE_TOOL_CALLS"] = calls_path
+    # 命令策略缓存写到临时目录，不影响程序目录下的 backend_cache.json
+    device_backend.strategy_cache = StrategyCache(os.path.join(workdir, "backend_cache.json"))
+    if select_backend(options.backend) != options.backend:
+        parser.error(f"无法使用 {options.backend} 后端")
+
+    results = {}
+    try:
+        for case, fixture in fixture_cases([size for size in options.sizes.split(",") if size], workdir):
+            results[case] = run_case(fixture, options.repeat, operations, calls_path)
+            print_results(case, results[case])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if options.save_baseline:
+        with open(options.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "latency": options.latency,
+                "backend": options.backend,
+                "repeat": options.repeat,
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n基线已保存到 {options.save_baseline}")
+
+    if options.check:
+        with open(options.check, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("latency") != options.latency:
+            print(f"\n注意：基线的模拟延迟为 {baseline.get('latency')} 秒，本次为 {options.latency} 秒")
+        if baseline.get("backend", "pnputil") != options.backend:
+            print(f"\n注意：基线使用 {baseline.get('backend', 'pnputil')} 后端，本次为 {options.backend}")
+        regressions = compare(results, baseline.get("results", {}), options.tolerance)
+        if regressions:
+            print("\n性能退化：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n没有发现性能退化")
+
+if __name__ == "__main__":
+    main()
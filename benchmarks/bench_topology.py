@@ -0,0 +1,83 @@
+"""设备父子关系索引：检查录制输出的解析结果，并测量大规模设备树上的查询耗时
+
+先在录制的 /relations 输出（中英文）上检查父子关系、所在集线器和禁用后会断开的设备是否正确，
+再在合成的设备树上测量建立索引、查找所在集线器/祖先路径（与层数成正比）以及子树查询的耗时
+
+用法：python benchmarks/bench_topology.py [设备数量]
+"""
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from device_index import DeviceTopology
+from pnputil_parser import parse_devices
+from synthetic import synthetic_dump
+
+ROOT_HUB = "USB\\ROOT_HUB30\\4&2B4F3C1A&0&0"
+HUB = "USB\\VID_05E3&PID_0626\\5&1A2B3C4D&0&1"
+ENCLOSURE = "USB\\VID_174C&PID_1153\\MSFT3023456789013B"
+DISK = "SCSI\\Disk&Ven_ASMT&Prod_2115\\7&1B2C3D4E&0&000000"
+MOUSE_INTERFACE = "USB\\VID_046D&PID_C52B&MI_00\\7&2F8C6A1&0&0000"
+
+# 录制输出中应当得到的结果
+EXPECTED = {
+    "parent": {ENCLOSURE: HUB, HUB: ROOT_HUB, DISK: ENCLOSURE},
+    "hub_of": {ENCLOSURE: HUB, DISK: HUB, MOUSE_INTERFACE: ROOT_HUB, ROOT_HUB: None},
+    "descendants": {
+        ENCLOSURE: [DISK],
+        HUB: [ENCLOSURE, DISK, "USB\\VID_0BDA&PID_9210\\012345678901", "USB\\VID_1A86&PID_7523\\5&1A2B3C4D&0&3"],
+        "USB\\VID_0BDA&PID_9210\\012345678901": [],
+    },
+}
+
+def check_fixtures():
+    """检查录制输出的解析结果，返回错误列表"""
+    errors = []
+    for locale in ("en-US", "zh-CN"):
+        with open(os.path.join(HERE, "fixtures", f"pnputil_enum_{locale}.txt"), "r", encoding="utf-8") as f:
+            topology = DeviceTopology(parse_devices(f.read()))
+        for query, cases in EXPECTED.items():
+            for device_id, expected in cases.items():
+                actual = getattr(topology, query)(device_id)
+                if actual != expected:
+                    errors.append(f"[{locale}] {query}({device_id}) = {actual!r}，应为 {expected!r}")
+        if topology.ancestors(DISK)[:3] != [ENCLOSURE, HUB, ROOT_HUB]:
+            errors.append(f"[{locale}] ancestors({DISK}) = {topology.ancestors(DISK)!r}")
+    return errors
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    errors = check_fixtures()
+    for error in errors:
+        print(error)
+    print("录制输出检查: " + ("失败" if errors else "通过"))
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    records = parse_devices(synthetic_dump(count, relations=True))
+    start = time.perf_counter()
+    topology = DeviceTopology(records)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    leaf = records[-1].instance_id
+    depth = len(topology.ancestors(leaf))
+    print(f"设备数量: {count}, 建立索引: {build_ms:.1f} ms, 最深层数: {depth}")
+    print(f"  ancestors(最深的设备)     {timed(lambda: topology.ancestors(leaf), 10000):8.2f} us")
+    print(f"  hub_of(最深的设备)        {timed(lambda: topology.hub_of(leaf), 10000):8.2f} us")
+    print(f"  parent(最深的设备)        {timed(lambda: topology.parent(leaf), 10000):8.2f} us")
+    middle = records[count // 64].instance_id
+    subtree = len(topology.descendants(middle))
+    print(f"  descendants({subtree} 个设备)  {timed(lambda: topology.descendants(middle), 100):8.2f} us")
+
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
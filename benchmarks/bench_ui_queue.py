@@ -0,0 +1,107 @@
+"""界面更新：每个结果单独 root.after(0, ...) vs 合并的界面更新队列
+
+多个后台线程同时提交同一设备的状态结果（状态刷新突发），统计界面线程执行的回调次数和控件修改次数。
+不需要图形界面环境：控件用记录 config() 调用的对象代替，界面线程每帧执行一次队列
+
+用法：python benchmarks/bench_ui_queue.py [线程数] [每个线程的结果数]
+"""
+import os
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from ui_queue import UiUpdateQueue
+
+class Widget:
+    def __init__(self):
+        self.configs = 0
+
+    def config(self, **options):
+        self.configs += 1
+
+class Screen:
+    """状态栏和两个按钮，cached 为True时只在显示内容变化时修改控件"""
+
+    def __init__(self, cached):
+        self.cached = cached
+        self.widgets = {"status": Widget(), "enable": Widget(), "disable": Widget()}
+        self.shown = {}
+        self.callbacks = 0
+        self.applied_seq = 0
+
+    def configure(self, name, value):
+        if self.cached and self.shown.get(name) == value:
+            return
+        self.widgets[name].config(value=value)
+        self.shown[name] = value
+
+    def update_status(self, seq, text):
+        self.callbacks += 1
+        if seq <= self.applied_seq:
+            return
+        self.applied_seq = seq
+        self.configure("status", "设备状态: " + text)
+        self.configure("enable", text != "已启用")
+        self.configure("disable", text == "已启用")
+
+    @property
+    def configs(self):
+        return sum(widget.configs for widget in self.widgets.values())
+
+def burst(threads, per_thread, post):
+    """多个线程同时提交状态结果"""
+    seq = iter(range(1, threads * per_thread + 1))
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(per_thread):
+            with lock:
+                n = next(seq)
+            post(n, "已启用")
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+def run_after(threads, per_thread):
+    """原来的方式：每个结果一个 root.after(0, ...) 回调，逐个执行"""
+    screen = Screen(cached=False)
+    callbacks = []
+    lock = threading.Lock()
+
+    def post(seq, text):
+        with lock:
+            callbacks.append((seq, text))
+
+    burst(threads, per_thread, post)
+    start = time.perf_counter()
+    for seq, text in callbacks:
+        screen.update_status(seq, text)
+    return screen, time.perf_counter() - start
+
+def run_queue(threads, per_thread):
+    """界面更新队列：同一设备的结果合并，控件只在显示内容变化时修改"""
+    screen = Screen(cached=True)
+    queue = UiUpdateQueue()
+    burst(threads, per_thread,
+          lambda seq, text: queue.post_latest("status", screen.update_status, seq, text, version=seq))
+    start = time.perf_counter()
+    queue.drain()
+    return screen, time.perf_counter() - start
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print(f"线程: {threads}, 每个线程的结果: {per_thread}, 共 {threads * per_thread} 个状态结果")
+    for name, run in (("逐个 root.after", run_after), ("合并的更新队列", run_queue)):
+        screen, elapsed = run(threads, per_thread)
+        print(f"{name:<16} 界面回调 {screen.callbacks:6d} 次   控件修改 {screen.configs:6d} 次"
+              f"   界面线程用时 {elapsed * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""对比旧的正则逐块匹配与 (VID, PID) 索引查找的耗时
+
+用法：python benchmarks/bench_vidpid_index.py [设备数量] [查找次数]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from device_index import VidPidIndex, extract_vid_pid, parse_instance_id
+from pnputil_parser import parse_devices
+from synthetic import synthetic_dump, synthetic_instance_ids
+
+def legacy_find(all_devices, device_id):
+    """旧版 find_devices_by_partial_id 的匹配逻辑（不含pnputil调用）"""
+    vid_pid_match = re.search(r'VID_([0-9A-F]{4}).*?PID_([0-9A-F]{4})', device_id, re.IGNORECASE)
+    if not vid_pid_match:
+        return []
+    vid = vid_pid_match.group(1)
+    pid = vid_pid_match.group(2)
+    device_blocks = re.split(r'(?:实例 ID|Instance ID):', all_devices)
+    matched_devices = []
+    pattern = rf'USB.*?VID_{vid}.*?PID_{pid}'
+    for block in device_blocks:
+        device_match = re.search(pattern, block, re.IGNORECASE | re.DOTALL)
+        if device_match:
+            id_match = re.search(r'(USB\\VID_.*?)(?:\r|\n|$)', block, re.IGNORECASE | re.DOTALL)
+            if id_match:
+                matched_devices.append(id_match.group(1).strip())
+    return matched_devices
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    dump = synthetic_dump(count)
+    queries = [
+        "\\".join(instance_id.split("\\")[:2]).split("&MI_")[0]
+        for instance_id in synthetic_instance_ids(count)[:lookups * 10:10]
+    ]
+
+    start = time.perf_counter()
+    legacy_results = [legacy_find(dump, query) for query in queries]
+    legacy_time = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    index = VidPidIndex()
+    for record in parse_devices(dump):
+        index.add(record.instance_id)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed_results = [index.find(*extract_vid_pid(query), bus="USB") for query in queries]
+    lookup_time = (time.perf_counter() - start) / len(queries)
+
+    # 结果必须与旧实现一致（旧实现会把 HID\VID_... 排除在外）
+    for query, legacy, indexed in zip(queries, legacy_results, indexed_results):
+        assert legacy == indexed, (query, legacy, indexed)
+        assert all(parse_instance_id(i).bus == "USB" for i in indexed)
+
+    print(f"设备数量: {count}, 查找次数: {len(queries)}")
+    print(f"旧实现每次查找:     {legacy_time * 1000:10.3f} ms")
+    print(f"索引构建(一次):     {build_time * 1000:10.3f} ms")
+    print(f"索引每次查找:       {lookup_time * 1000:10.6f} ms")
+    print(f"单次查找加速比:     {legacy_time / lookup_time:10.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""对比“每次调用启动进程”和“常驻后端进程”的往返延迟与吞吐量
+
+用法：python benchmarks/bench_worker.py [请求次数]
+默认使用假的pnputil（benchmarks/fake_pnputil.py），可通过 FAKE_PNPUTIL_LATENCY 模拟负载较高的机器
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+# 缓存文件写入临时目录，不写入源代码目录
+os.environ.setdefault("DMCONTROL_APP_DIR", tempfile.mkdtemp(prefix="dmcontrol_bench_"))
+os.environ.setdefault("DMCONTROL_PNPUTIL", f'"{sys.executable}" "{os.path.join(HERE, "fake_pnputil.py")}"')
+
+from backend_worker import BackendWorkerClient
+from device_backend import pnputil_cmd
+
+DEVICE_ID = "USB\\VID_174C&PID_1153\\MSFT3023456789013B"
+
+def report(name, latencies, total):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:<28} p50 {p50:9.3f} ms   p99 {p99:9.3f} ms   {len(latencies) / total:10.1f} 次/秒")
+
+def measure_sequential(call, count):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+def measure_pipelined(client, count):
+    start = time.perf_counter()
+    sent = []
+    futures = []
+    for _ in range(count):
+        sent.append(time.perf_counter())
+        futures.append(client.submit("status", device_id=DEVICE_ID))
+    latencies = []
+    for t, future in zip(sent, futures):
+        future.result()
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    cmd = pnputil_cmd(f'/enum-devices /instanceid "{DEVICE_ID}"')
+    spawn = lambda: subprocess.check_output(cmd, shell=True, text=True)
+
+    print(f"请求次数: {count}")
+    report("每次调用启动进程", *measure_sequential(spawn, count))
+
+    stand_in = BackendWorkerClient(command=[sys.executable, os.path.join(HERE, "stand_in_worker.py")])
+    stand_in.call("ping")
+    report("替身后端 顺序往返", *measure_sequential(lambda: stand_in.call("status", device_id=DEVICE_ID), count * 20))
+    report("替身后端 流水线", *measure_pipelined(stand_in, count * 20))
+    stand_in.close()
+
+    worker = BackendWorkerClient()
+    worker.call("ping")
+    report("常驻后端 顺序往返", *measure_sequential(lambda: worker.call("status", device_id=DEVICE_ID), count))
+    report("常驻后端 流水线", *measure_pipelined(worker, count))
+    worker.close()
+
+if __name__ == "__main__":
+    main()
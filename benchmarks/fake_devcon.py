@@ -0,0 +1,99 @@
+"""假的devcon，根据录制的 pnputil 输出模拟 devcon findall/status/enable/disable
+
+用法：
+    DMCONTROL_DEVCON="python benchmarks/fake_devcon.py" python disable_enable_usb_gui.py
+
+环境变量：
+    FAKE_PNPUTIL_FIXTURE  与假的pnputil使用同一份录制输出
+    FAKE_PNPUTIL_STATE    与假的pnputil共享启用/禁用结果
+    FAKE_DEVCON_LATENCY   每次调用的额外延迟（秒）
+    FAKE_TRANSITION_DELAY 与假的pnputil相同，启用/禁用后经过该时间（秒）才显示为新状态
+    FAKE_TOOL_CALLS       每次调用向该文件追加一行命令行
+    FAKE_DEVCON_HANG      与 FAKE_PNPUTIL_HANG 相同，模拟不返回的devcon
+"""
+import os
+import sys
+import time
+
+from fake_pnputil import (apply_state, block_instance_id, hang_if_requested, load_fixture, load_state, record_call,
+                          save_state, set_action, state_lock)
+
+DESCRIPTION_LABELS = ("Device Description", "设备描述")
+STATUS_LABELS = ("Status", "状态")
+PROBLEM_LABELS = ("Problem Code", "问题代码")
+
+def block_field(block, labels):
+    for line in block.splitlines():
+        label, _, value = line.partition(":")
+        if label.strip() in labels:
+            return value.strip()
+    return ""
+
+def devcon_status(block):
+    """devcon status 的状态行"""
+    status = block_field(block, STATUS_LABELS)
+    if status in ("Disabled", "已禁用"):
+        return "Device is disabled."
+    if status in ("Problem", "问题"):
+        return f"The device has the following problem: {block_field(block, PROBLEM_LABELS) or '0'}"
+    if status in ("Disconnected", "已断开连接"):
+        return "Device is currently stopped."
+    return "Driver is running."
+
+def select(blocks, pattern):
+    """模拟 devcon 的匹配：@实例ID 精确匹配，其他按硬件ID通配（*）匹配"""
+    pattern = pattern.strip('"').upper()
+    if pattern.startswith("@"):
+        return [block for block in blocks if block_instance_id(block).upper() == pattern[1:]]
+    needle = pattern.strip("*")
+    return [block for block in blocks if needle in block_instance_id(block).upper()]
+
+def main(args):
+    record_call("devcon", args)
+    hang_if_requested("FAKE_DEVCON_HANG")
+    latency = float(os.environ.get("FAKE_DEVCON_LATENCY", "0") or 0)
+    if latency:
+        time.sleep(latency)
+
+    if len(args) < 2:
+        print("Device Console Help:")
+        return 1
+
+    header, blocks, locale = load_fixture()
+    state_path = os.environ.get("FAKE_PNPUTIL_STATE")
+    state = load_state(state_path)
+    command = args[0].lower()
+    selected = [apply_state(block, state, locale) for block in select(blocks, args[1])]
+
+    if command == "findall":
+        for block in selected:
+            print(f"{block_instance_id(block):<60}: {block_field(block, DESCRIPTION_LABELS)}")
+        print(f"{len(selected)} matching device(s) found." if selected else "No matching devices found.")
+        return 0
+
+    if command == "status":
+        for block in selected:
+            print(block_instance_id(block))
+            print(f"    Name: {block_field(block, DESCRIPTION_LABELS)}")
+            print(f"    {devcon_status(block)}")
+        print(f"{len(selected)} matching device(s) found." if selected else "No matching devices found.")
+        return 0
+
+    if command in ("enable", "disable"):
+        if not selected:
+            print("No matching devices found.")
+            return 1
+        with state_lock(state_path):
+            state = load_state(state_path)
+            for block in selected:
+                set_action(state, block_instance_id(block), "enabled" if command == "enable" else "disabled")
+                print(f"{block_instance_id(block)}: {'Enabled' if command == 'enable' else 'Disabled'}")
+            save_state(state_path, state)
+        print(f"{len(selected)} device(s) {'are enabled' if command == 'enable' else 'disabled'}.")
+        return 0
+
+    print("Device Console Help:")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
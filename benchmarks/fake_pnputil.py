@@ -0,0 +1,258 @@
+"""假的pnputil，回放录制的 pnputil /enum-devices /relations 输出，用于在Linux上测试和基准测试
+
+不带 /relations 时与真实的pnputil一样不输出父级/子级字段
+
+用法：
+    DMCONTROL_PNPUTIL="python benchmarks/fake_pnputil.py" python disable_enable_usb_gui.py
+
+环境变量：
+    FAKE_PNPUTIL_FIXTURE  录制的输出文件（默认 fixtures/pnputil_enum_en-US.txt）
+    FAKE_PNPUTIL_LATENCY  每次调用的额外延迟（秒）
+    FAKE_PNPUTIL_STATE    保存启用/禁用结果的JSON文件，不设置则不保存
+    FAKE_TRANSITION_DELAY 启用/禁用后经过该时间（秒）设备才显示为新状态，模拟切换较慢的设备
+    FAKE_TOOL_CALLS       每次调用向该文件追加一行命令行，用于统计启动的进程数量
+    FAKE_PNPUTIL_HANG     模拟驱动卡住时不返回的pnputil：为1时每次调用都挂起，为文件路径时该文件存在期间挂起；
+                          挂起时另外启动一个同样挂起的子进程，用于检查超时后是否结束了整个进程树
+    FAKE_PNPUTIL_NO_RELATIONS 模拟不支持 /relations 的旧版本pnputil（带 /relations 时报错退出）：
+                          为1时一直不支持，为文件路径时该文件存在期间不支持
+"""
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE = os.path.join(HERE, "fixtures", "pnputil_enum_en-US.txt")
+
+STATUS_TEXT = {
+    "en": {"enabled": "Started", "disabled": "Disabled"},
+    "zh": {"enabled": "已启动", "disabled": "已禁用"},
+}
+
+NOT_FOUND_TEXT = {
+    "en": "No devices were found on the system.",
+    "zh": "系统上找不到任何设备。",
+}
+
+def record_call(tool, args):
+    """把本次调用追加到 FAKE_TOOL_CALLS 指定的文件"""
+    path = os.environ.get("FAKE_TOOL_CALLS")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(" ".join([tool] + args) + "\n")
+
+def flag_enabled(variable):
+    """环境变量为1，或为存在的文件路径"""
+    value = os.environ.get(variable)
+    return bool(value) and (value == "1" or os.path.exists(value))
+
+def hang_if_requested(variable):
+    """按环境变量的设置挂起，直到被结束（为文件路径时文件被删除后继续）"""
+    value = os.environ.get(variable)
+    if not value:
+        return
+
+    def hanging():
+        return value == "1" or os.path.exists(value)
+
+    if not hanging():
+        return
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"])
+    while hanging():
+        time.sleep(0.1)
+    child.kill()
+
+def load_fixture():
+    """读取录制的输出，返回 (标题, 设备块列表, 语言)"""
+    with open(os.environ.get("FAKE_PNPUTIL_FIXTURE", DEFAULT_FIXTURE), "r", encoding="utf-8") as f:
+        header, blocks = load_blocks(f.read())
+    return header, blocks, "zh" if "工具" in header else "en"
+
+def load_blocks(text):
+    """把录制的输出拆成 (标题, 设备块列表)"""
+    parts = re.split(r'\n\s*\n', text.strip('\n'))
+    return parts[0], [part for part in parts[1:] if part.strip()]
+
+def block_instance_id(block):
+    first_line = block.splitlines()[0]
+    return first_line.split(":", 1)[1].strip()
+
+# 等待状态文件锁的最长时间（秒），超过时认为持有锁的进程已被结束，删除锁文件
+STATE_LOCK_TIMEOUT = 10.0
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_state(path, state):
+    """先写临时文件再替换，同时读取状态的进程不会读到写了一半的文件"""
+    if path:
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+@contextlib.contextmanager
+def state_lock(path):
+    """修改保存的启用/禁用结果期间持有的锁（锁文件），并发的启用/禁用不会互相覆盖结果"""
+    if not path:
+        yield
+        return
+    lock_path = path + ".lock"
+    deadline = time.monotonic() + STATE_LOCK_TIMEOUT
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                deadline = time.monotonic() + STATE_LOCK_TIMEOUT
+            time.sleep(0.005)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+def current_action(entry):
+    """保存的启用/禁用结果，切换尚未完成时为之前的结果"""
+    if isinstance(entry, dict):
+        return entry["action"] if time.time() >= entry["ready_at"] else entry["previous"]
+    return entry
+
+def set_action(state, instance_id, action):
+    """保存启用/禁用结果，设置了 FAKE_TRANSITION_DELAY 时新状态在延迟之后才显示"""
+    delay = float(os.environ.get("FAKE_TRANSITION_DELAY", "0") or 0)
+    key = instance_id.upper()
+    if delay:
+        state[key] = {"action": action, "previous": current_action(state.get(key)), "ready_at": time.time() + delay}
+    else:
+        state[key] = action
+
+def apply_state(block, state, locale):
+    """用保存的启用/禁用结果替换设备块中的状态行"""
+    action = current_action(state.get(block_instance_id(block).upper()))
+    if action is None:
+        return block
+    lines = []
+    for line in block.splitlines():
+        label = line.split(":", 1)[0].strip()
+        if label in ("Status", "状态"):
+            line = (label + ":").ljust(28) + STATUS_TEXT[locale][action]
+        elif label in ("Problem Code", "问题代码"):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+RELATION_LABELS = ("Parent", "Children", "父级", "子级")
+
+def strip_relations(block):
+    """去掉设备块中的父级/子级字段（包括子级的续行）"""
+    lines = []
+    in_relations = False
+    for line in block.splitlines():
+        if line[:1].isspace():
+            if in_relations:
+                continue
+        else:
+            in_relations = line.split(":", 1)[0].strip() in RELATION_LABELS
+            if in_relations:
+                continue
+        lines.append(line)
+    return "\n".join(lines)
+
+def option_value(args, name):
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            return args[index + 1].strip('"')
+    return None
+
+def matches(instance_id, pattern):
+    """模拟 pnputil 的匹配：完全匹配、前缀匹配或以*结尾的通配"""
+    instance_id = instance_id.upper()
+    pattern = pattern.upper()
+    if pattern.endswith("*"):
+        return instance_id.startswith(pattern[:-1])
+    return (instance_id == pattern
+            or instance_id.startswith(pattern + "\\")
+            or instance_id.startswith(pattern + "&"))
+
+def main(args):
+    record_call("pnputil", args)
+    hang_if_requested("FAKE_PNPUTIL_HANG")
+    latency = float(os.environ.get("FAKE_PNPUTIL_LATENCY", "0") or 0)
+    if latency:
+        time.sleep(latency)
+
+    header, blocks, locale = load_fixture()
+    state_path = os.environ.get("FAKE_PNPUTIL_STATE")
+    state = load_state(state_path)
+
+    if not args:
+        print(header)
+        return 1
+
+    command = args[0].lower()
+    if command == "/enum-devices" and "/relations" in args and flag_enabled("FAKE_PNPUTIL_NO_RELATIONS"):
+        print(header)
+        print()
+        print("Invalid option: /relations")
+        return 1
+
+    if command == "/enum-devices":
+        instance_id = option_value(args, "/instanceid")
+        device_id = option_value(args, "/deviceid")
+        selected = []
+        for block in blocks:
+            block_id = block_instance_id(block)
+            if instance_id is not None and block_id.upper() != instance_id.upper():
+                continue
+            if device_id is not None and not matches(block_id, device_id):
+                continue
+            block = apply_state(block, state, locale)
+            if "/connected" in args and re.search(r"^(Status|状态):\s*(Disconnected|已断开连接)$", block, re.M):
+                continue
+            selected.append(block if "/relations" in args else strip_relations(block))
+
+        print(header)
+        print()
+        if not selected:
+            print(NOT_FOUND_TEXT[locale])
+            return 0
+        for block in selected:
+            print(block)
+            print()
+        return 0
+
+    if command in ("/enable-device", "/disable-device"):
+        instance_id = option_value(args, "/instanceid") or (args[1].strip('"') if len(args) > 1 else None)
+        known = {block_instance_id(block).upper() for block in blocks}
+        if not instance_id or instance_id.upper() not in known:
+            print(header)
+            print()
+            print(NOT_FOUND_TEXT[locale])
+            return 1
+        with state_lock(state_path):
+            state = load_state(state_path)
+            set_action(state, instance_id, "enabled" if command == "/enable-device" else "disabled")
+            save_state(state_path, state)
+        print(header)
+        print()
+        print(f"{'Enabling' if command == '/enable-device' else 'Disabling'} device:  {instance_id}")
+        return 0
+
+    print(header)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+"""假的 wmi 模块，由假的pnputil使用的录制输出生成 Win32_PnPEntity 对象，用于在Linux上测试WMI后端
+
+用法：
+    PYTHONPATH=benchmarks/fake_wmi DMCONTROL_PNPUTIL="python benchmarks/fake_pnputil.py" python disable_enable_usb_gui.py
+
+与 fake_pnputil.py 共用 FAKE_PNPUTIL_FIXTURE 和 FAKE_PNPUTIL_STATE，通过假的pnputil启用/禁用的结果在查询中可见。
+只支持本程序使用的查询：SELECT 字段 FROM Win32_PnPEntity [WHERE PNPDeviceID = '...' | PNPDeviceID LIKE '...']
+
+环境变量：
+    FAKE_WMI_LATENCY   每次查询的额外延迟（秒）
+    FAKE_WMI_FAIL      为1时连接失败（测试回退到pnputil），为文件路径时该文件存在期间查询失败
+    FAKE_TOOL_CALLS    每次连接和查询向该文件追加一行，用于统计调用次数
+"""
+import os
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+
+import fake_pnputil
+from device_state import DeviceState
+from pnputil_parser import iter_device_records
+
+ERROR_CODES = {DeviceState.STARTED: 0, DeviceState.DISABLED: 22, DeviceState.DISCONNECTED: 45}
+STATUS = {DeviceState.STARTED: "OK", DeviceState.DISCONNECTED: "Unknown"}
+
+QUERY = re.compile(r"SELECT\s+(?P<fields>.+?)\s+FROM\s+Win32_PnPEntity"
+                   r"(?:\s+WHERE\s+PNPDeviceID\s+(?P<op>=|LIKE)\s+'(?P<value>(?:[^'\\]|\\.)*)')?\s*$",
+                   re.I | re.S)
+
+class x_wmi(Exception):
+    """与真实的 wmi 模块同名的异常"""
+
+def _failing():
+    value = os.environ.get("FAKE_WMI_FAIL")
+    return bool(value) and (value == "1" or os.path.exists(value))
+
+def _unescape(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+def _like(pattern):
+    """WQL LIKE 模式转换为正则表达式（%、_ 和 [字符]）"""
+    parts = []
+    for token in re.findall(r"\[[^\]]*\]|%|_|.", pattern, re.S):
+        if token == "%":
+            parts.append(".*")
+        elif token == "_":
+            parts.append(".")
+        elif token.startswith("[") and len(token) > 1:
+            parts.append("[" + re.escape(token[1:-1]) + "]")
+        else:
+            parts.append(re.escape(token))
+    return re.compile("".join(parts) + r"\Z", re.I | re.S)
+
+def _entities():
+    """由录制的输出和保存的启用/禁用结果生成所有设备对象"""
+    _, blocks, locale = fake_pnputil.load_fixture()
+    state = fake_pnputil.load_state(os.environ.get("FAKE_PNPUTIL_STATE"))
+    text = "\n\n".join(fake_pnputil.apply_state(block, state, locale) for block in blocks)
+    for record in iter_device_records(text.splitlines()):
+        if record.state is DeviceState.PROBLEM:
+            error_code = record.problem_code or 1
+        else:
+            error_code = ERROR_CODES.get(record.state)
+        yield SimpleNamespace(PNPDeviceID=record.instance_id, Name=record.description,
+                              Description=record.description, PNPClass=record.class_name,
+                              Status=STATUS.get(record.state, "Error"), ConfigManagerErrorCode=error_code)
+
+class _Connection:
+    def query(self, wql):
+        fake_pnputil.record_call("wmi", ["query", wql])
+        if _failing():
+            raise x_wmi("模拟的WMI错误")
+        latency = float(os.environ.get("FAKE_WMI_LATENCY", "0") or 0)
+        if latency:
+            time.sleep(latency)
+
+        match = QUERY.match(wql.strip())
+        if match is None:
+            raise x_wmi(f"不支持的查询: {wql}")
+        op, value = match.group("op"), match.group("value")
+        entities = list(_entities())
+        if op is None:
+            return entities
+        value = _unescape(value)
+        if op == "=":
+            return [entity for entity in entities if entity.PNPDeviceID.upper() == value.upper()]
+        pattern = _like(value)
+        return [entity for entity in entities if pattern.match(entity.PNPDeviceID)]
+
+def WMI(*args, **kwargs):
+    fake_pnputil.record_call("wmi", ["connect"])
+    if os.environ.get("FAKE_WMI_FAIL") == "1":
+        raise x_wmi("模拟的WMI连接失败")
+    return _Connection()
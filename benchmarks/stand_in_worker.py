@@ -0,0 +1,34 @@
+"""常驻后端进程的替身：使用相同的JSON行协议，但不调用pnputil，立即返回固定结果
+
+用于单独测量协议往返和流水线的开销；测试中用 exit 操作模拟退出的后端进程，hang 操作模拟不返回的请求
+"""
+import json
+import os
+import sys
+
+def main():
+    disabled = {}
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        op = request.get("op")
+        device_id = request.get("device_id", "")
+        if op == "exit":
+            return
+        if op == "hang":
+            continue
+        if op == "ping":
+            result = os.getpid()
+        elif op == "status":
+            result = disabled.get(device_id, False)
+        elif op in ("enable", "disable"):
+            disabled[device_id] = op == "disable"
+            result = True
+        else:
+            result = None
+        sys.stdout.write(json.dumps({"id": request.get("id"), "ok": True, "result": result}) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
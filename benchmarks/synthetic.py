@@ -0,0 +1,62 @@
+"""生成任意规模的 pnputil /enum-devices 输出，用于基准测试"""
+import random
+
+HEADER = {
+    "en-US": "Microsoft PnP Utility",
+    "zh-CN": "Microsoft PnP 工具",
+}
+
+LABELS = {
+    "en-US": ("Instance ID", "Device Description", "Class Name", "Status", "Driver Name"),
+    "zh-CN": ("实例 ID", "设备描述", "类名", "状态", "驱动程序名称"),
+}
+
+# 带 /relations 时的父级字段名
+PARENT_LABEL = {
+    "en-US": "Parent",
+    "zh-CN": "父级",
+}
+
+STATUS = {
+    "en-US": ("Started", "Disabled"),
+    "zh-CN": ("已启动", "已禁用"),
+}
+
+def synthetic_instance_ids(count, seed=0):
+    """生成 count 个USB/HID/PCI设备实例ID，VID/PID有重复以模拟复合设备"""
+    rng = random.Random(seed)
+    ids = []
+    for i in range(count):
+        vid = rng.randrange(0x0400, 0x2000)
+        pid = rng.randrange(0x0001, 0x0100)
+        kind = i % 10
+        if kind < 6:
+            ids.append(f"USB\\VID_{vid:04X}&PID_{pid:04X}\\{i:012X}")
+        elif kind < 8:
+            ids.append(f"USB\\VID_{vid:04X}&PID_{pid:04X}&MI_{kind - 6:02d}\\7&{i:08X}&0&0000")
+        elif kind == 8:
+            ids.append(f"HID\\VID_{vid:04X}&PID_{pid:04X}&MI_00\\8&{i:08X}&0&0000")
+        else:
+            ids.append(f"PCI\\VEN_8086&DEV_{pid:04X}&SUBSYS_00000000&REV_10\\3&{i:08X}&0&A0")
+    return ids
+
+def synthetic_dump(count, locale="en-US", seed=0, relations=False):
+    """生成包含 count 个设备的 pnputil /enum-devices 输出文本
+
+    relations 为True时模拟 /relations 输出：设备组成每个节点4个子设备的树，第i个设备的父设备是第 (i-1)//4 个
+    """
+    instance_label, description_label, class_label, status_label, driver_label = LABELS[locale]
+    started, disabled = STATUS[locale]
+    width = 28
+    instance_ids = synthetic_instance_ids(count, seed)
+    blocks = [HEADER[locale], ""]
+    for i, instance_id in enumerate(instance_ids):
+        blocks.append(f"{instance_label}:".ljust(width) + instance_id)
+        blocks.append(f"{description_label}:".ljust(width) + f"Synthetic Device {i}")
+        blocks.append(f"{class_label}:".ljust(width) + "USB")
+        blocks.append(f"{status_label}:".ljust(width) + (disabled if i % 17 == 0 else started))
+        blocks.append(f"{driver_label}:".ljust(width) + "usb.inf")
+        if relations and i:
+            blocks.append(f"{PARENT_LABEL[locale]}:".ljust(width) + instance_ids[(i - 1) // 4])
+        blocks.append("")
+    return "\n".join(blocks) + "\n"
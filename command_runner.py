@@ -0,0 +1,207 @@
+"""运行pnputil/devcon命令：每次调用都有超时，超时后结束整个进程树；每个工具有一个熔断器
+
+驱动卡住时pnputil可能一直不返回。连续多次超时（或无法启动）后熔断器打开，在等待时间内不再启动
+该工具，直接抛出 BackendUnavailable；等待结束后放行一次试探调用，成功则恢复，失败则等待时间加倍。
+命令正常结束（无论退出码）都算作工具可用，找不到设备等非零退出码由调用方处理
+"""
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from metrics import metrics
+
+# 单个命令的超时（秒），可通过环境变量或config.json中的 "command_timeout" 修改
+COMMAND_TIMEOUT_ENV = "DMCONTROL_COMMAND_TIMEOUT"
+DEFAULT_COMMAND_TIMEOUT = 30.0
+# 结束进程树后等待进程退出的时间，内核中卡住的进程可能无法立即结束
+KILL_WAIT = 5.0
+
+# 熔断器：连续失败次数阈值，以及第一次和最长的等待时间（秒）
+FAILURE_THRESHOLD = 3
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 300.0
+
+class BackendUnavailable(subprocess.SubprocessError):
+    """工具的熔断器处于打开状态，本次调用没有启动进程"""
+
+    def __init__(self, tool, retry_in):
+        super().__init__(f"{tool} 连续超时或无法启动，已暂停调用，{retry_in:.0f}s 后重试")
+        self.tool = tool
+        self.retry_in = retry_in
+
+class CommandTimeout(subprocess.TimeoutExpired):
+    """命令超过超时时间没有返回，进程树已被结束"""
+
+    def __str__(self):
+        return f"命令 {self.cmd} 在 {self.timeout:g}s 内没有返回，已结束"
+
+class CircuitBreaker:
+    """单个工具的熔断器，状态为 closed（正常）、open（暂停调用）、half_open（放行一次试探调用）"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        # 连续打开的次数，决定下一次的等待时间
+        self._opened = 0
+        self._retry_at = 0.0
+
+    def check(self):
+        """调用前检查，熔断器打开时抛出 BackendUnavailable；等待结束后只放行一个试探调用"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now >= self._retry_at:
+                self.state = "half_open"
+                metrics.increment("circuit_probes_total", tool=self.name)
+                return
+            metrics.increment("circuit_rejections_total", tool=self.name)
+            raise BackendUnavailable(self.name, max(0.0, self._retry_at - now))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._opened = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                delay = min(self.base_delay * 2 ** self._opened, self.max_delay)
+                self._opened += 1
+                self.state = "open"
+                self._retry_at = time.monotonic() + delay
+                metrics.increment("circuit_opened_total", tool=self.name)
+
+    def snapshot(self):
+        """可序列化的状态：{"tool", "state", "failures", "retry_in"}"""
+        with self._lock:
+            retry_in = max(0.0, self._retry_at - time.monotonic()) if self.state == "open" else 0.0
+            return {"tool": self.name, "state": self.state, "failures": self._failures,
+                    "retry_in": round(retry_in, 1)}
+
+    def reset(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._opened = 0
+            self._retry_at = 0.0
+
+def _timeout_from_env():
+    try:
+        return float(os.environ.get(COMMAND_TIMEOUT_ENV, "") or DEFAULT_COMMAND_TIMEOUT)
+    except ValueError:
+        return DEFAULT_COMMAND_TIMEOUT
+
+_command_timeout = _timeout_from_env()
+
+def command_timeout():
+    """当前的命令超时（秒）"""
+    return _command_timeout
+
+def set_command_timeout(seconds):
+    """修改命令超时（秒），例如使用config.json中的 "command_timeout" """
+    global _command_timeout
+    _command_timeout = float(seconds)
+
+# 每个工具的熔断器，本进程中的所有调用共用
+breakers = {tool: CircuitBreaker(tool) for tool in ("pnputil", "devcon")}
+
+def breaker(tool):
+    return breakers[tool]
+
+def backend_health():
+    """返回未处于正常状态的熔断器（为空表示后端正常）"""
+    return [snapshot for snapshot in (b.snapshot() for b in breakers.values()) if snapshot["state"] != "closed"]
+
+def kill_process_tree(pid):
+    """结束进程及其所有子进程（shell=True 时实际的工具是shell的子进程）"""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    else:
+        # 进程以新的会话启动，进程组ID即为其PID
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+def popen(cmd, **kwargs):
+    """经shell启动命令，非Windows系统上放入单独的进程组以便结束整个进程树"""
+    if os.name != "nt":
+        kwargs.setdefault("start_new_session", True)
+    return subprocess.Popen(cmd, shell=True, **kwargs)
+
+def kill_process(process):
+    """结束 popen() 启动的进程及其子进程"""
+    kill_process_tree(process.pid)
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+def run_command(cmd, tool, kind, stderr=subprocess.PIPE, timeout=None):
+    """运行命令并返回输出文本，行为与 subprocess.check_output 相同，另外：
+
+    熔断器打开时抛出 BackendUnavailable；超过 timeout（默认为 command_timeout()）时结束进程树
+    并抛出 CommandTimeout（TimeoutExpired 的子类）
+    """
+    tool_breaker = breaker(tool)
+    tool_breaker.check()
+    timeout = command_timeout() if timeout is None else timeout
+
+    metrics.increment("spawns_total", tool=tool)
+    start = time.perf_counter()
+    try:
+        try:
+            process = popen(cmd, text=True, stdout=subprocess.PIPE, stderr=stderr)
+        except OSError:
+            metrics.increment("spawn_failures_total", tool=tool)
+            tool_breaker.record_failure()
+            raise
+        try:
+            output, errors = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process(process)
+            try:
+                process.communicate(timeout=KILL_WAIT)
+            except subprocess.TimeoutExpired:
+                pass
+            metrics.increment("command_timeouts_total", tool=tool, kind=kind)
+            tool_breaker.record_failure()
+            raise CommandTimeout(cmd, timeout)
+    finally:
+        metrics.observe("command_duration_seconds", time.perf_counter() - start, tool=tool, kind=kind)
+
+    tool_breaker.record_success()
+    if process.returncode != 0:
+        metrics.increment("spawn_failures_total", tool=tool)
+        raise subprocess.CalledProcessError(process.returncode, cmd, output, errors)
+    return output
+
+class Watchdog:
+    """逐行读取输出的命令使用的超时：到时间后结束进程树，读取随即结束"""
+
+    def __init__(self, process, timeout):
+        self.expired = False
+        self._process = process
+        self._timer = threading.Timer(timeout, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        self.expired = True
+        kill_process(self._process)
+
+    def cancel(self):
+        self._timer.cancel()
@@ -0,0 +1,134 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from device_dashboard import SORT_KEYS
+
+# 列名、标题和宽度
+COLUMNS = (("name", "名称", 180), ("device", "设备ID", 300), ("state", "状态", 120), ("last_change", "最后变化", 120))
+
+def format_change_time(timestamp):
+    """最后变化时间：当天只显示时间"""
+    if timestamp is None:
+        return ""
+    if time.strftime("%Y-%m-%d", time.localtime(timestamp)) == time.strftime("%Y-%m-%d"):
+        return time.strftime("%H:%M:%S", time.localtime(timestamp))
+    return time.strftime("%m-%d %H:%M:%S", time.localtime(timestamp))
+
+class DashboardView:
+    """多设备监控表格：按列排序，选中的设备可以启用/禁用（右键菜单或下方按钮）
+
+    每行的ID为设备ID（大写），刷新时只改写有变化的行
+    """
+
+    def __init__(self, parent, on_action):
+        # on_action(操作, [设备ID]) ，操作为 enable/disable
+        self.on_action = on_action
+        self._sort_column = None
+        self._sort_reverse = False
+        self._rows = {}
+
+        self.summary_label = ttk.Label(parent, text="")
+        self.summary_label.pack(fill=tk.X, padx=5, pady=(0, 5))
+
+        list_frame = ttk.Frame(parent)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=5)
+
+        self.tree = ttk.Treeview(list_frame, columns=[name for name, _, _ in COLUMNS],
+                                 show="headings", selectmode="extended")
+        for name, title, width in COLUMNS:
+            self.tree.heading(name, text=title, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.config(yscrollcommand=scrollbar.set)
+
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(button_frame, text="启用所选", command=lambda: self._act("enable")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="禁用所选", command=lambda: self._act("disable")).pack(side=tk.LEFT, padx=5)
+
+        self.menu = tk.Menu(self.tree, tearoff=0)
+        self.menu.add_command(label="启用", command=lambda: self._act("enable"))
+        self.menu.add_command(label="禁用", command=lambda: self._act("disable"))
+        self.tree.bind("<Button-3>", self._show_menu)
+
+    def set_rows(self, rows):
+        """重建表格（被监控的设备列表变化时）"""
+        self.tree.delete(*self.tree.get_children())
+        self._rows = {}
+        for row in rows:
+            key = row.device_id.upper()
+            self._rows[key] = row
+            self.tree.insert("", tk.END, iid=key, values=self._values(row))
+        self._resort()
+        self._update_summary()
+
+    def update_rows(self, rows):
+        """只改写有变化的行，排序列的值变化时重新排序"""
+        if not rows:
+            return
+        resort = False
+        for row in rows:
+            key = row.device_id.upper()
+            previous = self._rows.get(key)
+            if previous is None or not self.tree.exists(key):
+                continue
+            if self._sort_column is not None and SORT_KEYS[self._sort_column](previous) != SORT_KEYS[self._sort_column](row):
+                resort = True
+            self._rows[key] = row
+            self.tree.item(key, values=self._values(row))
+        if resort:
+            self._resort()
+        self._update_summary()
+
+    def sort_by(self, column):
+        """点击列标题：按该列排序，再次点击反向"""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column = column
+            self._sort_reverse = False
+        for name, title, _ in COLUMNS:
+            arrow = (" ▼" if self._sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=title + arrow)
+        self._resort()
+
+    def selected_ids(self):
+        return [self._rows[key].device_id for key in self.tree.selection() if key in self._rows]
+
+    def _resort(self):
+        if self._sort_column is None:
+            return
+        ordered = sorted(self._rows, key=lambda key: SORT_KEYS[self._sort_column](self._rows[key]),
+                         reverse=self._sort_reverse)
+        for index, key in enumerate(ordered):
+            self.tree.move(key, "", index)
+
+    def _update_summary(self):
+        rows = self._rows.values()
+        counts = {}
+        for row in rows:
+            text = row.status_text()
+            counts[text] = counts.get(text, 0) + 1
+        self.summary_label.config(text=f"监控 {len(self._rows)} 个设备: "
+                                  + "  ".join(f"{text} {count}" for text, count in sorted(counts.items())))
+
+    @staticmethod
+    def _values(row):
+        return (row.name or row.description or "", row.device_id, row.status_text(), format_change_time(row.last_change))
+
+    def _show_menu(self, event):
+        key = self.tree.identify_row(event.y)
+        if not key:
+            return
+        if key not in self.tree.selection():
+            self.tree.selection_set(key)
+        self.menu.tk_popup(event.x_root, event.y_root)
+
+    def _act(self, action):
+        device_ids = self.selected_ids()
+        if device_ids:
+            self.on_action(action, device_ids)
@@ -0,0 +1,358 @@
+import subprocess
+import os
+import shlex
+import shutil
+
+from app_paths import app_path
+from command_runner import run_command
+from device_index import extract_vid_pid, parse_instance_id
+from device_state import DeviceState, DeviceStatus
+from metrics import metrics
+from pnputil_parser import iter_device_records, parse_problem_code, stream_devices
+from strategy_cache import StrategyCache
+from wmi_backend import WmiError, wmi_backend
+
+# pnputil/devcon 可执行命令，可通过环境变量替换（例如在Linux上使用假的pnputil进行测试）
+PNPUTIL = os.environ.get("DMCONTROL_PNPUTIL", "pnputil")
+DEVCON = os.environ.get("DMCONTROL_DEVCON", "devcon")
+
+def pnputil_cmd(args):
+    """拼接pnputil命令行"""
+    return f'{PNPUTIL} {args}'
+
+def devcon_cmd(args):
+    """拼接devcon命令行"""
+    return f'{DEVCON} {args}'
+
+def _split_command(command):
+    """把环境变量中的命令拆成参数列表（Windows上保留反斜杠，只去掉引号）"""
+    return [part.strip('"') for part in shlex.split(command, posix=(os.name != "nt"))]
+
+def pnputil_args(*args):
+    """pnputil命令的参数列表，用于不经过shell直接启动进程"""
+    return _split_command(PNPUTIL) + list(args)
+
+def devcon_args(*args):
+    """devcon命令的参数列表，用于不经过shell直接启动进程"""
+    return _split_command(DEVCON) + list(args)
+
+# 每个设备可用的命令形式和缺失的工具，保存在程序目录下
+strategy_cache = StrategyCache(app_path("backend_cache.json"))
+
+# 查询设备（状态/是否存在）和控制设备（启用/禁用）时依次尝试的命令形式
+QUERY_FORMS = ("instanceid", "deviceid", "devcon")
+CONTROL_FORMS = ("pnputil", "devcon")
+
+# 本进程中已经检测过是否存在的工具
+_probed_tools = set()
+
+# 命令不存在时cmd.exe和sh的退出码及提示
+MISSING_TOOL_EXIT_CODES = (9009, 127)
+MISSING_TOOL_MESSAGES = ("不是内部或外部命令", "is not recognized", "command not found")
+
+def _form_tool(form):
+    """命令形式所使用的工具"""
+    return "devcon" if form == "devcon" else "pnputil"
+
+def _probe_tool(tool):
+    """每个进程只检测一次工具是否在PATH中，不存在时记入缺失工具缓存"""
+    if tool in _probed_tools:
+        return
+    _probed_tools.add(tool)
+    command = DEVCON if tool == "devcon" else PNPUTIL
+    try:
+        executable = shlex.split(command, posix=(os.name != "nt"))[0].strip('"')
+    except ValueError:
+        return
+    if shutil.which(executable) is None:
+        strategy_cache.mark_tool_missing(tool)
+
+def _ordered_forms(kind, device_id, forms):
+    """按缓存的成功记录排序命令形式，并跳过缺失的工具"""
+    for tool in {_form_tool(form) for form in forms}:
+        _probe_tool(tool)
+    return strategy_cache.order(kind, device_id, forms, _form_tool)
+
+def _run_form(kind, device_id, form, cmd, stderr):
+    """执行某种形式的命令，失败时使缓存的命令形式失效并返回None
+
+    超时（TimeoutExpired）或工具的熔断器打开（BackendUnavailable）时抛出异常，由调用方跳过该形式
+    """
+    try:
+        return run_command(cmd, _form_tool(form), kind, stderr=stderr)
+    except subprocess.CalledProcessError as e:
+        output = f"{e.output or ''}{e.stderr or ''}"
+        if e.returncode in MISSING_TOOL_EXIT_CODES or any(message in output for message in MISSING_TOOL_MESSAGES):
+            strategy_cache.mark_tool_missing(_form_tool(form))
+        strategy_cache.record_failure(kind, device_id, form)
+        return None
+
+def _record_outcome(kind, form, attempt):
+    """记录最终使用的命令形式（全部失败时为none），不是第一个尝试的形式即为一次回退"""
+    metrics.increment("backend_operations_total", kind=kind, form=form or "none")
+    if attempt > 0:
+        metrics.increment("fallbacks_total", kind=kind, form=form or "none")
+
+def _query_command(form, device_id):
+    """查询设备状态的命令"""
+    if form == "devcon":
+        return devcon_cmd(f'status "@{device_id}"')
+    return pnputil_cmd(f'/enum-devices /{form} "{device_id}"')
+
+def _is_not_found(result):
+    """pnputil输出是否表示找不到设备"""
+    result = result.lower()
+    return "找不到" in result or "not found" in result or "no devices were found" in result
+
+def get_all_devices():
+    """获取所有设备的列表"""
+    cmd = pnputil_cmd('/enum-devices')
+    try:
+        return run_command(cmd, "pnputil", "enumerate", stderr=None)
+    except subprocess.SubprocessError:
+        return ""
+
+
+def find_devices_by_partial_id(device_id, inventory=None):
+    """根据部分ID找到设备的完整ID列表
+
+    传入设备清单快照时直接查询其 (VID, PID) 索引，不再启动pnputil；使用WMI时按VID/PID过滤查询
+    """
+    # 提取VID和PID部分
+    vid_pid = extract_vid_pid(device_id)
+    if not vid_pid:
+        return []
+    
+    if inventory is not None:
+        records = inventory.find_by_vid_pid(*vid_pid, bus="USB")
+        if records is not None:
+            return [record.instance_id for record in records]
+    
+    backend = wmi_backend()
+    if backend is not None:
+        try:
+            return [record.instance_id for record in backend.find_by_vid_pid(*vid_pid)]
+        except WmiError:
+            pass
+    
+    # 存储匹配的设备ID
+    matched_devices = []
+    
+    # 逐个设备记录比较拆分后的VID和PID
+    try:
+        for record in stream_devices(pnputil_cmd('/enum-devices')):
+            parts = parse_instance_id(record.instance_id)
+            if parts.bus == "USB" and (parts.vid, parts.pid) == vid_pid:
+                matched_devices.append(record.instance_id)
+    except subprocess.SubprocessError:
+        pass
+    
+    return matched_devices
+
+# devcon status 输出中的状态短语
+DEVCON_STATES = (
+    ("driver is running", DeviceState.STARTED),
+    ("device is disabled", DeviceState.DISABLED),
+    ("has the following problem", DeviceState.PROBLEM),
+    ("device is currently stopped", DeviceState.PROBLEM),
+)
+
+def _parse_devcon_state(output):
+    """根据 devcon status 的输出判断设备状态"""
+    lowered = output.lower()
+    for phrase, state in DEVCON_STATES:
+        if phrase in lowered:
+            code = None
+            if state is DeviceState.PROBLEM:
+                code = parse_problem_code(output.rsplit(":", 1)[-1].strip())
+            return DeviceStatus(state, code)
+    return DeviceStatus(DeviceState.UNKNOWN)
+
+def _wmi_query(device_id):
+    """使用WMI后端查询设备记录，设备不存在时返回False，未使用WMI或查询失败时返回None（回退到pnputil）"""
+    backend = wmi_backend()
+    if backend is None:
+        return None
+    try:
+        record = backend.query(device_id)
+    except WmiError:
+        return None
+    _record_outcome("query", "wmi", 0)
+    return False if record is None else record
+
+def get_device_state(device_id):
+    """获取指定设备ID的设备状态（DeviceStatus），无法判断时为 UNKNOWN"""
+    # 确保设备ID格式正确（去除可能的引号和空格）
+    device_id = device_id.strip('"\'').strip()
+    
+    record = _wmi_query(device_id)
+    if record is not None:
+        return DeviceStatus(DeviceState.UNKNOWN) if record is False else DeviceStatus.from_record(record)
+    
+    # 依次尝试 /instanceid、/deviceid 和 devcon，上次成功的形式优先
+    attempt = 0
+    for attempt, form in enumerate(_ordered_forms("query", device_id, QUERY_FORMS)):
+        try:
+            result = _run_form("query", device_id, form, _query_command(form, device_id), subprocess.STDOUT)
+        except subprocess.SubprocessError:
+            continue
+        if result is None:
+            continue
+        
+        if form == "devcon":
+            strategy_cache.record_success("query", device_id, form)
+            _record_outcome("query", form, attempt)
+            return _parse_devcon_state(result)
+        
+        # 检查设备是否存在
+        if _is_not_found(result):
+            strategy_cache.record_failure("query", device_id, form)
+            continue
+        
+        strategy_cache.record_success("query", device_id, form)
+        _record_outcome("query", form, attempt)
+        
+        for record in iter_device_records(result.splitlines()):
+            return DeviceStatus.from_record(record)
+        return DeviceStatus(DeviceState.UNKNOWN)
+    
+    _record_outcome("query", None, attempt)
+    return DeviceStatus(DeviceState.UNKNOWN)
+
+def get_device_status(device_id):
+    """获取指定设备ID的设备状态，返回是否被禁用"""
+    return get_device_state(device_id).disabled
+
+def _control_device(device_id, action):
+    """启用或禁用设备，依次尝试 pnputil 和 devcon，上次成功的形式优先"""
+    device_id = device_id.strip('"\'').strip()
+    
+    attempt = 0
+    for attempt, form in enumerate(_ordered_forms("control", device_id, CONTROL_FORMS)):
+        if form == "devcon":
+            cmd = devcon_cmd(f'{action} "@{device_id}"')
+        else:
+            cmd = pnputil_cmd(f'/{action}-device /instanceid "{device_id}"')
+        
+        try:
+            result = _run_form("control", device_id, form, cmd, subprocess.STDOUT)
+        except subprocess.SubprocessError:
+            continue
+        if result is not None:
+            strategy_cache.record_success("control", device_id, form)
+            _record_outcome("control", form, attempt)
+            return True
+    
+    _record_outcome("control", None, attempt)
+    return False
+
+def disable_device(device_id):
+    """禁用指定设备ID的设备"""
+    return _control_device(device_id, "disable")
+
+def enable_device(device_id):
+    """启用指定设备ID的设备"""
+    return _control_device(device_id, "enable")
+
+def device_exists(device_id):
+    """检查设备是否存在，所有命令形式都超时或被熔断器暂停时抛出 TimeoutExpired/BackendUnavailable"""
+    device_id = device_id.strip('"\'').strip()
+    
+    record = _wmi_query(device_id)
+    if record is not None:
+        return record is not False
+    
+    # 依次尝试 /instanceid、/deviceid 和 devcon，上次成功的形式优先
+    attempt = 0
+    error = None
+    answered = False
+    for attempt, form in enumerate(_ordered_forms("query", device_id, QUERY_FORMS)):
+        try:
+            result = _run_form("query", device_id, form, _query_command(form, device_id), subprocess.PIPE)
+        except subprocess.SubprocessError as e:
+            error = e
+            continue
+        if result is None:
+            continue
+        answered = True
+        
+        # 如果命令执行成功并且结果不包含"找不到"
+        if form == "devcon" or not _is_not_found(result):
+            strategy_cache.record_success("query", device_id, form)
+            _record_outcome("query", form, attempt)
+            return True
+        
+        strategy_cache.record_failure("query", device_id, form)
+    
+    _record_outcome("query", None, attempt)
+    # 无法判断设备是否存在，不能当作设备未找到
+    if error is not None and not answered:
+        raise error
+    return False
+
+def iter_usb_devices(inventory=None):
+    """逐个产出USB设备信息，pnputil每解析完一个设备块就立即返回
+
+    传入设备清单时使用其未过期的快照，快照已过期时边枚举边产出并在枚举完成后载入设备清单；
+    设备清单枚举失败时再单独枚举（WMI或pnputil）
+    """
+    found = False
+    
+    if inventory is not None:
+        for device in inventory.stream_usb_devices():
+            found = True
+            yield device
+        if found:
+            _record_outcome("list", "pnputil", 0)
+            return
+    
+    backend = wmi_backend()
+    if backend is not None:
+        try:
+            records = backend.usb_devices()
+        except WmiError:
+            records = []
+        for record in records:
+            found = True
+            yield {"id": record.instance_id, "name": record.description or "未知设备"}
+        if found:
+            _record_outcome("list", "wmi", 0)
+            return
+    
+    try:
+        # 使用pnputil列出所有USB设备
+        cmd = pnputil_cmd('/enum-devices /deviceid "USB*" /connected')
+        for record in stream_devices(cmd):
+            if record.instance_id.upper().startswith("USB\\VID_"):
+                found = True
+                yield {"id": record.instance_id, "name": record.description or "未知设备"}
+    
+    except subprocess.SubprocessError:
+        pass
+    
+    # 如果pnputil失败，尝试使用devcon（已知devcon不存在时跳过）
+    _probe_tool("devcon")
+    if found:
+        _record_outcome("list", "pnputil", 0)
+    elif strategy_cache.is_tool_missing("devcon"):
+        _record_outcome("list", None, 0)
+    else:
+        _record_outcome("list", "devcon", 1)
+        try:
+            result = run_command(devcon_cmd('findall *usb*'), "devcon", "list", stderr=None)
+            
+            # 解析devcon输出
+            lines = result.splitlines()
+            for i in range(0, len(lines), 2):
+                if i+1 < len(lines):
+                    device_id = lines[i].strip()
+                    device_name = lines[i+1].strip()
+                    if "VID_" in device_id and "PID_" in device_id:
+                        yield {"id": device_id, "name": device_name}
+        
+        except subprocess.SubprocessError:
+            pass
+
+def list_all_usb_devices():
+    """列出所有USB设备以帮助用户找到正确的设备ID"""
+    return list(iter_usb_devices())
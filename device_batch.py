@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from device_backend import disable_device, enable_device
+from device_transition import TransitionResult
+
+# 默认的并发设备数量
+DEFAULT_MAX_WORKERS = 4
+
+@dataclass
+class BatchResult:
+    """批量操作中单个设备的结果"""
+    device_id: str
+    success: bool
+    # 相对于批量操作开始的启动时间和耗时（秒）
+    started: float = 0.0
+    elapsed: float = 0.0
+    error: str = ""
+
+def parse_device_group(group):
+    """解析config.json中的设备分组，返回 (设备ID列表, {子设备ID: 父设备ID})
+
+    分组可以直接是设备ID列表，也可以是 {"devices": [...]}，
+    列表中的项可以是设备ID字符串或 {"id": ..., "parent": ...}
+    """
+    if isinstance(group, dict):
+        entries = group.get("devices", [])
+        parents = dict(group.get("parents", {}))
+    else:
+        entries = group
+        parents = {}
+
+    device_ids = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            device_ids.append(entry["id"])
+            if entry.get("parent"):
+                parents[entry["id"]] = entry["parent"]
+        else:
+            device_ids.append(entry)
+
+    return device_ids, parents
+
+def get_device_groups(config):
+    """返回配置中所有设备分组 {分组名: (设备ID列表, 父子关系)}"""
+    return {name: parse_device_group(group)
+            for name, group in config.get("device_groups", {}).items()}
+
+# 存在循环依赖、不会被执行的设备的错误信息
+CYCLE_ERROR = "父子关系存在循环依赖"
+
+def dependencies(device_ids, parents, action):
+    """计算每个设备需要等待的设备 {设备ID: {设备ID}}：启用时先父后子，禁用时先子后父"""
+    members = set(device_ids)
+    depends_on = {device_id: set() for device_id in device_ids}
+    for child, parent in parents.items():
+        if child not in members or parent not in members:
+            continue
+        if action == "enable":
+            depends_on[child].add(parent)
+        else:
+            depends_on[parent].add(child)
+    return depends_on
+
+def dependency_order(device_ids, depends_on):
+    """按依赖关系排序，被等待的设备排在前面，其余保持 device_ids 中的顺序；存在循环依赖的设备不在结果中"""
+    order = []
+    remaining = {device_id: set(depends_on[device_id]) for device_id in device_ids}
+    dependents = {device_id: [] for device_id in device_ids}
+    for device_id in device_ids:
+        for dep in depends_on[device_id]:
+            dependents[dep].append(device_id)
+    ready = deque(device_id for device_id in device_ids if not remaining[device_id])
+    while ready:
+        device_id = ready.popleft()
+        order.append(device_id)
+        for dependent in dependents[device_id]:
+            remaining[dependent].discard(device_id)
+            if not remaining[dependent]:
+                ready.append(dependent)
+    return order
+
+def _outcome(result):
+    """单个设备操作的返回值 -> (是否成功, 错误信息)
+
+    返回 TransitionResult（等待了目标状态）时以是否进入目标状态为准，其他返回值按真假判断
+    """
+    if isinstance(result, TransitionResult):
+        if not result.success:
+            return False, "操作失败"
+        if not result.confirmed:
+            return False, "未进入目标状态"
+        return True, ""
+    return (True, "") if result else (False, "操作失败")
+
+def submit_batch(submit, device_ids, action, parents=None, max_workers=DEFAULT_MAX_WORKERS, operation=None,
+                 on_complete=None):
+    """把批量启用/禁用中每个设备的操作分别交给调用方的执行器，不等待完成
+
+    submit(设备ID, 函数, 参数...) 提交一个任务并返回 Future（不再接受任务时返回None），
+    执行器按设备ID串行执行同一设备的任务。设备在它依赖的设备全部完成后才提交，同时在执行中的
+    设备最多 max_workers 个；所有设备完成后以 BatchResult 列表（与 device_ids 顺序一致）
+    调用 on_complete（在最后完成的任务所在的线程中）
+    """
+    if action not in ("enable", "disable"):
+        raise ValueError(f"未知的批量操作: {action}")
+    if operation is None:
+        operation = enable_device if action == "enable" else disable_device
+
+    device_ids = list(dict.fromkeys(device_ids))
+    depends_on = dependencies(device_ids, parents or {}, action)
+    order = dependency_order(device_ids, depends_on)
+    remaining = {device_id: set(depends_on[device_id]) for device_id in order}
+    dependents = {device_id: [] for device_id in order}
+    for device_id in order:
+        for dep in depends_on[device_id]:
+            dependents[dep].append(device_id)
+
+    # 存在循环依赖的设备不会被执行
+    results = {device_id: BatchResult(device_id, False, error=CYCLE_ERROR)
+               for device_id in device_ids if device_id not in remaining}
+    ready = deque(device_id for device_id in order if not remaining[device_id])
+    lock = threading.Lock()
+    in_flight = 0
+    reported = False
+    batch_start = time.monotonic()
+
+    def run_one(device_id):
+        started = time.monotonic()
+        try:
+            success, error = _outcome(operation(device_id))
+        except Exception as e:
+            success = False
+            error = str(e)
+        finished = time.monotonic()
+        return BatchResult(device_id, success, started - batch_start, finished - started, error)
+
+    def finish(device_id, result):
+        nonlocal in_flight
+        with lock:
+            results[device_id] = result
+            in_flight -= 1
+            for dependent in dependents[device_id]:
+                remaining[dependent].discard(device_id)
+                if not remaining[dependent]:
+                    ready.append(dependent)
+        start_ready()
+
+    def on_done(device_id, future):
+        if future.cancelled():
+            result = BatchResult(device_id, False, error="已取消")
+        elif future.exception() is not None:
+            result = BatchResult(device_id, False, error=str(future.exception()))
+        else:
+            result = future.result()
+        finish(device_id, result)
+
+    def start_ready():
+        nonlocal in_flight, reported
+        while True:
+            with lock:
+                if not ready or in_flight >= max(1, max_workers):
+                    # 只有最后完成的设备报告结果
+                    complete = not reported and len(results) == len(device_ids)
+                    reported = reported or complete
+                    break
+                device_id = ready.popleft()
+                in_flight += 1
+            future = submit(device_id, run_one, device_id)
+            if future is None:
+                finish(device_id, BatchResult(device_id, False, error="已取消"))
+                return
+            future.add_done_callback(lambda future, device_id=device_id: on_done(device_id, future))
+        if complete and on_complete is not None:
+            on_complete([results[device_id] for device_id in device_ids])
+
+    start_ready()
+
+def run_batch(device_ids, action, parents=None, max_workers=DEFAULT_MAX_WORKERS, operation=None):
+    """批量启用或禁用设备，返回每个设备的 BatchResult（与 device_ids 顺序一致）
+
+    互不依赖的设备在有限大小的线程池中并发执行，父子设备按依赖顺序执行，
+    所以一次批量操作的耗时接近最慢的那条依赖链，而不是所有设备耗时之和。
+    operation(设备ID) 返回是否成功或 TransitionResult，默认直接启用/禁用
+    """
+    done = threading.Event()
+    results = []
+
+    def complete(batch_results):
+        results.extend(batch_results)
+        done.set()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        submit_batch(lambda device_id, fn, *args: executor.submit(fn, *args), device_ids, action, parents,
+                     max_workers, operation, complete)
+        done.wait()
+    return results
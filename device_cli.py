@@ -0,0 +1,348 @@
+"""命令行模式，供计划任务和脚本使用，不导入tkinter
+
+用法:
+    DMControl.exe status <设备ID>... [--json]
+    DMControl.exe enable <设备ID>... [--wait [秒]] [--json]
+    DMControl.exe disable <设备ID>... [--wait [秒]] [--json]
+    DMControl.exe list [--json]
+    DMControl.exe find <部分设备ID> [--json]
+    DMControl.exe tree <设备ID> [--json]
+    DMControl.exe watch [--interval 秒] [--hook 命令] [--json]
+    DMControl.exe serve [--host 地址] [--port 端口] [--token 令牌] [--ttl 秒]
+
+设备ID写成 - 时从标准输入逐行读取设备ID（忽略空行和#开头的行）
+退出码: 0 全部成功，1 有设备未找到或操作失败，2 参数错误
+"""
+import argparse
+import ctypes
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 命令行模式的子命令，第一个参数是其中之一时进入命令行模式
+CLI_COMMANDS = ("status", "enable", "disable", "list", "find", "tree", "watch", "serve")
+
+def is_cli_invocation(args):
+    """参数是否为命令行模式（命令之前可以有 --backend 选项）"""
+    if args[:1] == ["--backend"]:
+        args = args[2:]
+    elif args and args[0].startswith("--backend="):
+        args = args[1:]
+    return bool(args) and args[0] in CLI_COMMANDS
+
+def _attach_console():
+    """打包成窗口程序后没有控制台，尝试把输出连接到启动它的命令行窗口"""
+    if not hasattr(sys, 'frozen') or sys.stdout is not None:
+        return
+    try:
+        if ctypes.windll.kernel32.AttachConsole(-1):
+            sys.stdout = open("CONOUT$", "w", encoding="utf-8")
+            sys.stderr = open("CONOUT$", "w", encoding="utf-8")
+    except Exception:
+        pass
+
+def _read_device_ids(device_ids, stdin=None):
+    """展开参数中的 -，从标准输入读取设备ID"""
+    result = []
+    for device_id in device_ids:
+        if device_id != "-":
+            result.append(device_id)
+            continue
+        for line in (stdin or sys.stdin):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                result.append(line)
+    return result
+
+def query_status(device_ids):
+    """查询设备状态，只启动必要的pnputil进程
+
+    单个设备先用 /instanceid（使用WMI时为一次过滤查询）只查询该设备；多个设备（或单个设备查不到时）
+    一次枚举全部设备
+    """
+    from device_backend import pnputil_cmd
+    from device_inventory import DeviceInventory, normalize_device_id
+    from device_state import DeviceStatus
+    from pnputil_parser import stream_devices
+    from wmi_backend import wmi_backend
+
+    def describe(device_id, record):
+        status = DeviceStatus.from_record(record)
+        return {
+            "device_id": device_id,
+            "found": True,
+            "instance_id": record.instance_id,
+            "description": record.description,
+            "status": record.status,
+            **status.to_dict(),
+            "disabled": status.disabled,
+        }
+
+    results = {}
+    if len(device_ids) == 1:
+        device_id = device_ids[0]
+        try:
+            backend = wmi_backend()
+            if backend is not None:
+                records = [record for record in [backend.query(device_id)] if record is not None]
+            else:
+                records = stream_devices(pnputil_cmd(f'/enum-devices /instanceid "{device_id}"'))
+            for record in records:
+                if normalize_device_id(record.instance_id) == normalize_device_id(device_id):
+                    results[device_id] = describe(device_id, record)
+        except Exception:
+            pass
+
+    remaining = [device_id for device_id in device_ids if device_id not in results]
+    if remaining:
+        inventory = DeviceInventory()
+        for device_id in remaining:
+            record = inventory.lookup(device_id)
+            if record is not None:
+                results[device_id] = describe(device_id, record)
+                continue
+            # 无法枚举时回退到逐个设备查询
+            try:
+                status = None if inventory.available else inventory.query_status(device_id)
+            except subprocess.SubprocessError as e:
+                # 命令超时或工具被暂停调用
+                results[device_id] = {"device_id": device_id, "found": False, "error": str(e)}
+                continue
+            results[device_id] = {"device_id": device_id, "found": status is not None}
+            if status is not None:
+                results[device_id].update(status.to_dict(), disabled=status.disabled)
+
+    return [results[device_id] for device_id in device_ids]
+
+def device_tree(device_id):
+    """返回设备在设备树中的位置：祖先路径、所在集线器，以及禁用它时会一起断开的设备"""
+    from device_inventory import DeviceInventory
+
+    inventory = DeviceInventory()
+    record = inventory.lookup(device_id)
+    # 使用WMI枚举时快照中没有设备关系，由 topology() 另外枚举
+    topology = inventory.topology()
+    if record is None or topology is None:
+        return {"device_id": device_id, "found": False}
+
+    instance_id = record.instance_id
+    return {
+        "device_id": device_id,
+        "found": True,
+        "instance_id": instance_id,
+        "description": record.description,
+        "parent": topology.parent(instance_id),
+        "hub": topology.hub_of(instance_id),
+        "ancestors": topology.ancestors(instance_id),
+        "descendants": topology.descendants(instance_id),
+    }
+
+def watch_devices(interval, out, as_json=False, hook=None):
+    """每隔 interval 秒枚举一次设备，输出设备连接、移除和状态变化，直到按下 Ctrl+C"""
+    from dataclasses import asdict
+
+    from device_inventory import DeviceInventory
+    from device_watch import HookRunner, HotplugMonitor
+
+    def show(events):
+        for event in events:
+            out.write(json.dumps(asdict(event), ensure_ascii=False) if as_json else event.text())
+            out.write("\n")
+        out.flush()
+
+    inventory = DeviceInventory(ttl=0)
+    monitor = HotplugMonitor()
+    monitor.attach(inventory)
+    monitor.subscribe(show)
+    if hook:
+        monitor.subscribe(HookRunner(hook))
+
+    try:
+        while True:
+            if inventory.refresh() is None:
+                sys.stderr.write("枚举设备失败\n")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+
+def control_devices(action, device_ids, wait_timeout=None):
+    """启用或禁用设备，多个设备并发执行
+
+    指定 wait_timeout 时等待每个设备进入目标状态，超时未进入的设备视为失败，结果中带有切换耗时
+    """
+    from device_batch import run_batch
+    from device_transition import control_and_confirm
+
+    transitions = {}
+
+    def confirm(device_id):
+        transition = transitions[device_id] = control_and_confirm(device_id, action, wait_timeout)
+        return transition.confirmed
+
+    results = []
+    for result in run_batch(device_ids, action, operation=confirm if wait_timeout else None):
+        item = {"device_id": result.device_id, "success": result.success,
+                "elapsed": round(result.elapsed, 3), "error": result.error}
+        transition = transitions.get(result.device_id)
+        if transition is not None and transition.success:
+            if not transition.confirmed:
+                item["error"] = f"{wait_timeout:g}s 内未进入目标状态"
+            item.update(state=transition.state, problem_code=transition.problem_code,
+                        transition=None if transition.transition_seconds is None else round(transition.transition_seconds, 3))
+        results.append(item)
+    return results
+
+def _print_json(data, out):
+    out.write(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+
+def _status_text(result):
+    if not result["found"]:
+        return result.get("error") or "未找到"
+    from device_state import DeviceStatus
+    return DeviceStatus.from_dict(result).text()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="DMControl", description="USB设备控制器命令行模式")
+    parser.add_argument("--backend", choices=("auto", "wmi", "pnputil"),
+                        help="设备查询后端，默认auto（能用WMI时使用WMI），也可通过环境变量 DMCONTROL_BACKEND 设置")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("status", "查询设备状态"), ("enable", "启用设备"), ("disable", "禁用设备")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("device_ids", nargs="+", metavar="设备ID", help="设备实例ID，- 表示从标准输入读取")
+        sub.add_argument("--json", action="store_true", help="以JSON格式输出")
+        if name != "status":
+            sub.add_argument("--wait", type=float, nargs="?", const=15.0, default=None, metavar="秒",
+                             help="等待设备进入目标状态（默认最多15秒）并输出切换耗时")
+
+    sub = subparsers.add_parser("list", help="列出所有USB设备")
+    sub.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    sub = subparsers.add_parser("find", help="根据部分ID(VID/PID)查找设备")
+    sub.add_argument("device_id", metavar="部分设备ID")
+    sub.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    sub = subparsers.add_parser("tree", help="显示设备所在的集线器，以及禁用它时会一起断开的设备")
+    sub.add_argument("device_id", metavar="设备ID")
+    sub.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    sub = subparsers.add_parser("watch", help="持续检测设备的连接、移除和状态变化")
+    sub.add_argument("--interval", type=float, default=2.0, metavar="秒", help="两次枚举的间隔，默认2秒")
+    sub.add_argument("--hook", metavar="命令", help="每个事件运行的命令，事件信息通过环境变量传入")
+    sub.add_argument("--json", action="store_true", help="每个事件输出一行JSON")
+
+    sub = subparsers.add_parser("serve", help="启动本地HTTP/JSON控制接口")
+    sub.add_argument("--host", default="127.0.0.1", help="监听地址，默认只允许本机访问；监听其他地址时必须使用令牌")
+    sub.add_argument("--port", type=int, default=8765, help="监听端口，默认8765，0表示由系统分配")
+    sub.add_argument("--token", default=os.environ.get("DMCONTROL_SERVER_TOKEN"), metavar="令牌",
+                     help="请求需要携带的令牌（Authorization: Bearer），默认读取 DMCONTROL_SERVER_TOKEN；"
+                          "监听非本机地址而没有指定时自动生成并输出")
+    sub.add_argument("--ttl", type=float, default=5.0, metavar="秒", help="设备清单快照的有效时间，默认5秒")
+
+    return parser
+
+def run_cli(args, stdin=None, out=None, check_admin=None):
+    """执行命令行模式，返回退出码；设置了 DMCONTROL_METRICS_FILE 时退出前写入指标文件"""
+    _attach_console()
+    options = build_parser().parse_args(args)
+    try:
+        return _run(options, stdin, out or sys.stdout, check_admin)
+    finally:
+        from metrics import metrics, metrics_file_path
+
+        path = metrics_file_path()
+        if path:
+            metrics.write(path)
+
+def _run(options, stdin, out, check_admin):
+    if options.backend:
+        from wmi_backend import set_backend_preference
+
+        set_backend_preference(options.backend)
+
+    if options.command == "list":
+        from device_backend import iter_usb_devices
+
+        if options.json:
+            devices = list(iter_usb_devices())
+            _print_json(devices, out)
+        else:
+            # 边枚举边输出
+            devices = []
+            for device in iter_usb_devices():
+                devices.append(device)
+                out.write(f"{device['id']}\t{device['name']}\n")
+                out.flush()
+        return 0 if devices else 1
+
+    if options.command == "find":
+        from device_backend import find_devices_by_partial_id
+
+        matches = find_devices_by_partial_id(options.device_id)
+        if options.json:
+            _print_json(matches, out)
+        else:
+            for device_id in matches:
+                out.write(device_id + "\n")
+        return 0 if matches else 1
+
+    if options.command == "serve":
+        from device_server import run_server
+
+        return run_server(options.host, options.port, options.token, options.ttl, out=out)
+
+    if options.command == "watch":
+        return watch_devices(options.interval, out, options.json, options.hook)
+
+    if options.command == "tree":
+        result = device_tree(options.device_id)
+        if options.json:
+            _print_json(result, out)
+        elif result["found"]:
+            path = list(reversed(result["ancestors"])) + [result["instance_id"]]
+            out.write("设备路径:\n")
+            for depth, instance_id in enumerate(path):
+                out.write("  " * (depth + 1) + instance_id + "\n")
+            out.write(f"所在集线器: {result['hub'] or '无'}\n")
+            out.write(f"禁用后会一起断开的设备: {len(result['descendants'])}\n")
+            for instance_id in result["descendants"]:
+                out.write(f"  {instance_id}\n")
+        else:
+            out.write(f"{options.device_id}\t未找到\n")
+        return 0 if result["found"] else 1
+
+    device_ids = _read_device_ids(options.device_ids, stdin)
+    if not device_ids:
+        sys.stderr.write("没有指定设备ID\n")
+        return 2
+
+    if options.command == "status":
+        results = query_status(device_ids)
+        if options.json:
+            _print_json(results, out)
+        else:
+            for result in results:
+                out.write(f"{result['device_id']}\t{_status_text(result)}\n")
+        return 0 if all(result["found"] for result in results) else 1
+
+    results = control_devices(options.command, device_ids, options.wait)
+    if options.json:
+        _print_json(results, out)
+    else:
+        action_text = "启用" if options.command == "enable" else "禁用"
+        for result in results:
+            outcome = "成功" if result["success"] else "失败"
+            line = f"{result['device_id']}\t{action_text}{outcome}\t{result['elapsed']:.2f}s"
+            if result["error"] and "state" in result:
+                line += f"\t{result['error']}"
+            out.write(line + "\n")
+
+    if not all(result["success"] for result in results):
+        # 命令本身失败（而不是等待目标状态超时）时提示可能缺少管理员权限
+        command_failed = any(not result["success"] and "state" not in result for result in results)
+        if command_failed and check_admin is not None and not check_admin():
+            sys.stderr.write("启用/禁用设备需要管理员权限，请以管理员身份运行\n")
+        return 1
+    return 0
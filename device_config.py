@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import threading
+
+from app_paths import app_path
+
+# 默认配置
+DEFAULT_CONFIG = {
+    "device_id": "USB\\VID_174C&PID_1153",
+    "use_full_id": False,
+    "full_device_id": "USB\\VID_174C&PID_1153\\MSFT3023456789013B"
+}
+
+# 修改配置后延迟写入的时间（秒），这段时间内的多次修改只写一次文件
+SAVE_DELAY = 0.5
+
+def partial_device_id(device_id):
+    """提取设备ID的部分ID (VID和PID部分)，找不到时返回None"""
+    vid_pid_match = re.search(r'(USB\\VID_[0-9A-F]{4}.*?PID_[0-9A-F]{4})', device_id, re.IGNORECASE)
+    return vid_pid_match.group(1) if vid_pid_match else None
+
+class ConfigStore:
+    """保存在内存中的配置，所有模块共用
+
+    文件修改时间变化时才重新读取；修改后延迟写入，先写临时文件再替换，
+    写入过程中程序退出也不会留下损坏的配置文件
+    """
+
+    def __init__(self, path=None, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._config = None
+        # 上次读取或写入时文件的修改时间
+        self._mtime = None
+        self._dirty = False
+        self._save_timer = None
+        # 设备ID（大写）-> "devices" 列表中的项
+        self._devices = {}
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """读取配置文件，文件不存在时创建默认配置，调用方需持有锁"""
+        mtime = self._file_mtime()
+        if mtime is None:
+            self._config = dict(DEFAULT_CONFIG)
+            self._write()
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._config = json.load(f)
+                self._mtime = mtime
+            except Exception as e:
+                print(f"读取配置文件失败: {e}")
+                if self._config is None:
+                    self._config = dict(DEFAULT_CONFIG)
+                # 文件内容有误时不反复读取，等待下一次修改
+                self._mtime = mtime
+        self._devices = {entry["id"].upper(): entry for entry in self._config.get("devices", [])
+                         if isinstance(entry, dict) and entry.get("id")}
+
+    def _ensure_current(self):
+        """第一次使用或文件被外部修改后（重新）读取，有未写入的修改时以内存中的为准，调用方需持有锁"""
+        if self._config is None or (not self._dirty and self._file_mtime() != self._mtime):
+            self._load()
+
+    def _write(self):
+        """写入配置文件（先写临时文件再替换），调用方需持有锁"""
+        if not self.path:
+            return True
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._config, f, indent=4, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._mtime = self._file_mtime()
+            self._dirty = False
+            return True
+        except Exception as e:
+            print(f"保存配置失败: {e}")
+            return False
+
+    def _schedule_save(self):
+        """延迟写入，调用方需持有锁"""
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def get(self):
+        """返回当前配置（副本）"""
+        with self._lock:
+            self._ensure_current()
+            return dict(self._config)
+
+    def replace(self, config):
+        """替换全部配置并立即写入"""
+        with self._lock:
+            self._config = dict(config)
+            self._devices = {entry["id"].upper(): entry for entry in self._config.get("devices", [])
+                             if isinstance(entry, dict) and entry.get("id")}
+            self._cancel_timer()
+            return self._write()
+
+    def update(self, changes):
+        """修改部分配置项，延迟写入，返回修改后的配置（副本）"""
+        with self._lock:
+            self._ensure_current()
+            self._config.update(changes)
+            self._schedule_save()
+            return dict(self._config)
+
+    def known_devices(self):
+        """config.json中 "devices" 列表里的设备"""
+        with self._lock:
+            self._ensure_current()
+            return list(self._devices.values())
+
+    def remember_device(self, device_id, name=None):
+        """把设备加入 "devices" 列表（已存在时只更新名称），延迟写入"""
+        with self._lock:
+            self._ensure_current()
+            entry = self._devices.get(device_id.upper())
+            if entry is None:
+                entry = {"id": device_id}
+                partial_id = partial_device_id(device_id)
+                if partial_id:
+                    entry["partial_id"] = partial_id
+                self._devices[device_id.upper()] = entry
+                self._config["devices"] = self._config.get("devices", []) + [entry]
+            elif not name or entry.get("name") == name:
+                return
+            if name:
+                entry["name"] = name
+            self._schedule_save()
+
+    def _cancel_timer(self):
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+
+    def flush(self):
+        """立即写入未保存的修改，例如程序退出前"""
+        with self._lock:
+            self._cancel_timer()
+            if self._dirty:
+                self._write()
+
+# 程序共用的配置
+config_store = ConfigStore(app_path("config.json"))
+
+def load_config():
+    """从config.json加载配置（文件未修改时直接使用内存中的配置）"""
+    return config_store.get()
+
+def save_config(config):
+    """保存配置到config.json"""
+    return config_store.replace(config)
+
+def update_config_with_device_id(device_id, name=None):
+    """根据找到的设备ID更新配置文件，并把设备记入 "devices" 列表"""
+    changes = {"use_full_id": True, "full_device_id": device_id}
+
+    # 提取设备ID的部分ID (VID和PID部分)
+    partial_id = partial_device_id(device_id)
+    if partial_id:
+        changes["device_id"] = partial_id
+
+    config_store.remember_device(device_id, name)
+    return config_store.update(changes)
@@ -0,0 +1,146 @@
+"""多设备监控面板的数据：每个轮询周期一次设备枚举，为所有被监控的设备提供状态
+
+被监控的设备来自config.json中的 "dashboard_devices"（没有配置时为 "devices" 中记住的设备）。
+每个周期从同一个设备清单快照中按ID查找所有设备，周期的开销（启动的进程数）与设备数量无关；
+只有状态变化的行会被标记，界面只更新这些行
+"""
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from device_state import DeviceState, DeviceStatus
+
+# 默认的轮询间隔（秒），可通过config.json中的 "dashboard_interval" 修改；
+# 状态来自设备清单快照，间隔小于快照有效期（inventory_ttl）时两次枚举之间的周期不会启动进程
+DEFAULT_DASHBOARD_INTERVAL = 5.0
+
+# 可排序的列
+SORT_KEYS = {
+    "device": lambda row: row.device_id.upper(),
+    "name": lambda row: (row.name or row.description).lower(),
+    "state": lambda row: (row.status_text(), row.device_id.upper()),
+    "last_change": lambda row: (row.last_change or 0.0, row.device_id.upper()),
+}
+
+@dataclass
+class DashboardRow:
+    """被监控的一个设备"""
+    device_id: str
+    # 配置中的名称，没有时显示设备描述
+    name: str = ""
+    description: str = ""
+    found: bool = False
+    state: DeviceState = DeviceState.UNKNOWN
+    problem_code: Optional[int] = None
+    # 最后一次状态变化的时间（time.time()），还没有查询过时为None
+    last_change: Optional[float] = None
+    # 是否已经得到过一次结果
+    checked: bool = False
+
+    def status_text(self):
+        if not self.checked:
+            return "等待查询"
+        if not self.found:
+            return "未找到"
+        return DeviceStatus(self.state, self.problem_code).text()
+
+def monitored_devices(config):
+    """返回被监控的设备 [(设备ID, 名称)]
+
+    "dashboard_devices" 中每项为设备ID或 {"id": 设备ID, "name": 名称}，没有配置时使用 "devices" 列表
+    """
+    entries = config.get("dashboard_devices")
+    if entries is None:
+        entries = config.get("devices", [])
+    devices = []
+    for entry in entries:
+        if isinstance(entry, str):
+            devices.append((entry, ""))
+        elif isinstance(entry, dict) and entry.get("id"):
+            devices.append((entry["id"], entry.get("name", "")))
+    return devices
+
+def collect_statuses(inventory, device_ids):
+    """从同一个设备清单快照中查询所有设备，返回 {设备ID: (DeviceStatus 或None, 描述)}
+
+    无法获得快照时返回None（不逐个设备回退查询，否则开销与设备数量成正比）
+    """
+    if inventory.snapshot() is None:
+        return None
+    statuses = {}
+    for device_id in device_ids:
+        record = inventory.lookup(device_id)
+        statuses[device_id] = (None, "") if record is None else (DeviceStatus.from_record(record), record.description)
+    return statuses
+
+class DeviceDashboard:
+    """被监控设备的当前状态，线程安全；后台线程写入查询结果，界面线程取走变化的行"""
+
+    def __init__(self, devices=()):
+        self._lock = threading.Lock()
+        # 设备ID（大写）-> 行，保持配置中的顺序
+        self._rows = {}
+        # 有变化、尚未被界面取走的设备ID（大写）
+        self._changed = set()
+        self.set_devices(devices)
+
+    def set_devices(self, devices):
+        """设置被监控的设备 [(设备ID, 名称)]，已有设备的状态保留"""
+        with self._lock:
+            rows = {}
+            for device_id, name in devices:
+                key = device_id.strip('"\'').strip().upper()
+                row = self._rows.get(key)
+                rows[key] = DashboardRow(device_id, name) if row is None else replace(row, name=name)
+            self._rows = rows
+            self._changed = set(rows)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    def device_ids(self):
+        with self._lock:
+            return [row.device_id for row in self._rows.values()]
+
+    def apply(self, statuses, now=None):
+        """写入一个周期的查询结果 {设备ID: (DeviceStatus 或None, 描述)}，返回状态变化的设备数量"""
+        now = time.time() if now is None else now
+        changed = 0
+        with self._lock:
+            for device_id, (status, description) in statuses.items():
+                key = device_id.strip('"\'').strip().upper()
+                row = self._rows.get(key)
+                if row is None:
+                    continue
+                found = status is not None
+                state = status.state if found else DeviceState.UNKNOWN
+                problem_code = status.problem_code if found else None
+                if row.checked and (row.found, row.state, row.problem_code, row.description) == (
+                        found, state, problem_code, description):
+                    continue
+                # 描述变化不算作状态变化
+                if not row.checked or (row.found, row.state, row.problem_code) != (found, state, problem_code):
+                    row.last_change = now
+                    changed += 1
+                row.found, row.state, row.problem_code = found, state, problem_code
+                row.description = description
+                row.checked = True
+                self._changed.add(key)
+        return changed
+
+    def take_changes(self):
+        """取走有变化的行（副本），耗时与变化的行数成正比"""
+        with self._lock:
+            changed = [replace(self._rows[key]) for key in self._changed if key in self._rows]
+            self._changed = set()
+        return changed
+
+    def rows(self, sort_by=None, reverse=False):
+        """所有行（副本），sort_by 为 SORT_KEYS 中的列名，为None时按配置中的顺序"""
+        with self._lock:
+            rows = [replace(row) for row in self._rows.values()]
+        if sort_by is not None:
+            rows.sort(key=SORT_KEYS[sort_by], reverse=reverse)
+        return rows
@@ -0,0 +1,228 @@
+import tkinter as tk
+from tkinter import ttk
+
+from device_index import DeviceSearchIndex
+
+# 列名、标题和宽度
+COLUMNS = (("name", "设备名称", 250), ("id", "设备ID", 300))
+
+class DeviceSelectionDialog:
+    """设备选择对话框，列表只创建可见的行
+
+    滚动、过滤和排序时只改写可见行的内容，设备数量很多时对话框也不会卡顿；
+    搜索框按设备名称、VID/PID和序列号即时过滤
+    """
+
+    def __init__(self, parent, on_select):
+        self.on_select = on_select
+        self.index = DeviceSearchIndex()
+        # 过滤和排序后的设备下标
+        self._view = []
+        # 第一个可见行在 _view 中的位置
+        self._offset = 0
+        # 选中设备的下标
+        self._selected = None
+        self._query = ""
+        self._sort_column = None
+        self._sort_reverse = False
+        self._refresh_pending = False
+        # 列表中的行ID，以及暂时移出列表的行
+        self._slots = []
+        self._detached = set()
+        self._row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+
+        dialog = self.window = tk.Toplevel(parent)
+        dialog.title("选择设备")
+        dialog.geometry("600x450")
+        dialog.transient(parent)
+        dialog.grab_set()
+
+        ttk.Label(dialog, text="请选择要控制的USB设备:").pack(pady=(10, 5))
+
+        # 搜索区域
+        search_frame = ttk.Frame(dialog)
+        search_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(search_frame, text="搜索:").pack(side=tk.LEFT)
+
+        self.query_var = tk.StringVar()
+        self.query_var.trace_add("write", lambda *args: self._schedule_refresh())
+        search_entry = ttk.Entry(search_frame, textvariable=self.query_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        self.count_label = ttk.Label(search_frame, text="")
+        self.count_label.pack(side=tk.RIGHT)
+
+        # 设备列表
+        list_frame = ttk.Frame(dialog)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tree = ttk.Treeview(list_frame, columns=[name for name, _, _ in COLUMNS],
+                                 show="headings", selectmode="browse")
+        for name, title, width in COLUMNS:
+            self.tree.heading(name, text=title, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Double-1>", lambda event: self.select())
+        for widget in (self.tree, search_entry):
+            widget.bind("<MouseWheel>", self._on_mouse_wheel)
+            widget.bind("<Button-4>", lambda event: self._scroll(-3))
+            widget.bind("<Button-5>", lambda event: self._scroll(3))
+            widget.bind("<Up>", lambda event: self._move_selection(-1))
+            widget.bind("<Down>", lambda event: self._move_selection(1))
+            widget.bind("<Prior>", lambda event: self._move_selection(-max(1, len(self._slots) - 1)))
+            widget.bind("<Next>", lambda event: self._move_selection(max(1, len(self._slots) - 1)))
+        dialog.bind("<Return>", lambda event: self.select())
+        dialog.bind("<Escape>", lambda event: dialog.destroy())
+
+        # 按钮区域
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        select_button = ttk.Button(button_frame, text="选择", command=self.select)
+        select_button.pack(side=tk.RIGHT, padx=5)
+
+        cancel_button = ttk.Button(button_frame, text="取消", command=dialog.destroy)
+        cancel_button.pack(side=tk.RIGHT, padx=5)
+
+        search_entry.focus_set()
+
+    def exists(self):
+        return bool(self.window.winfo_exists())
+
+    def add_devices(self, devices):
+        """追加设备（可在扫描过程中多次调用），列表在空闲时统一更新"""
+        self.index.add(devices)
+        self._schedule_refresh()
+
+    def sort_by(self, column):
+        """按列排序，再次点击同一列时反向"""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column = column
+            self._sort_reverse = False
+        for name, title, _ in COLUMNS:
+            arrow = (" ▼" if self._sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=title + arrow)
+        self._refresh()
+
+    def select(self):
+        """使用选中的设备并关闭对话框"""
+        if self._selected is None:
+            return
+        device = self.index.devices[self._selected]
+        self.on_select(device["id"], device["name"])
+        self.window.destroy()
+
+    def _schedule_refresh(self):
+        """连续输入或连续追加设备时只在空闲时过滤一次"""
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.window.after_idle(self._refresh)
+
+    def _refresh(self):
+        """重新计算过滤和排序后的视图"""
+        self._refresh_pending = False
+        if not self.exists():
+            return
+        query = self.query_var.get()
+        if query != self._query:
+            self._query = query
+            self._offset = 0
+        self._view = self.index.view(query, self._sort_column, self._sort_reverse)
+        self.count_label.config(text=f"{len(self._view)} / {len(self.index)}")
+        self._render()
+
+    def _on_resize(self, event):
+        """根据列表高度调整可见行的数量"""
+        visible = max(1, event.height // self._row_height - 1)
+        while len(self._slots) < visible:
+            self._slots.append(self.tree.insert("", tk.END, values=("", "")))
+        while len(self._slots) > visible:
+            slot = self._slots.pop()
+            self._detached.discard(slot)
+            self.tree.delete(slot)
+        self._render()
+
+    def _render(self):
+        """把视图中从 _offset 开始的设备写入可见行"""
+        total = len(self._view)
+        self._offset = max(0, min(self._offset, total - len(self._slots)))
+        devices = self.index.devices
+        selected_slot = None
+
+        for i, slot in enumerate(self._slots):
+            position = self._offset + i
+            if position >= total:
+                if slot not in self._detached:
+                    self.tree.detach(slot)
+                    self._detached.add(slot)
+                continue
+            if slot in self._detached:
+                self.tree.move(slot, "", i)
+                self._detached.discard(slot)
+            index = self._view[position]
+            device = devices[index]
+            self.tree.item(slot, values=(device["name"], device["id"]))
+            if index == self._selected:
+                selected_slot = slot
+
+        if selected_slot is not None:
+            self.tree.selection_set(selected_slot)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + len(self._slots)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll(self, rows):
+        self._offset += rows
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._offset = int(float(amount) * len(self._view))
+            self._render()
+        elif action == "scroll":
+            step = max(1, len(self._slots) - 1) if unit == "pages" else 1
+            self._scroll(int(amount) * step)
+
+    def _on_mouse_wheel(self, event):
+        return self._scroll(-3 if event.delta > 0 else 3)
+
+    def _on_tree_select(self, event):
+        """鼠标点击选中的行对应到设备下标"""
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self._slots:
+            return
+        position = self._offset + self._slots.index(selection[0])
+        if position < len(self._view):
+            self._selected = self._view[position]
+
+    def _move_selection(self, delta):
+        """用方向键/翻页键移动选中的设备，并保持其可见"""
+        if not self._view:
+            return "break"
+        try:
+            position = self._view.index(self._selected) + delta
+        except ValueError:
+            position = 0
+        position = max(0, min(len(self._view) - 1, position))
+        self._selected = self._view[position]
+
+        if position < self._offset:
+            self._offset = position
+        elif position >= self._offset + len(self._slots):
+            self._offset = position - len(self._slots) + 1
+        self._render()
+        return "break"
@@ -0,0 +1,987 @@
+import os
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext
+import itertools
+
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from backend_worker import INVENTORY_TTL_ENV, BackendWorkerClient, BackendWorkerError
+from command_runner import COMMAND_TIMEOUT_ENV, backend_health, command_timeout, set_command_timeout
+from device_backend import disable_device, enable_device, iter_usb_devices
+from device_batch import DEFAULT_MAX_WORKERS, get_device_groups, submit_batch
+from device_config import config_store, update_config_with_device_id
+from device_dashboard import DEFAULT_DASHBOARD_INTERVAL, DeviceDashboard, collect_statuses, monitored_devices
+from dashboard_view import DashboardView
+from device_dialog import DeviceSelectionDialog
+from device_inventory import DeviceInventory
+from device_state import DeviceState, DeviceStatus
+from device_tasks import DeviceTaskExecutor, SingleFlight
+from device_watch import DeviceEvent, HookRunner, HotplugMonitor
+from device_transition import (
+    DEFAULT_CONFIRM_TIMEOUT,
+    TransitionResult,
+    control_and_confirm,
+    format_transition_stats,
+    transition_stats,
+)
+from log_buffer import DEFAULT_LOG_CAPACITY, LogBuffer
+from metrics import format_report, metrics, metrics_file_path, profile_once
+from poll_scheduler import AdaptivePollScheduler
+from state_cache import state_cache
+from ui_queue import UiUpdateQueue
+from wmi_backend import BACKEND_ENV, set_backend_preference
+
+# 统计页面显示时的刷新间隔，以及写入指标文件的间隔
+STATS_REFRESH_MS = 2000
+METRICS_WRITE_MS = 30000
+# 界面线程每帧（约16毫秒）执行一次后台线程提交的界面更新，日志文本框也最多每帧更新一次
+UI_FRAME_MS = 16
+
+# 各设备状态下 (启用按钮, 禁用按钮) 是否可用
+# 出现问题或状态未知时两个操作都允许（例如禁用后重新启用以恢复设备），已断开连接的设备无法操作
+STATE_BUTTONS = {
+    DeviceState.STARTED: (False, True),
+    DeviceState.DISABLED: (True, False),
+    DeviceState.PROBLEM: (True, True),
+    DeviceState.DISCONNECTED: (False, False),
+    DeviceState.UNKNOWN: (True, True),
+}
+
+class DeviceControllerGUI:
+    def __init__(self, root):
+        self._init_started = time.perf_counter()
+        self._first_paint_done = False
+        self.root = root
+        self.root.title("USB设备控制器")
+        self.root.geometry("800x600")
+        self.root.minsize(600, 400)
+        
+        # 配置信息
+        self.config = config_store.get()
+        
+        # 共享的设备清单快照，避免每次刷新都为每个设备启动多个pnputil进程
+        self.inventory = DeviceInventory(ttl=self.config.get("inventory_ttl", 5))
+        # 每次枚举和状态查询的结果写入磁盘缓存，下次启动时先显示缓存中的状态（标记为待确认）
+        self.inventory.add_listener(state_cache.update_inventory)
+        self._status_stale = False
+        self._stale_status_text = ""
+        
+        # 所有后台任务在固定数量的线程中执行，同一设备的任务按顺序串行执行
+        self.executor = DeviceTaskExecutor(max_workers=self.config.get("task_workers", 4))
+        self._last_busy_warning = 0.0
+        # 关闭窗口后不再提交新的后台任务（枚举线程中的插拔回调可能晚于执行器关闭）
+        self._closing = False
+        
+        # 并发的状态刷新共享同一次查询；结果带序号，过期的结果不会覆盖较新的结果
+        self._status_flight = SingleFlight()
+        self._status_seq = itertools.count(1)
+        self._applied_status_seq = 0
+        self._stale_status_seq = 0
+        
+        # pnputil/devcon 单个命令的超时（秒），超时后结束进程树；连续超时后暂停调用该工具（后端降级）
+        if "command_timeout" in self.config:
+            set_command_timeout(self.config["command_timeout"])
+        self._degraded = []
+        
+        # 设备查询后端：auto（默认，能用WMI时在进程内查询，不启动pnputil）、wmi 或 pnputil，第一次查询时在后台检测
+        set_backend_preference(self.config.get("backend"))
+        
+        # 可选的常驻后端进程，避免每次查询都启动新的进程
+        self.worker = None
+        if self.config.get("use_backend_worker", False):
+            worker_env = dict(os.environ, **{COMMAND_TIMEOUT_ENV: str(command_timeout()),
+                                             INVENTORY_TTL_ENV: str(self.config.get("inventory_ttl", 5))})
+            if self.config.get("backend"):
+                worker_env[BACKEND_ENV] = self.config["backend"]
+            self.worker = BackendWorkerClient(env=worker_env)
+        
+        # 设备插拔检测：比较每次枚举得到的快照，设备连接、移除或状态变化时写入日志并运行 hotplug_hook 命令；
+        # 使用常驻后端进程时由后端进程比较快照，每次状态刷新后取回新的事件
+        self.hotplug = HotplugMonitor()
+        self.hotplug.subscribe(self._on_hotplug_events)
+        if self.config.get("hotplug_hook"):
+            self.hotplug.subscribe(HookRunner(self.config["hotplug_hook"]))
+        self._hotplug_cursor = 0
+        if self.worker is None:
+            self.hotplug.attach(self.inventory)
+            # 使用WMI枚举时快照中没有设备关系，在后台单独枚举一次，供禁用前的确认使用
+            self._submit_task("topology", self.inventory.topology, tag="topology")
+        
+        # 多设备监控面板：config.json中 "dashboard_devices"（没有配置时为 "devices"）中的设备，
+        # 只在"监控"标签页可见时轮询；每个周期从当前设备状态刷新所用的同一个快照中查找所有设备，
+        # 快照超过 inventory_ttl 时才重新枚举
+        self.dashboard = DeviceDashboard(monitored_devices(self.config))
+        self.dashboard_interval_ms = int(self.config.get("dashboard_interval", DEFAULT_DASHBOARD_INTERVAL) * 1000)
+        self.dashboard_timer = None
+        
+        # 启用/禁用后等待设备进入目标状态的最长时间（秒），0表示不等待
+        self.confirm_timeout = self.config.get("confirm_timeout", DEFAULT_CONFIRM_TIMEOUT)
+        
+        # 创建设备ID变量
+        self.device_id_var = tk.StringVar(value=self.config.get("full_device_id", ""))
+        self.current_device_id = self.config.get("full_device_id", "")
+        
+        # 可选的指标文件（JSON或Prometheus文本格式）
+        self.metrics_path = metrics_file_path(self.config)
+        self.metrics_timer = None
+        self.stats_timer = None
+        
+        # 界面日志保存在固定容量的环形缓冲区中，文本框批量更新
+        self.log_buffer = LogBuffer(self.config.get("log_capacity", DEFAULT_LOG_CAPACITY))
+        # 文本框当前显示的 (第一行序号, 最后一行序号, 最后一行的重复次数)
+        self._log_shown = (0, 0, 0)
+        self._log_dirty = False
+        
+        # 后台线程不直接操作控件，而是把界面更新提交到队列，由界面线程每帧统一执行；
+        # 同一设备排队中的多个状态结果只执行最新的一个
+        self.ui_queue = UiUpdateQueue()
+        self._ui_timer = None
+        # 控件当前显示的选项，只有显示的内容变化时才修改控件
+        self._widget_options = {}
+        
+        # 设置界面布局
+        self.setup_ui()
+        self._ui_timer = self.root.after(UI_FRAME_MS, self._drain_ui_queue)
+        
+        # 加载设备
+        self.load_current_device()
+        
+        # 添加定时器，按自适应间隔刷新设备状态，窗口最小化时暂停
+        self.poll_scheduler = AdaptivePollScheduler.from_config(self.config)
+        self.status_timer = None
+        self.root.bind("<Unmap>", self._on_window_unmap)
+        self.root.bind("<Map>", self._on_window_map)
+        self.start_status_timer()
+        if self.metrics_path:
+            self.metrics_timer = self.root.after(METRICS_WRITE_MS, self._write_metrics)
+    
+    def setup_ui(self):
+        # 创建主框架
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # 创建设备选择区域
+        device_frame = ttk.LabelFrame(main_frame, text="设备选择", padding="10")
+        device_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(device_frame, text="当前设备ID:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        
+        # 下拉列表中是config.json的 "devices" 中记录的设备，可以直接切换
+        self.device_combo = ttk.Combobox(device_frame, textvariable=self.device_id_var, width=50)
+        self.device_combo.grid(row=0, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
+        self.device_combo.bind("<<ComboboxSelected>>", lambda event: self.select_device(self.device_id_var.get()))
+        self._update_known_devices()
+        
+        scan_button = ttk.Button(device_frame, text="扫描设备", command=self.scan_devices)
+        scan_button.grid(row=0, column=2, padx=5, pady=5)
+        
+        device_frame.columnconfigure(1, weight=1)
+        
+        # 创建设备分组区域（仅在config.json中配置了device_groups时显示）
+        self.device_groups = get_device_groups(self.config)
+        if self.device_groups:
+            group_frame = ttk.LabelFrame(main_frame, text="设备分组", padding="10")
+            group_frame.pack(fill=tk.X, pady=5)
+            
+            ttk.Label(group_frame, text="分组:").pack(side=tk.LEFT, padx=5)
+            
+            group_names = list(self.device_groups)
+            self.group_var = tk.StringVar(value=group_names[0])
+            group_combo = ttk.Combobox(group_frame, textvariable=self.group_var, values=group_names, state="readonly")
+            group_combo.pack(side=tk.LEFT, padx=5)
+            
+            self.group_enable_button = ttk.Button(group_frame, text="批量启用", command=lambda: self.run_group_batch("enable"))
+            self.group_enable_button.pack(side=tk.LEFT, padx=5)
+            
+            self.group_disable_button = ttk.Button(group_frame, text="批量禁用", command=lambda: self.run_group_batch("disable"))
+            self.group_disable_button.pack(side=tk.LEFT, padx=5)
+        
+        # 创建设备状态和统计标签页
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        status_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(status_frame, text="设备状态")
+        
+        # 设备信息文本区域
+        self.status_text = scrolledtext.ScrolledText(status_frame, wrap=tk.WORD, height=10, width=70)
+        self.status_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.status_text.config(state=tk.DISABLED)
+        
+        # 多设备监控：表格可以按列排序，选中的设备可以启用/禁用
+        self.dashboard_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.dashboard_frame, text="监控")
+        self.dashboard_view = DashboardView(self.dashboard_frame, self.control_dashboard_devices)
+        self.dashboard.take_changes()
+        self.dashboard_view.set_rows(self.dashboard.rows())
+        
+        # 统计区域：命令耗时、启动的进程数、命令形式回退和后台任务情况
+        self.stats_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.stats_frame, text="统计")
+        
+        self.stats_text = scrolledtext.ScrolledText(self.stats_frame, wrap=tk.NONE, height=10, width=70)
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.stats_text.config(state=tk.DISABLED)
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        
+        # 创建操作按钮区域
+        button_frame = ttk.Frame(main_frame, padding="10")
+        button_frame.pack(fill=tk.X, pady=5)
+        
+        self.enable_button = ttk.Button(button_frame, text="启用设备", command=self.enable_current_device)
+        self.enable_button.pack(side=tk.LEFT, padx=5)
+        
+        self.disable_button = ttk.Button(button_frame, text="禁用设备", command=self.disable_current_device)
+        self.disable_button.pack(side=tk.LEFT, padx=5)
+        
+        refresh_button = ttk.Button(button_frame, text="刷新状态", command=self.refresh_device_status)
+        refresh_button.pack(side=tk.LEFT, padx=5)
+        
+        # 添加状态栏
+        self.status_bar = ttk.Label(main_frame, text="就绪", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+    
+    def _configure(self, widget, **options):
+        """修改控件选项，与当前显示的相同时不做任何操作，避免重复重绘"""
+        shown = self._widget_options.setdefault(str(widget), {})
+        changed = {name: value for name, value in options.items() if shown.get(name) != value}
+        if not changed:
+            return
+        widget.config(**changed)
+        shown.update(changed)
+    
+    def _set_buttons(self, enable, disable):
+        """设置启用/禁用按钮是否可用"""
+        self._configure(self.enable_button, state=tk.NORMAL if enable else tk.DISABLED)
+        self._configure(self.disable_button, state=tk.NORMAL if disable else tk.DISABLED)
+    
+    def _set_group_buttons(self, enabled):
+        state = tk.NORMAL if enabled else tk.DISABLED
+        self._configure(self.group_enable_button, state=state)
+        self._configure(self.group_disable_button, state=state)
+    
+    def load_current_device(self):
+        """加载当前配置中的设备"""
+        if self.config.get("use_full_id", False) and self.config.get("full_device_id"):
+            self.current_device_id = self.config.get("full_device_id")
+            self.device_id_var.set(self.current_device_id)
+            # 先显示上次记录的状态，后台查询完成后再替换
+            self._show_cached_status(self.current_device_id)
+            self.refresh_device_status()
+        else:
+            self.log_message("未配置设备，请扫描并选择一个设备。")
+    
+    def _show_cached_status(self, device_id):
+        """显示缓存中上次记录的设备状态，标记为待确认，确认之前操作按钮不可用"""
+        cached = state_cache.cached_status(device_id)
+        if cached is None:
+            self._status_stale = False
+            return
+        
+        status, description, saved_at = cached
+        when = time.strftime("%m-%d %H:%M", time.localtime(saved_at))
+        self._status_stale = True
+        self._stale_status_text = f"设备状态: {status.text()} (上次记录于 {when}"
+        self.log_message(f"上次记录的设备状态: {status.text()} ({when})，正在确认...")
+        self._configure(self.status_bar, text=f"{self._stale_status_text}，正在确认...)")
+        self._set_buttons(False, False)
+        self._record_first_paint("cache")
+    
+    def _record_first_paint(self, source):
+        """记录第一次显示设备状态的时间（source 为 cache 或 live）"""
+        if self._first_paint_done:
+            return
+        self._first_paint_done = True
+        metrics.observe("first_paint_seconds", time.perf_counter() - self._init_started, source=source)
+    
+    def _confirm_status(self):
+        """后台查询得到了当前设备的状态，缓存中的状态不再显示"""
+        self._status_stale = False
+        self._record_first_paint("live")
+    
+    def scan_devices(self):
+        """扫描并选择设备"""
+        self.log_message("正在扫描USB设备...")
+        
+        # 每次扫描使用新的选择对话框
+        self._device_dialog = None
+        
+        # 在后台线程中扫描设备，避免界面卡顿
+        self._submit_task("scan", self._scan_devices_thread, tag="scan")
+    
+    def _scan_devices_thread(self):
+        # 逐个获取USB设备，每解析出一批就追加到选择对话框中
+        batch = []
+        count = 0
+        last_flush = time.monotonic()
+        
+        # 与状态刷新共用设备清单快照，快照未过期时不需要再次枚举；否则边枚举边显示，枚举完成后更新快照
+        for device in iter_usb_devices(self.inventory):
+            batch.append(device)
+            count += 1
+            
+            # 第一个设备立即显示对话框，之后每隔一段时间批量追加，避免频繁刷新界面
+            if count == 1 or time.monotonic() - last_flush >= 0.1:
+                self.ui_queue.post(self._add_scanned_devices, batch)
+                batch = []
+                last_flush = time.monotonic()
+        
+        if batch:
+            self.ui_queue.post(self._add_scanned_devices, batch)
+        
+        if not count:
+            self.log_message("未找到任何USB设备。")
+            return
+        
+        self.log_message(f"扫描完成，共找到 {count} 个USB设备")
+    
+    def _add_scanned_devices(self, devices):
+        """把扫描到的设备追加到选择对话框，对话框不存在时先创建"""
+        dialog = getattr(self, "_device_dialog", None)
+        if dialog is None or not dialog.exists():
+            dialog = self._show_device_selection_dialog([])
+        dialog.add_devices(devices)
+    
+    def _show_device_selection_dialog(self, devices):
+        """显示设备选择对话框，列表只创建可见的行，支持搜索和按列排序"""
+        dialog = DeviceSelectionDialog(self.root, self.select_device)
+        dialog.add_devices(devices)
+        self._device_dialog = dialog
+        return dialog
+    
+    def _update_known_devices(self):
+        self.device_combo.config(values=[device["id"] for device in config_store.known_devices()])
+    
+    def select_device(self, device_id, name=None):
+        """选择并保存设备ID"""
+        # 之前设备排队中的状态刷新不再需要
+        if self.current_device_id:
+            self.executor.cancel_pending(self.current_device_id, tag="refresh")
+        
+        self.current_device_id = device_id
+        self.device_id_var.set(device_id)
+        
+        # 更新配置
+        self.config = update_config_with_device_id(device_id, name)
+        self._update_known_devices()
+        
+        self.log_message(f"已选择设备: {device_id}")
+        # 没有配置 "dashboard_devices" 时监控面板显示 "devices" 中的设备，其中可能多了新选择的设备
+        self._reload_dashboard()
+        self._show_cached_status(device_id)
+        self.refresh_device_status()
+    
+    def enable_current_device(self):
+        """启用当前设备"""
+        if not self.current_device_id:
+            messagebox.showwarning("警告", "未选择设备")
+            return
+        
+        # 禁用按钮，避免重复点击
+        self._set_buttons(False, False)
+        
+        self._configure(self.status_bar, text="正在启用设备...")
+        self.log_message(f"正在启用设备: {self.current_device_id}")
+        
+        # 在后台线程中执行设备操作，之前排队的状态刷新已经没有意义
+        self.executor.cancel_pending(self.current_device_id, tag="refresh")
+        self._submit_task(self.current_device_id, self._enable_device_thread, self.current_device_id)
+    
+    def _enable_device_thread(self, device_id):
+        result = self._call_backend("enable", device_id)
+        self._mark_status_stale()
+        
+        # 在主线程中更新UI
+        self.ui_queue.post(self._handle_enable_result, result)
+    
+    def _handle_enable_result(self, result):
+        if self._log_control_result(result):
+            self.log_message("设备已成功启用")
+            self._configure(self.status_bar, text="设备已启用")
+        else:
+            self.log_message("启用设备失败")
+            self._configure(self.status_bar, text="操作失败")
+            messagebox.showerror("错误", "启用设备失败")
+        
+        # 稍后刷新设备状态，之后在设备切换状态期间保持快速轮询
+        self.schedule_status_poll(self.poll_scheduler.kick())
+        
+        # 重新启用按钮
+        self._set_buttons(True, True)
+    
+    def disable_current_device(self):
+        """禁用当前设备"""
+        if not self.current_device_id:
+            messagebox.showwarning("警告", "未选择设备")
+            return
+        
+        # 禁用集线器等带有子设备的设备时，下面的设备会一起断开，先请用户确认
+        affected = self._devices_affected_by(self.current_device_id)
+        if affected and not messagebox.askyesno("确认", f"禁用此设备会同时断开以下 {len(affected)} 个设备:\n\n"
+                                                + "\n".join(affected[:10]) + ("\n..." if len(affected) > 10 else "")
+                                                + "\n\n是否继续？"):
+            return
+        
+        # 禁用按钮，避免重复点击
+        self._set_buttons(False, False)
+        
+        self._configure(self.status_bar, text="正在禁用设备...")
+        self.log_message(f"正在禁用设备: {self.current_device_id}")
+        
+        # 在后台线程中执行设备操作，之前排队的状态刷新已经没有意义
+        self.executor.cancel_pending(self.current_device_id, tag="refresh")
+        self._submit_task(self.current_device_id, self._disable_device_thread, self.current_device_id)
+    
+    def _devices_affected_by(self, device_id):
+        """根据上一次枚举得到的设备关系，返回禁用该设备时会一起断开的设备（名称或实例ID）"""
+        # 还没有枚举过时使用缓存中上次的设备关系
+        topology = self.inventory.topology(refresh=False) or state_cache.cached_topology()
+        if topology is None:
+            return []
+        affected = []
+        for descendant in topology.descendants(device_id):
+            record = topology.record(descendant)
+            affected.append(f"{record.description} ({descendant})" if record and record.description else descendant)
+        return affected
+    
+    def _disable_device_thread(self, device_id):
+        result = self._call_backend("disable", device_id)
+        self._mark_status_stale()
+        
+        # 在主线程中更新UI
+        self.ui_queue.post(self._handle_disable_result, result)
+    
+    def _handle_disable_result(self, result):
+        if self._log_control_result(result):
+            self.log_message("设备已成功禁用")
+            self._configure(self.status_bar, text="设备已禁用")
+        else:
+            self.log_message("禁用设备失败")
+            self._configure(self.status_bar, text="操作失败")
+            messagebox.showerror("错误", "禁用设备失败")
+        
+        # 稍后刷新设备状态，之后在设备切换状态期间保持快速轮询
+        self.schedule_status_poll(self.poll_scheduler.kick())
+        
+        # 重新启用按钮
+        self._set_buttons(True, True)
+    
+    def run_group_batch(self, action):
+        """批量启用或禁用当前选择的设备分组"""
+        group_name = self.group_var.get()
+        if group_name not in self.device_groups:
+            messagebox.showwarning("警告", "未选择设备分组")
+            return
+        
+        # 禁用按钮，避免重复点击
+        self._set_group_buttons(False)
+        
+        action_text = "启用" if action == "enable" else "禁用"
+        self._configure(self.status_bar, text=f"正在批量{action_text}分组 {group_name}...")
+        self.log_message(f"正在批量{action_text}分组: {group_name}")
+        
+        # 每个设备的操作按依赖顺序分别提交给后台任务执行器，与该设备的其他任务按顺序串行执行，
+        # 之前排队的状态刷新已经没有意义
+        device_ids, parents = self.device_groups[group_name]
+        for device_id in device_ids:
+            self.executor.cancel_pending(device_id, tag="refresh")
+        start = time.monotonic()
+        submit_batch(self._submit_task, device_ids, action, parents,
+                     max_workers=self.config.get("batch_max_workers", DEFAULT_MAX_WORKERS),
+                     operation=lambda device_id: self._call_backend(action, device_id),
+                     on_complete=lambda results: self._group_batch_done(group_name, action, results, start))
+    
+    def _group_batch_done(self, group_name, action, results, start):
+        """所有设备完成后调用（在后台线程中）"""
+        elapsed = time.monotonic() - start
+        self._mark_status_stale()
+        
+        # 在主线程中更新UI
+        self.ui_queue.post(self._handle_group_batch_result, group_name, action, results, elapsed)
+    
+    def _handle_group_batch_result(self, group_name, action, results, elapsed):
+        action_text = "启用" if action == "enable" else "禁用"
+        for result in results:
+            outcome = "成功" if result.success else f"失败({result.error})"
+            self.log_message(f"{action_text} {result.device_id}: {outcome}，耗时 {result.elapsed:.2f} 秒")
+        
+        failed = sum(1 for result in results if not result.success)
+        summary = f"分组 {group_name} 批量{action_text}完成，共 {len(results)} 个设备，失败 {failed} 个，总耗时 {elapsed:.2f} 秒"
+        self.log_message(summary)
+        self._configure(self.status_bar, text=summary)
+        if failed:
+            messagebox.showerror("错误", f"分组 {group_name} 中有 {failed} 个设备{action_text}失败")
+        
+        # 稍后刷新设备状态，之后在设备切换状态期间保持快速轮询
+        self.schedule_status_poll(self.poll_scheduler.kick())
+        
+        # 重新启用按钮
+        self._set_group_buttons(True)
+    
+    def _reload_dashboard(self):
+        """按当前配置重新设置被监控的设备并重建表格"""
+        devices = monitored_devices(self.config)
+        if [device_id for device_id, _ in devices] != self.dashboard.device_ids():
+            self.dashboard.set_devices(devices)
+            self.dashboard.take_changes()
+            self.dashboard_view.set_rows(self.dashboard.rows())
+    
+    def _on_tab_changed(self, event):
+        """切换标签页时启动或停止统计页面和监控页面的定时刷新"""
+        self.refresh_stats()
+        self.refresh_dashboard()
+    
+    def refresh_dashboard(self):
+        """监控页面可见时按固定间隔刷新所有被监控设备的状态，窗口最小化或没有被监控的设备时跳过"""
+        if self.dashboard_timer:
+            self.root.after_cancel(self.dashboard_timer)
+            self.dashboard_timer = None
+        # 其他页面可见时不轮询，否则空闲的窗口也会每个周期枚举一次设备
+        if self.notebook.select() != str(self.dashboard_frame):
+            return
+        
+        self.dashboard_timer = self.root.after(self.dashboard_interval_ms, self.refresh_dashboard)
+        if self.poll_scheduler.paused or not len(self.dashboard):
+            return
+        # 上一次刷新还在排队时合并
+        self._submit_task("dashboard", self._refresh_dashboard_thread, tag="refresh")
+    
+    def _refresh_dashboard_thread(self):
+        """一次枚举（或一次后端进程请求）得到所有被监控设备的状态"""
+        device_ids = self.dashboard.device_ids()
+        with metrics.timer("dashboard_cycle_seconds"):
+            try:
+                statuses = self._collect_dashboard_statuses(device_ids)
+            except Exception as e:
+                self.log_message(f"监控面板刷新出错: {e}")
+                return
+        if statuses is None:
+            self.log_message("监控面板: 无法枚举设备")
+            return
+        self.dashboard.apply(statuses)
+        self.ui_queue.post_latest("dashboard", self._render_dashboard)
+    
+    def _collect_dashboard_statuses(self, device_ids):
+        """返回 {设备ID: (DeviceStatus 或None, 描述)}，无法枚举时返回None"""
+        if self.worker is None:
+            return collect_statuses(self.inventory, device_ids)
+        result = self.worker.call("statuses", timeout=command_timeout() * 4, device_ids=device_ids)
+        return {device_id: (None, "") if item is None else (DeviceStatus.from_dict(item), item.get("description", ""))
+                for device_id, item in result.items()}
+    
+    def _render_dashboard(self):
+        self.dashboard_view.update_rows(self.dashboard.take_changes())
+    
+    def control_dashboard_devices(self, action, device_ids):
+        """监控面板中启用/禁用选中的设备，同一设备的操作与其他任务按顺序执行"""
+        action_text = "启用" if action == "enable" else "禁用"
+        if action == "disable":
+            affected = sorted({item for device_id in device_ids for item in self._devices_affected_by(device_id)})
+            if affected and not messagebox.askyesno("确认", f"禁用所选设备会同时断开以下 {len(affected)} 个设备:\n\n"
+                                                    + "\n".join(affected[:10]) + ("\n..." if len(affected) > 10 else "")
+                                                    + "\n\n是否继续？"):
+                return
+        if len(device_ids) > 1 and not messagebox.askyesno("确认", f"{action_text}所选的 {len(device_ids)} 个设备？"):
+            return
+        
+        for device_id in device_ids:
+            self.log_message(f"正在{action_text}设备: {device_id}")
+            self.executor.cancel_pending(device_id, tag="refresh")
+            self._submit_task(device_id, self._dashboard_control_thread, action, device_id)
+    
+    def _dashboard_control_thread(self, action, device_id):
+        result = self._call_backend(action, device_id)
+        if device_id == self.current_device_id:
+            self._mark_status_stale()
+        self.ui_queue.post(self._handle_dashboard_control_result, action, device_id, result)
+    
+    def _handle_dashboard_control_result(self, action, device_id, result):
+        action_text = "启用" if action == "enable" else "禁用"
+        if self._log_control_result(result):
+            self.log_message(f"{action_text} {device_id}: 成功")
+        else:
+            self.log_message(f"{action_text} {device_id}: 失败")
+        # 立即刷新监控面板，当前设备被操作时也刷新主界面的状态
+        self._submit_task("dashboard", self._refresh_dashboard_thread, tag="refresh")
+        if device_id == self.current_device_id:
+            self.schedule_status_poll(self.poll_scheduler.kick())
+    
+    def _call_backend(self, op, device_id):
+        """执行设备查询(status)或操作(enable/disable)，启用常驻后端进程时转发给它
+
+        设置了 confirm_timeout 时启用/禁用会等待设备进入目标状态，返回 TransitionResult
+        """
+        confirm = op in ("enable", "disable") and self.confirm_timeout > 0
+        with metrics.timer("backend_call_seconds", op=op, via="worker" if self.worker is not None else "local"):
+            if self.worker is not None:
+                params = {"confirm_timeout": self.confirm_timeout} if confirm else {}
+                # 后端进程中每个命令都有超时，一次操作最多依次尝试几种命令形式
+                timeout = command_timeout() * 4 + (self.confirm_timeout if confirm else 0)
+                try:
+                    result = self.worker.call(op, timeout=timeout, device_id=device_id, **params)
+                except (BackendWorkerError, FutureTimeoutError):
+                    if op == "status":
+                        raise
+                    return TransitionResult(device_id, op, False) if confirm else False
+                if op == "status":
+                    return None if result is None else DeviceStatus.from_dict(result)
+                if confirm:
+                    # 切换耗时在本进程中汇总，显示在统计页面
+                    result = TransitionResult(**result)
+                    transition_stats.record(result)
+                return result
+            
+            if op == "status":
+                return self.inventory.query_status(device_id)
+            
+            if confirm:
+                result = control_and_confirm(device_id, op, self.confirm_timeout)
+            else:
+                result = enable_device(device_id) if op == "enable" else disable_device(device_id)
+            self.inventory.invalidate()
+            return result
+    
+    def _log_control_result(self, result):
+        """记录等待目标状态的结果，返回启用/禁用命令是否成功"""
+        if not isinstance(result, TransitionResult):
+            return bool(result)
+        if result.confirmed:
+            self.log_message(f"设备已进入目标状态，切换用时 {result.transition_seconds:.2f}s"
+                             f" (命令 {result.command_seconds:.2f}s)")
+        elif result.success:
+            status = DeviceStatus(DeviceState(result.state), result.problem_code)
+            self.log_message(f"{self.confirm_timeout:g}s 内未观察到目标状态，当前状态: {status.text()}")
+        return result.success
+    
+    def _mark_status_stale(self):
+        """设备状态已被改变，之前发起的状态查询结果全部作废"""
+        self._stale_status_seq = next(self._status_seq)
+    
+    def refresh_device_status(self):
+        """刷新设备状态"""
+        if not self.current_device_id:
+            return
+        
+        # 在后台线程中获取设备状态，避免界面卡顿；同一设备排队中的刷新会合并
+        self._submit_task(self.current_device_id, self._refresh_device_status_thread, self.current_device_id, tag="refresh")
+    
+    def _submit_task(self, key, fn, *args, tag=None):
+        """提交后台任务，任务排队过多时在日志中提示（最多每分钟一次）；窗口正在关闭时忽略并返回 None"""
+        if self._closing:
+            return None
+        try:
+            future = self.executor.submit(key, fn, *args, tag=tag)
+        except RuntimeError:
+            # 其他线程检查标志后执行器才关闭
+            if self._closing:
+                return None
+            raise
+        future.add_done_callback(self._report_task_error)
+        
+        stats = self.executor.stats()
+        if stats["queued"] > self.executor.max_workers and time.monotonic() - self._last_busy_warning > 60:
+            self._last_busy_warning = time.monotonic()
+            self.log_message(f"后台任务繁忙: {stats['queued']} 个任务排队，平均等待 {stats['avg_wait_ms']:.0f} ms")
+        return future
+    
+    @staticmethod
+    def _report_task_error(future):
+        """后台任务出现未处理的异常时写入日志文件"""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"后台任务出错: {future.exception()!r}")
+    
+    def _refresh_device_status_thread(self, device_id):
+        # 同一设备正在进行的查询（且发起于最近一次启用/禁用之后）直接共享其结果
+        seq, status, error = self._status_flight.do((device_id, self._stale_status_seq), self._query_device_status, device_id)
+        if self.worker is not None:
+            self._fetch_worker_events()
+        
+        # 在主线程中更新UI，同一设备尚未显示的旧结果被替换
+        key = ("status", device_id)
+        if error is not None:
+            self.ui_queue.post_latest(key, self._update_status_error, error, seq, device_id, version=seq)
+        elif status is None:
+            self.ui_queue.post_latest(key, self._update_status_not_found, seq, device_id, version=seq)
+        else:
+            self.ui_queue.post_latest(key, self._update_status_ui, status, seq, device_id, version=seq)
+        self.ui_queue.post_latest("backend_health", self._update_backend_health, self._fetch_backend_health())
+    
+    def _fetch_backend_health(self):
+        """返回暂停调用的工具（熔断器快照列表），使用常驻后端进程时从后端进程获取"""
+        if self.worker is None:
+            return backend_health()
+        try:
+            return self.worker.call("health", timeout=5)
+        except Exception:
+            return []
+    
+    def _update_backend_health(self, health):
+        """工具被熔断器暂停时显示后端降级，并在恢复试探之前不再发起状态刷新"""
+        was_degraded = bool(self._degraded)
+        self._degraded = health
+        if not health:
+            if was_degraded:
+                self.log_message("后端已恢复")
+            return
+        
+        tools = "、".join(item["tool"] for item in health)
+        retry_in = max(item["retry_in"] for item in health)
+        if not was_degraded:
+            self.log_message(f"后端降级: {tools} 连续超时或无法启动，已暂停调用，{retry_in:.0f}s 后重试")
+        self._configure(self.status_bar, text=f"后端降级: {tools} 暂停调用")
+        self._set_buttons(False, False)
+        self.schedule_status_poll(max(int(retry_in * 1000), self.poll_scheduler.min_interval_ms))
+    
+    def _fetch_worker_events(self):
+        """取回后端进程比较快照得到的设备插拔事件"""
+        try:
+            events = self.worker.call("events", timeout=5, since=self._hotplug_cursor)
+        except Exception:
+            return
+        if events:
+            self._hotplug_cursor = events[-1]["seq"]
+            self.hotplug.publish([DeviceEvent(**event) for event in events])
+    
+    def _on_hotplug_events(self, events):
+        """设备插拔事件（在执行枚举的线程中调用），转到主线程显示"""
+        if self._closing:
+            return
+        self.ui_queue.post(self._show_hotplug_events, events)
+        # 设备连接或移除后设备关系可能变化
+        if self.worker is None and any(event.kind != "state_changed" for event in events):
+            self.inventory.invalidate_relations()
+            self._submit_task("topology", self.inventory.topology, tag="topology")
+    
+    def _show_hotplug_events(self, events):
+        for event in events:
+            self.log_message(event.text())
+        # 当前设备被插拔时保持一段时间的快速轮询，及时显示重新连接后的状态
+        current = self.current_device_id.upper()
+        if current and any(event.instance_id.upper() == current for event in events):
+            self.schedule_status_poll(self.poll_scheduler.kick())
+    
+    def _query_device_status(self, device_id):
+        """查询设备状态，返回 (序号, DeviceStatus, 错误信息)，设备不存在时状态为None"""
+        seq = next(self._status_seq)
+        try:
+            # 优先从设备清单快照中查询，枚举失败时回退到逐个设备查询
+            # 设置了 DMCONTROL_PROFILE 时用cProfile分析第一次刷新
+            return seq, profile_once("refresh", self._call_backend, "status", device_id), None
+        except Exception as e:
+            return seq, None, str(e)
+    
+    def _accept_status_result(self, seq, device_id):
+        """只接受当前设备、且比已显示结果更新的状态结果"""
+        if device_id != self.current_device_id:
+            return False
+        if seq <= self._applied_status_seq or seq < self._stale_status_seq:
+            return False
+        self._applied_status_seq = seq
+        return True
+    
+    def _update_status_ui(self, status, seq, device_id):
+        if not self._accept_status_result(seq, device_id):
+            return
+        
+        status_text = status.text()
+        self.schedule_status_poll(self.poll_scheduler.observe(status.state.value))
+        self._confirm_status()
+        state_cache.update_status(device_id, status)
+        
+        self.log_message(f"设备当前状态: {status_text}")
+        self._configure(self.status_bar, text=f"设备状态: {status_text}")
+        
+        # 更新按钮状态
+        enable, disable = STATE_BUTTONS[status.state]
+        self._set_buttons(enable, disable)
+    
+    def _update_status_not_found(self, seq, device_id):
+        if not self._accept_status_result(seq, device_id):
+            return
+        
+        self.schedule_status_poll(self.poll_scheduler.observe("not_found"))
+        self._confirm_status()
+        state_cache.update_status(device_id, None)
+        self.log_message("设备未找到，请检查设备是否已连接")
+        self._configure(self.status_bar, text="设备未找到")
+        
+        # 禁用所有操作按钮
+        self._set_buttons(False, False)
+    
+    def _update_status_error(self, error_message, seq, device_id):
+        if not self._accept_status_result(seq, device_id):
+            return
+        
+        self.schedule_status_poll(self.poll_scheduler.observe("error"))
+        self.log_message(f"获取设备状态出错: {error_message}")
+        if self._status_stale:
+            # 保留缓存中的状态，继续标记为待确认
+            self._configure(self.status_bar, text=f"{self._stale_status_text}，获取状态出错，未能确认)")
+        else:
+            self._configure(self.status_bar, text="获取状态出错")
+    
+    def log_message(self, message):
+        """在状态文本框中添加消息，文本框在下一帧统一更新；与上一行相同的消息合并计数
+
+        可以在后台线程中调用
+        """
+        self.log_buffer.append(message)
+        self._log_dirty = True
+    
+    def _drain_ui_queue(self):
+        """每帧执行一次：后台线程提交的界面更新，然后同步日志文本框"""
+        # 先安排下一帧，更新中弹出的对话框期间队列仍会被处理
+        self._ui_timer = self.root.after(UI_FRAME_MS, self._drain_ui_queue)
+        self.ui_queue.drain()
+        if self._log_dirty:
+            self._flush_log()
+    
+    def _flush_log(self):
+        """把日志缓冲区的变化一次性同步到文本框"""
+        self._log_dirty = False
+        update, self._log_shown = self.log_buffer.updates_since(self._log_shown)
+        if not update.drop and update.replace_last is None and not update.append:
+            return
+        
+        # 用户向上滚动查看旧日志时不自动滚动到底部
+        follow = self.status_text.yview()[1] >= 1.0
+        self.status_text.config(state=tk.NORMAL)
+        
+        # 删除被挤出缓冲区的旧行
+        if update.drop:
+            self.status_text.delete("1.0", f"{update.drop + 1}.0")
+        
+        # 重复消息的计数变化时改写最后一行
+        if update.replace_last is not None:
+            last_line = int(self.status_text.index("end-1c").split(".")[0]) - 1
+            self.status_text.delete(f"{last_line}.0", f"{last_line}.end")
+            self.status_text.insert(f"{last_line}.0", update.replace_last)
+        
+        if update.append:
+            self.status_text.insert(tk.END, "\n".join(update.append) + "\n")
+        
+        if follow:
+            self.status_text.see(tk.END)
+        self.status_text.config(state=tk.DISABLED)
+    
+    def refresh_stats(self):
+        """统计页面可见时刷新统计信息，并按固定间隔继续刷新"""
+        if self.stats_timer:
+            self.root.after_cancel(self.stats_timer)
+            self.stats_timer = None
+        if self.notebook.select() != str(self.stats_frame):
+            return
+        
+        if self.worker is not None:
+            # 后端进程的指标需要通过请求获取，在后台线程中进行
+            self._submit_task("stats", self._fetch_worker_stats, tag="stats")
+        else:
+            self._show_stats(None)
+        self.stats_timer = self.root.after(STATS_REFRESH_MS, self.refresh_stats)
+    
+    def _fetch_worker_stats(self):
+        try:
+            worker_snapshot = self.worker.call("metrics", timeout=5)
+        except Exception as e:
+            worker_snapshot = {"error": str(e)}
+        self.ui_queue.post_latest("stats", self._show_stats, worker_snapshot)
+    
+    def _show_stats(self, worker_snapshot):
+        executor_stats = self.executor.stats()
+        sections = [
+            format_report(metrics.snapshot()),
+            "",
+            "后台任务:",
+            f"  线程 {executor_stats['workers']}  运行 {executor_stats['running']}  排队 {executor_stats['queued']}"
+            f"  完成 {executor_stats['completed']}  合并 {executor_stats['coalesced']}  取消 {executor_stats['cancelled']}",
+            f"  平均等待 {executor_stats['avg_wait_ms']:.1f} ms  最长等待 {executor_stats['max_wait_ms']:.1f} ms",
+            f"  当前轮询间隔 {self.poll_scheduler.interval_ms} ms",
+            "界面更新队列: 提交 {posted}  合并 {coalesced}  执行 {applied}  排队 {pending}".format(**self.ui_queue.stats()),
+            "后端: " + ("正常" if not self._degraded else "降级 " + "  ".join(
+                f"{item['tool']} {item['state']} (连续失败 {item['failures']} 次)" for item in self._degraded)),
+            "",
+            format_transition_stats(transition_stats.snapshot()),
+        ]
+        if worker_snapshot is not None:
+            sections += ["", "==== 后端进程 ===="]
+            if "error" in worker_snapshot:
+                sections.append(f"获取失败: {worker_snapshot['error']}")
+            else:
+                sections.append(format_report(worker_snapshot))
+        
+        # 保留滚动位置
+        position = self.stats_text.yview()[0]
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "\n".join(sections))
+        self.stats_text.yview_moveto(position)
+        self.stats_text.config(state=tk.DISABLED)
+    
+    def _write_metrics(self):
+        """定期在后台线程中写入指标文件"""
+        self._submit_task("metrics", self._write_metrics_file, tag="write")
+        self.metrics_timer = self.root.after(METRICS_WRITE_MS, self._write_metrics)
+    
+    def _write_metrics_file(self):
+        try:
+            metrics.write(self.metrics_path)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+    
+    def start_status_timer(self):
+        """状态更新定时器：刷新一次状态，下一次刷新在收到结果后按状态是否变化安排"""
+        self.status_timer = None
+        if self.poll_scheduler.paused:
+            return
+        
+        self.refresh_device_status()
+        
+        # 刷新结果迟迟不返回时，最迟按最长间隔再次刷新
+        self.schedule_status_poll(self.poll_scheduler.max_interval_ms)
+    
+    def schedule_status_poll(self, delay_ms):
+        """在 delay_ms 毫秒后刷新状态，替换已安排的下一次刷新"""
+        if self.status_timer:
+            self.root.after_cancel(self.status_timer)
+            self.status_timer = None
+        
+        if not self.poll_scheduler.paused:
+            self.status_timer = self.root.after(delay_ms, self.start_status_timer)
+    
+    def _on_window_unmap(self, event):
+        """窗口最小化时暂停状态轮询"""
+        if event.widget is not self.root:
+            return
+        
+        self.poll_scheduler.pause()
+        if self.status_timer:
+            self.root.after_cancel(self.status_timer)
+            self.status_timer = None
+    
+    def _on_window_map(self, event):
+        """窗口恢复时立即刷新状态并恢复轮询"""
+        if event.widget is not self.root or not self.poll_scheduler.paused:
+            return
+        
+        self.poll_scheduler.resume()
+        self.schedule_status_poll(0)
+    
+    def on_closing(self):
+        """关闭窗口时清理资源"""
+        self._closing = True
+        if self.status_timer:
+            self.root.after_cancel(self.status_timer)
+        for timer in (self.stats_timer, self.metrics_timer, self._ui_timer, self.dashboard_timer):
+            if timer:
+                self.root.after_cancel(timer)
+        # 取消排队中的后台任务
+        self.executor.shutdown(cancel_pending=True)
+        if self.metrics_path:
+            self._write_metrics_file()
+        # 写入尚未保存的配置修改和设备状态缓存
+        config_store.flush()
+        state_cache.flush()
+        if self.worker is not None:
+            self.worker.close()
+        self.root.destroy()
@@ -0,0 +1,264 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class InstanceIdParts:
+    """设备实例ID拆分后的各个字段，例如 USB\\VID_046D&PID_C52B&MI_00\\7&2F8C6A1&0&0000"""
+    bus: str
+    vid: str = ""
+    pid: str = ""
+    mi: str = ""
+    rev: str = ""
+    serial: str = ""
+
+def _hex4(value):
+    """取4位十六进制字段，不合法时返回空字符串"""
+    value = value[:4].upper()
+    if len(value) == 4 and all(c in "0123456789ABCDEF" for c in value):
+        return value
+    return ""
+
+def parse_instance_id(instance_id):
+    """拆分设备实例ID，只做字符串切分，不使用正则表达式"""
+    segments = instance_id.strip('"\'').strip().split("\\")
+    fields = {"bus": segments[0].upper()}
+
+    if len(segments) > 1:
+        for token in segments[1].split("&"):
+            name, _, value = token.partition("_")
+            name = name.upper()
+            if name == "VID":
+                fields["vid"] = _hex4(value)
+            elif name == "PID":
+                fields["pid"] = _hex4(value)
+            elif name == "MI":
+                fields["mi"] = value.upper()
+            elif name == "REV":
+                fields["rev"] = value.upper()
+
+    if len(segments) > 2:
+        fields["serial"] = "\\".join(segments[2:])
+
+    return InstanceIdParts(**fields)
+
+def extract_vid_pid(device_id):
+    """从完整或部分设备ID中取出 (VID, PID)，找不到时返回None"""
+    vid = pid = ""
+    for segment in device_id.strip('"\'').strip().split("\\"):
+        for token in segment.split("&"):
+            name, _, value = token.partition("_")
+            name = name.upper()
+            if name == "VID" and not vid:
+                vid = _hex4(value)
+            elif name == "PID" and vid and not pid:
+                pid = _hex4(value)
+    if vid and pid:
+        return vid, pid
+    return None
+
+class VidPidIndex:
+    """按 (VID, PID) 建立的哈希索引，部分ID查找只需一次字典访问"""
+
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, instance_id, value=None):
+        """加入一个设备，value 默认为实例ID本身"""
+        parts = parse_instance_id(instance_id)
+        if not parts.vid or not parts.pid:
+            return
+        self._buckets.setdefault((parts.vid, parts.pid), []).append(
+            (parts, instance_id if value is None else value))
+
+    def find(self, vid, pid, bus=None):
+        """返回指定VID/PID的所有设备（按加入顺序），可按总线过滤"""
+        entries = self._buckets.get((vid.upper(), pid.upper()), ())
+        return [value for parts, value in entries if bus is None or parts.bus == bus]
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._buckets.values())
+
+def is_hub(record):
+    """设备记录是否为USB集线器（包括根集线器）"""
+    if record.instance_id.upper().startswith("USB\\ROOT_HUB"):
+        return True
+    description = record.description.lower()
+    return record.class_name.upper() == "USB" and ("hub" in description or "集线器" in description)
+
+class DeviceTopology:
+    """设备父子关系索引，由 pnputil /enum-devices /relations 的父级/子级字段建立
+
+    每个设备只保存父设备和子设备列表，查找所在集线器、祖先路径的耗时与层数成正比；
+    某个设备下的所有设备（禁用它时会一起断开的设备）的耗时与子树大小成正比
+    """
+
+    def __init__(self, records=()):
+        # 设备ID（大写）-> 父设备ID（大写）/ 子设备ID（大写）列表 / 原始实例ID / 设备记录
+        self._parent = {}
+        self._children = {}
+        self._ids = {}
+        self._records = {}
+        for record in records:
+            self.add(record)
+
+    def _node(self, instance_id):
+        key = instance_id.upper()
+        self._ids.setdefault(key, instance_id)
+        return key
+
+    def _link(self, parent_key, child_key):
+        self._parent[child_key] = parent_key
+        children = self._children.setdefault(parent_key, [])
+        if child_key not in children:
+            children.append(child_key)
+
+    def add(self, record):
+        """加入一个设备记录，父子关系从记录的 parent 和 children 字段中取得"""
+        key = self._node(record.instance_id)
+        self._ids[key] = record.instance_id
+        self._records[key] = record
+        if record.parent:
+            self._link(self._node(record.parent), key)
+        for child in record.children:
+            self._link(key, self._node(child))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, device_id):
+        return device_id.upper() in self._ids
+
+    def record(self, device_id):
+        """返回设备记录，只在关系中出现、没有被枚举到的设备返回None"""
+        return self._records.get(device_id.upper())
+
+    def parent(self, device_id):
+        """返回父设备实例ID，没有父设备时返回None"""
+        parent = self._parent.get(device_id.upper())
+        return None if parent is None else self._ids[parent]
+
+    def children(self, device_id):
+        """返回直接子设备的实例ID列表"""
+        return [self._ids[key] for key in self._children.get(device_id.upper(), ())]
+
+    def ancestors(self, device_id):
+        """从父设备开始向上返回所有祖先设备的实例ID"""
+        result = []
+        key = self._parent.get(device_id.upper())
+        seen = set()
+        while key is not None and key not in seen:
+            seen.add(key)
+            result.append(self._ids[key])
+            key = self._parent.get(key)
+        return result
+
+    def hub_of(self, device_id):
+        """返回设备所在的（最近的）集线器实例ID，找不到时返回None"""
+        for ancestor in self.ancestors(device_id):
+            record = self._records.get(ancestor.upper())
+            if record is not None and is_hub(record):
+                return ancestor
+        return None
+
+    def descendants(self, device_id):
+        """返回设备下的所有设备（深度优先，父设备在子设备之前），即禁用该设备时会一起断开的设备"""
+        result = []
+        stack = list(reversed(self._children.get(device_id.upper(), ())))
+        seen = {device_id.upper()}
+        while stack:
+            key = stack.pop()
+            if key in seen:
+                continue
+            seen.add(key)
+            result.append(self._ids[key])
+            stack.extend(reversed(self._children.get(key, ())))
+        return result
+
+class DeviceSearchIndex:
+    """设备选择对话框的搜索索引：预先为每个设备生成小写的搜索文本
+
+    搜索文本包含设备名称、实例ID（含VID/PID和序列号）以及 "vid:pid" 形式；
+    查询按空白拆分为多个关键字，设备需要包含所有关键字。在上一次查询后继续输入时
+    只在上一次的结果中查找，排序结果按列缓存，过滤后的视图不需要重新排序
+    """
+
+    def __init__(self):
+        self.devices = []
+        self._haystacks = []
+        # 列名 -> 按该列排序后的设备下标
+        self._orders = {}
+        # 上一次查询及其结果（按加入顺序的设备下标）
+        self._last_query = None
+        self._last_matches = None
+
+    def __len__(self):
+        return len(self.devices)
+
+    def add(self, devices):
+        """加入设备（{"id": ..., "name": ...}）"""
+        start = len(self.devices)
+        for device in devices:
+            parts = parse_instance_id(device["id"])
+            self.devices.append(device)
+            self._haystacks.append(
+                f"{device['name']}\0{device['id']}\0{parts.vid}:{parts.pid}".lower())
+        self._orders.clear()
+
+        # 新设备只需要按上一次的查询过滤一次
+        if self._last_query is not None:
+            self._last_matches = self._last_matches + self._match(
+                self._last_query, range(start, len(self.devices)))
+
+    @staticmethod
+    def _tokens(query):
+        return query.lower().split()
+
+    def _match(self, query, candidates):
+        tokens = self._tokens(query)
+        haystacks = self._haystacks
+        if not tokens:
+            return list(candidates)
+        if len(tokens) == 1:
+            token = tokens[0]
+            return [i for i in candidates if token in haystacks[i]]
+        return [i for i in candidates if all(token in haystacks[i] for token in tokens)]
+
+    def search(self, query):
+        """返回匹配查询的设备下标（按加入顺序）"""
+        if self._last_query is not None and query.startswith(self._last_query):
+            # 继续输入只会缩小结果范围
+            candidates = self._last_matches
+        else:
+            candidates = range(len(self.devices))
+        matches = self._match(query, candidates)
+        self._last_query = query
+        self._last_matches = matches
+        return matches
+
+    def _order(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            devices = self.devices
+            if column == "name":
+                key = lambda i: (devices[i]["name"].lower(), devices[i]["id"].lower())
+            else:
+                key = lambda i: devices[i][column].lower()
+            order = self._orders[column] = sorted(range(len(devices)), key=key)
+        return order
+
+    def view(self, query="", sort_column=None, reverse=False):
+        """返回过滤并排序后的设备下标"""
+        matches = self.search(query)
+        if sort_column is None:
+            return matches[::-1] if reverse else matches
+
+        order = self._order(sort_column)
+        if len(matches) == len(self.devices):
+            result = list(order)
+        else:
+            selected = bytearray(len(self.devices))
+            for i in matches:
+                selected[i] = 1
+            result = [i for i in order if selected[i]]
+        if reverse:
+            result.reverse()
+        return result
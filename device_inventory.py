@@ -0,0 +1,307 @@
+import subprocess
+import threading
+import time
+
+from device_backend import device_exists, get_device_state, pnputil_cmd
+from device_index import DeviceTopology, VidPidIndex, extract_vid_pid
+from device_state import DeviceState, DeviceStatus
+from device_tasks import SingleFlight
+from metrics import metrics
+from pnputil_parser import stream_devices
+from wmi_backend import WmiError, wmi_backend
+
+def normalize_device_id(device_id):
+    """规范化设备ID，用作索引键（设备实例ID不区分大小写）"""
+    return device_id.strip('"\'').strip().upper()
+
+# 旧版本的pnputil不支持 /relations：失败后改用普通枚举，经过 RELATIONS_RETRY_DELAY 秒后再尝试 /relations，
+# 一次偶然的失败不会让本进程一直没有设备关系
+RELATIONS_RETRY_DELAY = 300.0
+_relations_retry_at = 0.0
+
+# 使用WMI枚举时（没有父子关系）单独用pnputil枚举父子关系的间隔（秒）
+RELATIONS_TTL = 60.0
+
+def enumerate_devices():
+    """逐个产出所有设备的记录：使用WMI时一次Win32_PnPEntity查询（没有父子关系），失败时回退到pnputil"""
+    backend = wmi_backend()
+    if backend is not None:
+        try:
+            records = backend.enumerate()
+        except WmiError:
+            records = None
+        if records:
+            yield from records
+            return
+    yield from enumerate_with_relations()
+
+def enumerate_with_relations():
+    """一次pnputil枚举（带父子关系），逐个产出所有设备的记录"""
+    global _relations_retry_at
+    if time.monotonic() >= _relations_retry_at:
+        produced = False
+        try:
+            for record in stream_devices(pnputil_cmd('/enum-devices /relations')):
+                produced = True
+                yield record
+            return
+        except subprocess.CalledProcessError:
+            if produced:
+                raise
+            metrics.increment("relations_failures_total")
+            _relations_retry_at = time.monotonic() + RELATIONS_RETRY_DELAY
+    yield from stream_devices(pnputil_cmd('/enum-devices'))
+
+class DeviceInventory:
+    """设备清单快照，一次 pnputil 枚举供存在性、状态和描述查询共用"""
+
+    def __init__(self, ttl=5.0, source=None, relations_source=None):
+        # 快照有效期（秒），过期后下一次查询会重新枚举
+        self.ttl = ttl
+        # 返回设备记录迭代器的函数，默认使用WMI或pnputil枚举
+        self._source = source or enumerate_devices
+        # 快照中没有父子关系（WMI枚举）时用于建立父子关系的函数，默认为pnputil /relations 枚举
+        self._relations_source = relations_source or enumerate_with_relations
+        self._relations_timestamp = None
+        self._lock = threading.Lock()
+        self._devices = None
+        self._vid_pid_index = None
+        # 设备父子关系，快照失效后仍保留上一次的结果供界面直接使用
+        self._topology = None
+        self._timestamp = 0.0
+        # 每次失效后加一，失效之前开始的枚举结果不会写入快照
+        self._generation = 0
+        # 并发的刷新请求共享同一次枚举
+        self._refresh_flight = SingleFlight()
+        # 每次得到新快照后调用的函数（例如插拔检测）
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """每次枚举得到新快照后调用 callback(设备索引)，在执行枚举的线程中调用"""
+        self._listeners.append(callback)
+
+    def invalidate(self):
+        """使当前快照失效，例如在启用/禁用设备之后"""
+        with self._lock:
+            self._devices = None
+            self._generation += 1
+
+    def refresh(self):
+        """立即重新枚举所有设备，枚举失败时返回None
+
+        多个线程同时刷新时只启动一次枚举
+        """
+        with self._lock:
+            generation = self._generation
+        return self._refresh_flight.do(generation, self._enumerate, generation)
+
+    @property
+    def generation(self):
+        """快照失效的次数，开始枚举前记下该值，传给 load() 可以丢弃期间已经失效的结果"""
+        with self._lock:
+            return self._generation
+
+    def _enumerate(self, generation):
+        try:
+            with metrics.timer("inventory_refresh_seconds"):
+                indexes = self._index(self._source())
+        except (subprocess.SubprocessError, OSError):
+            # 包括超时和熔断器打开
+            metrics.increment("inventory_refresh_failures_total")
+            return None
+        return self._install(generation, indexes)
+
+    def load(self, records, generation=None):
+        """用已经得到的设备记录（例如异步枚举的结果）建立快照，返回设备索引，没有设备时返回None"""
+        if generation is None:
+            generation = self.generation
+        return self._install(generation, self._index(records))
+
+    @staticmethod
+    def _index(records):
+        """为设备记录建立 (设备索引, VID/PID索引, 父子关系)，记录中没有父子关系时后者为None"""
+        devices = {}
+        vid_pid_index = VidPidIndex()
+        topology = DeviceTopology()
+        has_relations = False
+        for record in records:
+            devices[normalize_device_id(record.instance_id)] = record
+            vid_pid_index.add(record.instance_id, record)
+            topology.add(record)
+            has_relations = has_relations or bool(record.parent or record.children)
+        return devices, vid_pid_index, topology if has_relations else None
+
+    def _install(self, generation, indexes):
+        """保存新的快照并通知监听者；期间快照被标记为失效时只返回结果，不保存"""
+        devices, vid_pid_index, topology = indexes
+        if not devices:
+            metrics.increment("inventory_refresh_failures_total")
+            return None
+
+        with self._lock:
+            current = generation == self._generation
+            if current:
+                self._devices = devices
+                self._vid_pid_index = vid_pid_index
+                if topology is not None:
+                    self._topology = topology
+                    self._relations_timestamp = None
+                self._timestamp = time.monotonic()
+        if current:
+            for callback in self._listeners:
+                callback(devices)
+        return devices
+
+    def snapshot(self):
+        """返回未过期的设备索引，必要时重新枚举"""
+        with self._lock:
+            if self._devices is not None and time.monotonic() - self._timestamp < self.ttl:
+                return self._devices
+        return self.refresh()
+
+    @property
+    def available(self):
+        """能否获得设备快照（pnputil枚举是否成功）"""
+        return self.snapshot() is not None
+
+    def lookup(self, device_id):
+        """按实例ID查找设备记录，也支持按硬件ID前缀匹配"""
+        devices = self.snapshot()
+        if not devices:
+            return None
+
+        key = normalize_device_id(device_id)
+        device = devices.get(key)
+        if device is not None:
+            return device
+
+        # 与 pnputil /deviceid 类似，部分ID匹配实例ID的前缀
+        vid_pid = extract_vid_pid(key)
+        candidates = self.find_by_vid_pid(*vid_pid) if vid_pid else devices.values()
+        for device in candidates or ():
+            instance_id = normalize_device_id(device.instance_id)
+            if instance_id.startswith(key + "\\") or instance_id.startswith(key + "&"):
+                return device
+        return None
+
+    def find_by_vid_pid(self, vid, pid, bus=None):
+        """从 (VID, PID) 索引中查找设备记录，无法获得快照时返回None"""
+        if self.snapshot() is None:
+            return None
+        with self._lock:
+            index = self._vid_pid_index
+        if index is None:
+            return None
+        return index.find(vid, pid, bus)
+
+    def topology(self, refresh=True):
+        """返回设备父子关系索引，无法枚举时返回None
+
+        refresh 为False时不重新枚举，直接返回上一次枚举的结果（可在界面线程中调用）。
+        快照中没有父子关系时（WMI枚举）另外用pnputil枚举一次，结果保留 RELATIONS_TTL 秒
+        """
+        if refresh:
+            self.snapshot()
+            with self._lock:
+                stale = self._topology is None or (
+                    self._relations_timestamp is not None
+                    and time.monotonic() - self._relations_timestamp >= RELATIONS_TTL)
+            if stale:
+                self._load_relations()
+        with self._lock:
+            return self._topology
+
+    def invalidate_relations(self):
+        """使单独枚举的设备关系过期（例如设备连接或移除后），下一次 topology() 时重新枚举"""
+        with self._lock:
+            if self._relations_timestamp is not None:
+                self._relations_timestamp = float("-inf")
+
+    def _load_relations(self):
+        """单独枚举设备父子关系（不替换设备快照）"""
+        try:
+            with metrics.timer("relations_refresh_seconds"):
+                topology = DeviceTopology(self._relations_source())
+        except (subprocess.SubprocessError, OSError):
+            metrics.increment("inventory_refresh_failures_total")
+            return
+        with self._lock:
+            self._topology = topology
+            self._relations_timestamp = time.monotonic()
+
+    @staticmethod
+    def _usb_device(record):
+        """已连接的USB设备记录 -> {"id", "name"}，其他设备返回None"""
+        if record.instance_id.upper().startswith("USB\\VID_") and record.state is not DeviceState.DISCONNECTED:
+            return {"id": record.instance_id, "name": record.description or "未知设备"}
+        return None
+
+    def usb_devices(self):
+        """从快照中逐个产出已连接的USB设备 {"id", "name"}，与扫描时的 pnputil /connected 结果相同"""
+        for record in (self.snapshot() or {}).values():
+            device = self._usb_device(record)
+            if device is not None:
+                yield device
+
+    def stream_usb_devices(self):
+        """逐个产出已连接的USB设备：快照未过期时直接使用快照，否则边枚举边产出
+
+        pnputil每解析完一个设备块就产出，不等待整个枚举完成；枚举完成后把所有记录载入快照，
+        期间快照失效（例如启用/禁用了设备）时不载入
+        """
+        with self._lock:
+            devices = self._devices
+            if devices is not None and time.monotonic() - self._timestamp >= self.ttl:
+                devices = None
+            generation = self._generation
+        if devices is not None:
+            records = devices.values()
+        else:
+            records = self._source()
+
+        collected = []
+        try:
+            for record in records:
+                collected.append(record)
+                device = self._usb_device(record)
+                if device is not None:
+                    yield device
+        except (subprocess.SubprocessError, OSError):
+            metrics.increment("inventory_refresh_failures_total")
+            return
+        if devices is None:
+            self.load(collected, generation)
+
+    def exists(self, device_id):
+        """检查设备是否存在"""
+        return self.lookup(device_id) is not None
+
+    def is_disabled(self, device_id):
+        """返回设备是否被禁用，设备不存在时返回None"""
+        device = self.lookup(device_id)
+        if device is None:
+            return None
+        return device.state is DeviceState.DISABLED
+
+    def get_description(self, device_id):
+        """返回设备描述，设备不存在时返回None"""
+        device = self.lookup(device_id)
+        if device is None:
+            return None
+        return device.description or "未知设备"
+
+    def query_status(self, device_id):
+        """查询设备状态（DeviceStatus），设备不存在时返回None
+
+        无法获得快照（pnputil枚举失败）时回退到逐个设备查询，所有命令都超时或被熔断器暂停时抛出异常
+        """
+        if self.available:
+            device = self.lookup(device_id)
+            return None if device is None else DeviceStatus.from_record(device)
+
+        # 检查设备是否存在
+        if not device_exists(device_id):
+            return None
+
+        # 获取设备状态
+        return get_device_state(device_id)
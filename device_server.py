@@ -0,0 +1,546 @@
+"""本地HTTP/JSON控制接口（可选的服务器模式），供编排脚本在不打开窗口的情况下控制设备
+
+    DMControl.exe serve [--host 127.0.0.1] [--port 8765] [--token 令牌]
+
+接口（请求和响应均为JSON）:
+    GET  /devices                           已连接的USB设备列表
+    GET  /status?id=<设备ID>[&id=...]        设备状态
+    GET  /tree?id=<设备ID>                   所在集线器和禁用时会一起断开的设备
+    POST /enable   {"device_id": "...", "wait": 15}
+    POST /disable  {"device_id": "...", "wait": 15}
+    POST /batch    {"action": "disable", "device_ids": [...], "parents": {"子设备ID": "父设备ID"}, "wait": 15}
+    GET  /events?since=<序号>                设备插拔事件
+    GET  /metrics                           指标
+    GET  /health                            暂停调用的工具（连续超时后熔断器打开），为空表示正常
+
+所有客户端共用一份设备清单快照，过期后并发的请求等待同一次枚举；pnputil/devcon 通过
+asyncio.create_subprocess_exec 以参数列表启动，不经过shell。设置了令牌时请求需要带
+Authorization: Bearer <令牌> 头，监听非本机地址时必须使用令牌（没有指定时自动生成）。
+为防止网页通过浏览器访问本接口（跨站请求或DNS重绑定），带 Origin 头的请求、Host 与监听地址
+不符的请求以及请求体不是 application/json 的请求都会被拒绝。工具的熔断器打开时相关请求返回503
+"""
+import asyncio
+import hmac
+import ipaddress
+import json
+import locale
+import os
+import secrets
+import sys
+import time
+from dataclasses import asdict
+from urllib.parse import parse_qs, urlsplit
+
+from command_runner import BackendUnavailable, backend_health, breaker, command_timeout, kill_process_tree
+from device_backend import devcon_args, pnputil_args, strategy_cache
+from device_batch import CYCLE_ERROR, DEFAULT_MAX_WORKERS, dependencies, dependency_order
+from device_inventory import RELATIONS_RETRY_DELAY, DeviceInventory
+from device_state import DeviceState, DeviceStatus
+from device_transition import CONFIRM_INTERVAL, TARGET_STATES, TransitionResult, transition_stats
+from device_watch import HotplugMonitor
+from metrics import metrics
+from pnputil_parser import parse_devices
+
+DEFAULT_PORT = 8765
+
+# 请求头和请求体的大小限制，以及保持连接的空闲超时（秒）
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT = 30.0
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+# 监听所有地址时不检查 Host 头（此时必须使用令牌）
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+def is_loopback(host):
+    """监听地址是否只允许本机访问"""
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return host.lower() == "localhost"
+
+def _host_name(value):
+    """Host 头中的主机名（去掉端口和IPv6地址的方括号）"""
+    value = value.strip().lower()
+    if value.startswith("["):
+        return value[1:].partition("]")[0]
+    if value.count(":") == 1:
+        return value.partition(":")[0]
+    return value
+
+class HttpError(Exception):
+    """返回给客户端的错误响应"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class AsyncDeviceService:
+    """服务器模式的异步核心：共享的设备清单快照和不经过shell的pnputil/devcon调用
+
+    快照过期后第一个请求发起枚举，其他并发请求等待同一次枚举；同一设备的启用/禁用依次执行，
+    同时运行的启用/禁用进程数量受 max_workers 限制
+    """
+
+    def __init__(self, ttl=5.0, max_workers=DEFAULT_MAX_WORKERS):
+        self.ttl = ttl
+        # 快照只由本对象异步刷新，清单自身永不过期（不会在事件循环中同步枚举）
+        self.inventory = DeviceInventory(ttl=float("inf"))
+        self.monitor = HotplugMonitor()
+        self.monitor.attach(self.inventory)
+        self.max_workers = max_workers
+        self._loaded_at = None
+        self._refresh_task = None
+        # 每次启用/禁用后加一，之前开始的枚举结果不会写入快照
+        self._generation = 0
+        # /relations 失败后改用普通枚举，到该时间后再尝试
+        self._relations_retry_at = 0.0
+        self._device_locks = {}
+        self._control_slots = None
+
+    async def _run(self, tool, kind, args):
+        """启动进程并读取全部输出，返回 (退出码, 输出文本)，进程无法启动或超时时退出码为None
+
+        与同步调用共用熔断器和命令超时，熔断器打开时抛出 BackendUnavailable
+        """
+        tool_breaker = breaker(tool)
+        tool_breaker.check()
+        metrics.increment("spawns_total", tool=tool)
+        start = time.perf_counter()
+        try:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                    start_new_session=(os.name != "nt"))
+            except OSError:
+                metrics.increment("spawn_failures_total", tool=tool)
+                strategy_cache.mark_tool_missing(tool)
+                tool_breaker.record_failure()
+                return None, ""
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), command_timeout())
+            except asyncio.TimeoutError:
+                kill_process_tree(process.pid)
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+                metrics.increment("command_timeouts_total", tool=tool, kind=kind)
+                tool_breaker.record_failure()
+                return None, ""
+        finally:
+            metrics.observe("command_duration_seconds", time.perf_counter() - start, tool=tool, kind=kind)
+        tool_breaker.record_success()
+        if process.returncode != 0:
+            metrics.increment("spawn_failures_total", tool=tool)
+        return process.returncode, output.decode(locale.getpreferredencoding(False), errors="replace")
+
+    async def _enumerate(self):
+        """异步枚举所有设备（带父子关系），失败时返回None"""
+        if time.monotonic() >= self._relations_retry_at:
+            returncode, output = await self._run("pnputil", "enumerate", pnputil_args("/enum-devices", "/relations"))
+            records = parse_devices(output) if returncode == 0 else []
+            if records:
+                return records
+            if returncode is None:
+                return None
+            # 旧版本的pnputil不支持 /relations，一段时间后再尝试
+            metrics.increment("relations_failures_total")
+            self._relations_retry_at = time.monotonic() + RELATIONS_RETRY_DELAY
+        returncode, output = await self._run("pnputil", "enumerate", pnputil_args("/enum-devices"))
+        return parse_devices(output) if returncode == 0 else None
+
+    async def _refresh(self):
+        generation = self._generation
+        try:
+            with metrics.timer("inventory_refresh_seconds"):
+                records = await self._enumerate()
+        finally:
+            self._refresh_task = None
+        if not records:
+            metrics.increment("inventory_refresh_failures_total")
+            return False
+        # 枚举期间有设备被启用/禁用时丢弃结果，由调用方重新枚举
+        if generation == self._generation:
+            self.inventory.load(records)
+            self._loaded_at = time.monotonic()
+        return True
+
+    async def snapshot(self):
+        """返回未过期的设备快照，无法枚举时返回None"""
+        while self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            if self._refresh_task is None:
+                self._refresh_task = asyncio.ensure_future(self._refresh())
+            # 某个等待的请求被取消时不影响其他请求共享的枚举
+            if not await asyncio.shield(self._refresh_task):
+                return None
+        return self.inventory.snapshot()
+
+    async def _require_snapshot(self):
+        if await self.snapshot() is None:
+            raise HttpError(503, "无法枚举设备")
+
+    async def usb_devices(self):
+        await self._require_snapshot()
+        return list(self.inventory.usb_devices())
+
+    async def status(self, device_id):
+        """设备状态，格式与命令行 status --json 相同"""
+        await self._require_snapshot()
+        record = self.inventory.lookup(device_id)
+        if record is None:
+            return {"device_id": device_id, "found": False}
+        status = DeviceStatus.from_record(record)
+        return {"device_id": device_id, "found": True, "instance_id": record.instance_id,
+                "description": record.description, "status": record.status,
+                **status.to_dict(), "disabled": status.disabled}
+
+    async def tree(self, device_id):
+        await self._require_snapshot()
+        record = self.inventory.lookup(device_id)
+        topology = self.inventory.topology(refresh=False)
+        if record is None or topology is None:
+            return {"device_id": device_id, "found": False}
+        instance_id = record.instance_id
+        return {"device_id": device_id, "found": True, "instance_id": instance_id,
+                "description": record.description, "parent": topology.parent(instance_id),
+                "hub": topology.hub_of(instance_id), "ancestors": topology.ancestors(instance_id),
+                "descendants": topology.descendants(instance_id)}
+
+    async def _query_state(self, device_id):
+        """只查询一个设备的当前状态（不使用快照），找不到时返回None"""
+        returncode, output = await self._run("pnputil", "query", pnputil_args("/enum-devices", "/instanceid", device_id))
+        if returncode != 0:
+            return None
+        for record in parse_devices(output):
+            return DeviceStatus.from_record(record)
+        return None
+
+    async def _control(self, device_id, action):
+        """启用或禁用设备，pnputil 失败时回退到 devcon"""
+        try:
+            returncode, _ = await self._run("pnputil", "control", pnputil_args(f"/{action}-device", "/instanceid", device_id))
+            if returncode == 0:
+                return True
+        except BackendUnavailable:
+            if strategy_cache.is_tool_missing("devcon"):
+                raise
+        if strategy_cache.is_tool_missing("devcon"):
+            return False
+        returncode, _ = await self._run("devcon", "control", devcon_args(action, f"@{device_id}"))
+        return returncode == 0
+
+    async def control(self, device_id, action, wait=None):
+        """启用或禁用设备；wait 为等待设备进入目标状态的最长时间（秒），返回 TransitionResult"""
+        if action not in TARGET_STATES:
+            raise HttpError(400, f"未知的操作: {action}")
+        if self._control_slots is None:
+            self._control_slots = asyncio.Semaphore(max(1, self.max_workers))
+        lock = self._device_locks.setdefault(device_id.upper(), asyncio.Lock())
+
+        async with lock:
+            start = time.monotonic()
+            async with self._control_slots:
+                success = await self._control(device_id, action)
+            # 快照已经过时
+            self._generation += 1
+            self._loaded_at = None
+            result = TransitionResult(device_id, action, success, command_seconds=time.monotonic() - start)
+            if not success or not wait:
+                return result
+
+            target = TARGET_STATES[action]
+            deadline = start + wait
+            while True:
+                try:
+                    status = await self._query_state(device_id) or DeviceStatus(DeviceState.UNKNOWN)
+                except BackendUnavailable:
+                    status = DeviceStatus(DeviceState.UNKNOWN)
+                if status.state is target or time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(min(CONFIRM_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+            result.state = status.state.value
+            result.problem_code = status.problem_code
+            if status.state is target:
+                result.confirmed = True
+                result.transition_seconds = time.monotonic() - start
+                metrics.observe("transition_seconds", result.transition_seconds, action=action)
+            else:
+                metrics.increment("transition_timeouts_total", action=action)
+            transition_stats.record(result)
+            return result
+
+    async def batch(self, device_ids, action, parents=None, wait=None):
+        """批量启用或禁用，父子设备按依赖顺序执行，其余并发执行（数量受 max_workers 限制）"""
+        if action not in TARGET_STATES:
+            raise HttpError(400, f"未知的操作: {action}")
+        device_ids = list(dict.fromkeys(device_ids))
+        depends_on = dependencies(device_ids, parents or {}, action)
+        # 存在循环依赖的设备不会被执行
+        order = dependency_order(device_ids, depends_on)
+
+        batch_start = time.monotonic()
+        tasks = {}
+
+        async def run_one(device_id):
+            deps = await asyncio.gather(*(tasks[dep] for dep in depends_on[device_id]))
+            started = time.monotonic()
+            # 依赖的设备出错（例如工具被暂停调用）时不执行，避免父子设备的顺序被打乱
+            failed = [item["device_id"] for item in deps if item.get("error")]
+            if failed:
+                item = {"device_id": device_id, "action": action, "success": False,
+                        "error": f"依赖的设备出错: {', '.join(failed)}"}
+            else:
+                try:
+                    item = asdict(await self.control(device_id, action, wait))
+                except Exception as e:
+                    # 单个设备出错不影响其他设备，调用方仍然得到所有设备的结果
+                    item = {"device_id": device_id, "action": action, "success": False, "error": str(e)}
+                    if isinstance(e, BackendUnavailable):
+                        item["retry_in"] = round(e.retry_in, 1)
+            item.update(started=round(started - batch_start, 3), elapsed=round(time.monotonic() - started, 3))
+            return item
+
+        for device_id in order:
+            tasks[device_id] = asyncio.ensure_future(run_one(device_id))
+        # 等待所有设备完成后再返回
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+        return [results.get(device_id) or {"device_id": device_id, "action": action, "success": False,
+                                           "error": CYCLE_ERROR}
+                for device_id in device_ids]
+
+class ControlServer:
+    """处理HTTP/1.1请求（支持保持连接），把请求分发给 AsyncDeviceService"""
+
+    def __init__(self, service, token=None, host="127.0.0.1"):
+        self.service = service
+        self.token = token
+        self.host = host
+        self.routes = {
+            ("GET", "/devices"): self._get_devices,
+            ("GET", "/status"): self._get_status,
+            ("GET", "/tree"): self._get_tree,
+            ("GET", "/events"): self._get_events,
+            ("GET", "/metrics"): self._get_metrics,
+            ("GET", "/health"): self._get_health,
+            ("POST", "/enable"): self._post_control,
+            ("POST", "/disable"): self._post_control,
+            ("POST", "/batch"): self._post_batch,
+        }
+
+    async def _get_devices(self, path, query, body):
+        return await self.service.usb_devices()
+
+    async def _get_status(self, path, query, body):
+        device_ids = query.get("id")
+        if not device_ids:
+            raise HttpError(400, "缺少 id 参数")
+        return [await self.service.status(device_id) for device_id in device_ids]
+
+    async def _get_tree(self, path, query, body):
+        if not query.get("id"):
+            raise HttpError(400, "缺少 id 参数")
+        return await self.service.tree(query["id"][0])
+
+    async def _get_events(self, path, query, body):
+        try:
+            since = int(query.get("since", ["0"])[0])
+        except ValueError:
+            raise HttpError(400, "since 必须是整数")
+        # 快照过期时先重新枚举，使启用/禁用之后的变化出现在事件中
+        await self.service.snapshot()
+        return [asdict(event) for event in self.service.monitor.events_since(since)]
+
+    async def _get_metrics(self, path, query, body):
+        return metrics.snapshot()
+
+    async def _get_health(self, path, query, body):
+        return {"degraded": backend_health()}
+
+    @staticmethod
+    def _wait(body):
+        """请求体中的 wait：不存在时为None，必须是非负数"""
+        wait = body.get("wait")
+        if wait is None:
+            return None
+        if isinstance(wait, bool) or not isinstance(wait, (int, float)) or wait < 0:
+            raise HttpError(400, "wait 必须是非负数")
+        return wait
+
+    async def _post_control(self, path, query, body):
+        device_id = body.get("device_id")
+        if not device_id or not isinstance(device_id, str):
+            raise HttpError(400, "缺少 device_id")
+        return asdict(await self.service.control(device_id, path.strip("/"), self._wait(body)))
+
+    async def _post_batch(self, path, query, body):
+        device_ids = body.get("device_ids")
+        if not device_ids or not isinstance(device_ids, list):
+            raise HttpError(400, "缺少 device_ids")
+        if not all(device_id and isinstance(device_id, str) for device_id in device_ids):
+            raise HttpError(400, "device_ids 必须是设备ID字符串的列表")
+        parents = body.get("parents") or {}
+        if not isinstance(parents, dict) or not all(isinstance(item, str) for pair in parents.items() for item in pair):
+            raise HttpError(400, "parents 必须是 {子设备ID: 父设备ID}")
+        return await self.service.batch(device_ids, body.get("action"), parents, self._wait(body))
+
+    def _authorized(self, headers):
+        if not self.token:
+            return True
+        return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {self.token}")
+
+    def _host_allowed(self, headers):
+        """Host 头必须指向监听地址：只监听本机时必须是本机地址，防止DNS重绑定"""
+        name = _host_name(headers.get("host", ""))
+        if not name:
+            return False
+        if self.host in WILDCARD_HOSTS:
+            return True
+        if is_loopback(self.host):
+            return is_loopback(name)
+        return name == _host_name(self.host)
+
+    def _check_request(self, headers, body):
+        """拒绝浏览器中的网页发来的请求：带 Origin 头、Host 不符或请求体不是JSON"""
+        if "origin" in headers:
+            raise HttpError(403, "不接受跨站请求")
+        if not self._host_allowed(headers):
+            raise HttpError(403, "无效的 Host")
+        if not self._authorized(headers):
+            raise HttpError(401, "令牌无效")
+        content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        if body and content_type != "application/json":
+            raise HttpError(415, "请求体必须是 application/json")
+
+    async def dispatch(self, method, target, headers, body):
+        """处理一个请求，返回 (状态码, 响应数据)"""
+        self._check_request(headers, body)
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                raise HttpError(405, f"不支持的方法: {method}")
+            raise HttpError(404, f"未知的路径: {url.path}")
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError as e:
+            raise HttpError(400, f"无效的JSON: {e}")
+        if not isinstance(data, dict):
+            raise HttpError(400, "请求体必须是JSON对象")
+        try:
+            query = parse_qs(url.query)
+        except ValueError as e:
+            raise HttpError(400, f"无效的参数: {e}")
+        return 200, await handler(url.path, query, data)
+
+    async def _read_request(self, reader):
+        """读取一个请求，连接关闭时返回None"""
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "无效的请求行")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(400, "请求头过多")
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HttpError(400, "无效的 Content-Length")
+        if length < 0:
+            raise HttpError(400, "无效的 Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method.upper(), target, headers, body, keep_alive
+
+    @staticmethod
+    def _write_response(writer, status, data, keep_alive):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+
+    async def handle_connection(self, reader, writer):
+        """处理一个客户端连接上的所有请求"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    self._write_response(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body, keep_alive = request
+                start = time.perf_counter()
+                try:
+                    status, data = await self.dispatch(method, target, headers, body)
+                except HttpError as e:
+                    status, data = e.status, {"error": str(e)}
+                except BackendUnavailable as e:
+                    status, data = 503, {"error": str(e), "retry_in": round(e.retry_in, 1)}
+                except Exception as e:
+                    status, data = 500, {"error": str(e)}
+                path = urlsplit(target).path
+                route = path if any(path == known for _, known in self.routes) else "unknown"
+                metrics.observe("http_request_seconds", time.perf_counter() - start, route=route)
+                metrics.increment("http_requests_total", route=route, status=status)
+
+                self._write_response(writer, status, data, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve_forever(host="127.0.0.1", port=DEFAULT_PORT, token=None, ttl=5.0,
+                        max_workers=DEFAULT_MAX_WORKERS, on_started=None):
+    """启动服务器并一直运行；on_started 在开始监听后以实际端口为参数调用（port 为0时由系统分配）"""
+    if not token and not is_loopback(host):
+        raise ValueError("监听非本机地址时必须设置令牌")
+    server = ControlServer(AsyncDeviceService(ttl, max_workers), token, host)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    if on_started is not None:
+        on_started(listener.sockets[0].getsockname()[1])
+    async with listener:
+        await listener.serve_forever()
+
+def run_server(host="127.0.0.1", port=DEFAULT_PORT, token=None, ttl=5.0, max_workers=DEFAULT_MAX_WORKERS, out=None):
+    """命令行 serve 命令的入口，按下 Ctrl+C 时退出；监听非本机地址而没有指定令牌时生成一个并输出"""
+    if not token and not is_loopback(host):
+        token = secrets.token_urlsafe(24)
+        (out or sys.stdout).write(f"监听非本机地址，已生成令牌: {token}\n")
+
+    def started(actual_port):
+        if out is not None:
+            out.write(f"服务器已启动: http://{host}:{actual_port}\n")
+            out.flush()
+
+    try:
+        asyncio.run(serve_forever(host, port, token, ttl, max_workers, started))
+    except KeyboardInterrupt:
+        pass
+    return 0
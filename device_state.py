@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+class DeviceState(Enum):
+    """设备状态"""
+    STARTED = "started"
+    DISABLED = "disabled"
+    PROBLEM = "problem"
+    DISCONNECTED = "disconnected"
+    UNKNOWN = "unknown"
+
+# 界面显示的状态文本
+STATE_TEXT = {
+    DeviceState.STARTED: "已启用",
+    DeviceState.DISABLED: "已禁用",
+    DeviceState.PROBLEM: "出现问题",
+    DeviceState.DISCONNECTED: "已断开连接",
+    DeviceState.UNKNOWN: "状态未知",
+}
+
+@dataclass(frozen=True)
+class DeviceStatus:
+    """设备状态，出现问题时带有问题代码"""
+    state: DeviceState
+    problem_code: Optional[int] = None
+
+    @property
+    def disabled(self):
+        return self.state is DeviceState.DISABLED
+
+    def text(self):
+        """界面显示的状态文本"""
+        text = STATE_TEXT[self.state]
+        if self.problem_code is not None:
+            text += f" (代码 {self.problem_code})"
+        return text
+
+    def to_dict(self):
+        """可以JSON序列化的形式（后端进程、命令行输出）"""
+        return {"state": self.state.value, "problem_code": self.problem_code}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(DeviceState(data["state"]), data.get("problem_code"))
+
+    @classmethod
+    def from_record(cls, record):
+        """pnputil设备记录中的状态"""
+        return cls(record.state, record.problem_code)
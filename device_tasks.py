@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+class SingleFlight:
+    """同一个键的并发调用只执行一次，所有调用方共享同一个结果（或异常）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args):
+        """执行 fn(*args)；如果相同键的调用正在进行，则等待并返回它的结果"""
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key):
+        """相同键的调用是否正在进行"""
+        with self._lock:
+            return key in self._calls
+
+class _Task:
+    """执行器队列中的一个任务"""
+
+    def __init__(self, key, fn, args, tag):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.tag = tag
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+class DeviceTaskExecutor:
+    """固定线程数的任务执行器，同一个键（设备）的任务按提交顺序串行执行
+
+    不同设备的任务并发执行；同一设备排队中的同类任务（tag相同）会合并为一个，
+    关闭时取消所有排队中的任务
+    """
+
+    def __init__(self, max_workers=4, name="device-task"):
+        self.max_workers = max(1, max_workers)
+        self._cond = threading.Condition()
+        # 键 -> 排队中的任务
+        self._queues = {}
+        # 有排队任务且当前没有任务在运行的键
+        self._ready = deque()
+        self._running = set()
+        self._shutdown = False
+        # 最近任务的排队等待时间（秒）
+        self._wait_times = deque(maxlen=200)
+        self._completed = 0
+        self._coalesced = 0
+        self._cancelled = 0
+        self._threads = []
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, fn, *args, tag=None):
+        """提交任务，返回Future；同一键下已有相同tag的任务在排队时直接返回它的Future"""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("执行器已关闭")
+
+            queue = self._queues.setdefault(key, deque())
+            if tag is not None:
+                for task in queue:
+                    if task.tag == tag and not task.future.cancelled():
+                        self._coalesced += 1
+                        return task.future
+
+            task = _Task(key, fn, args, tag)
+            queue.append(task)
+            if key not in self._running and len(queue) == 1:
+                self._ready.append(key)
+                self._cond.notify()
+            return task.future
+
+    def cancel_pending(self, key, tag=None):
+        """取消某个键下排队中（尚未开始）的任务，可只取消指定tag的任务，返回取消的数量"""
+        with self._cond:
+            queue = self._queues.get(key)
+            if not queue:
+                return 0
+            cancelled = 0
+            for task in list(queue):
+                if tag is None or task.tag == tag:
+                    queue.remove(task)
+                    task.future.cancel()
+                    cancelled += 1
+            self._cancelled += cancelled
+            return cancelled
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._shutdown:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                queue = self._queues.get(key)
+                # 排队任务已被取消，或该键已有任务在运行
+                if not queue or key in self._running:
+                    if not queue and key not in self._running:
+                        self._queues.pop(key, None)
+                    continue
+                task = queue.popleft()
+                self._running.add(key)
+
+            if task.future.set_running_or_notify_cancel():
+                self._wait_times.append(time.monotonic() - task.enqueued)
+                try:
+                    task.future.set_result(task.fn(*task.args))
+                except BaseException as e:
+                    task.future.set_exception(e)
+
+            with self._cond:
+                self._running.discard(key)
+                self._completed += 1
+                if self._queues.get(key):
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    self._queues.pop(key, None)
+
+    def stats(self):
+        """返回执行器的运行状况：排队数量、运行数量、排队等待时间等"""
+        with self._cond:
+            queued = sum(len(queue) for queue in self._queues.values())
+            running = len(self._running)
+            wait_times = list(self._wait_times)
+            return {
+                "workers": self.max_workers,
+                "queued": queued,
+                "running": running,
+                "completed": self._completed,
+                "coalesced": self._coalesced,
+                "cancelled": self._cancelled,
+                "avg_wait_ms": sum(wait_times) / len(wait_times) * 1000 if wait_times else 0.0,
+                "max_wait_ms": max(wait_times) * 1000 if wait_times else 0.0,
+            }
+
+    @property
+    def saturated(self):
+        """所有线程都在运行且仍有任务排队"""
+        stats = self.stats()
+        return stats["running"] >= self.max_workers and stats["queued"] > 0
+
+    def shutdown(self, cancel_pending=True, wait=False, timeout=None):
+        """关闭执行器：默认取消所有排队中的任务，正在运行的任务会继续执行完"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    for task in queue:
+                        if task.future.cancel():
+                            self._cancelled += 1
+                    queue.clear()
+                self._ready.clear()
+            self._cond.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
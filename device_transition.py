@@ -0,0 +1,129 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from device_backend import disable_device, enable_device, get_device_state
+from device_state import DeviceState
+from metrics import LatencyHistogram, metrics
+
+# 启用/禁用后等待设备进入的目标状态
+TARGET_STATES = {
+    "enable": DeviceState.STARTED,
+    "disable": DeviceState.DISABLED,
+}
+
+# 等待目标状态的默认超时和查询间隔（秒）
+DEFAULT_CONFIRM_TIMEOUT = 15.0
+CONFIRM_INTERVAL = 0.25
+
+@dataclass
+class TransitionResult:
+    """一次启用/禁用操作的结果
+
+    command_seconds 为启用/禁用命令本身的耗时，transition_seconds 为从发出命令到
+    观察到目标状态的耗时（未确认时为None）
+    """
+    device_id: str
+    action: str
+    success: bool
+    confirmed: bool = False
+    state: str = DeviceState.UNKNOWN.value
+    problem_code: Optional[int] = None
+    command_seconds: float = 0.0
+    transition_seconds: Optional[float] = None
+
+def wait_for_state(device_id, target, timeout=DEFAULT_CONFIRM_TIMEOUT, interval=CONFIRM_INTERVAL, query=None):
+    """按较短的间隔查询设备状态，直到进入目标状态或超时，返回最后一次查询到的 DeviceStatus"""
+    query = query or get_device_state
+    deadline = time.monotonic() + timeout
+    while True:
+        status = query(device_id)
+        remaining = deadline - time.monotonic()
+        if status.state is target or remaining <= 0:
+            return status
+        time.sleep(min(interval, remaining))
+
+def control_and_confirm(device_id, action, timeout=DEFAULT_CONFIRM_TIMEOUT, interval=CONFIRM_INTERVAL,
+                        control=None, query=None):
+    """启用或禁用设备，并等待设备进入目标状态，返回 TransitionResult
+
+    timeout 为0时只执行命令不等待；结果同时记入 transition_stats 和 transition_seconds 指标
+    """
+    if action not in TARGET_STATES:
+        raise ValueError(f"未知的操作: {action}")
+    if control is None:
+        control = enable_device if action == "enable" else disable_device
+
+    start = time.monotonic()
+    success = bool(control(device_id))
+    result = TransitionResult(device_id, action, success, command_seconds=time.monotonic() - start)
+    if not success or timeout <= 0:
+        return result
+
+    target = TARGET_STATES[action]
+    remaining = max(0.0, timeout - result.command_seconds)
+    status = wait_for_state(device_id, target, remaining, interval, query)
+    result.state = status.state.value
+    result.problem_code = status.problem_code
+    if status.state is target:
+        result.confirmed = True
+        result.transition_seconds = time.monotonic() - start
+        metrics.observe("transition_seconds", result.transition_seconds, action=action)
+    else:
+        metrics.increment("transition_timeouts_total", action=action)
+    transition_stats.record(result)
+    return result
+
+class TransitionStats:
+    """按设备汇总的启用/禁用切换耗时，用于找出切换特别慢的设备（例如某些硬盘盒）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (设备ID（大写）, 操作) -> [设备ID, 耗时直方图, 超时次数]
+        self._devices = {}
+
+    def record(self, result):
+        """记录一次等待过目标状态的操作结果，命令本身失败的不记录"""
+        if not result.success:
+            return
+        key = (result.device_id.upper(), result.action)
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is None:
+                entry = self._devices[key] = [result.device_id, LatencyHistogram(), 0]
+            if result.confirmed:
+                entry[1].observe(result.transition_seconds)
+            else:
+                entry[2] += 1
+
+    def snapshot(self):
+        """返回每个设备每种操作的汇总，按中位耗时从慢到快排列"""
+        with self._lock:
+            rows = [
+                {
+                    "device_id": device_id,
+                    "action": action,
+                    "count": histogram.count,
+                    "timeouts": timeouts,
+                    "p50": round(histogram.quantile(0.5), 3),
+                    "max": round(histogram.max, 3),
+                }
+                for (_, action), (device_id, histogram, timeouts) in self._devices.items()
+            ]
+        rows.sort(key=lambda row: (row["timeouts"] == 0, -row["p50"]))
+        return rows
+
+# 本进程中所有启用/禁用操作的切换耗时
+transition_stats = TransitionStats()
+
+def format_transition_stats(rows):
+    """把 TransitionStats.snapshot() 格式化为文本"""
+    if not rows:
+        return "设备切换耗时: 暂无数据"
+    action_text = {"enable": "启用", "disable": "禁用"}
+    lines = ["设备切换耗时 (从慢到快):"]
+    for row in rows:
+        lines.append(f"  {action_text.get(row['action'], row['action'])} {row['device_id']}  次数 {row['count']}"
+                     f"  p50 {row['p50']:.2f}s  最长 {row['max']:.2f}s  超时 {row['timeouts']}")
+    return "\n".join(lines)
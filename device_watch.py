@@ -0,0 +1,163 @@
+import os
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from device_state import DeviceState, DeviceStatus
+from metrics import metrics
+
+# 保留最近的事件数量（供后端进程的 events 操作按序号读取）
+EVENT_HISTORY = 200
+
+@dataclass
+class DeviceEvent:
+    """设备插拔或状态变化事件，kind 为 added/removed/state_changed"""
+    seq: int
+    kind: str
+    instance_id: str
+    description: str = ""
+    old_state: Optional[str] = None
+    new_state: Optional[str] = None
+    problem_code: Optional[int] = None
+
+    def text(self):
+        """日志中显示的文本"""
+        name = f"{self.description} ({self.instance_id})" if self.description else self.instance_id
+        if self.kind == "added":
+            return f"设备已连接: {name}"
+        if self.kind == "removed":
+            return f"设备已移除: {name}"
+        old = DeviceStatus(DeviceState(self.old_state)).text()
+        new = DeviceStatus(DeviceState(self.new_state), self.problem_code).text()
+        return f"设备状态变化: {name} {old} -> {new}"
+
+def _signature(record):
+    return record.state, record.problem_code
+
+def _fingerprint(signatures):
+    """整个快照的指纹：每个设备 (ID, 状态) 哈希值的异或，与设备顺序无关"""
+    fingerprint = 0
+    for item in signatures.items():
+        fingerprint ^= hash(item)
+    return fingerprint
+
+def _event_kind(old, new):
+    """根据前后两次的状态判断事件类型，拔出的设备在pnputil中仍然存在但状态为已断开连接"""
+    disconnected = DeviceState.DISCONNECTED
+    if old is None or old is disconnected:
+        return None if new is None or new is disconnected else "added"
+    if new is None or new is disconnected:
+        return "removed"
+    return "state_changed"
+
+class HotplugMonitor:
+    """比较相邻两次枚举的设备快照，产生设备连接、移除和状态变化事件
+
+    挂在设备清单上，只使用定期刷新时已经得到的快照，不额外启动进程；每个快照先计算指纹，
+    与上一次相同时直接跳过，不同时用一次字典遍历（O(n)）找出变化的设备
+    """
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._lock = threading.Lock()
+        # 设备ID（大写）-> (状态, 问题代码)，第一次快照之前为None
+        self._signatures = None
+        self._records = {}
+        self._fingerprint = None
+        self._seq = 0
+        self._events = deque(maxlen=history)
+        self._subscribers = []
+
+    def attach(self, inventory):
+        """在设备清单每次枚举之后比较快照"""
+        inventory.add_listener(self.update)
+
+    def subscribe(self, callback):
+        """订阅事件，callback 以事件列表为参数，在执行枚举的线程中调用"""
+        self._subscribers.append(callback)
+
+    def update(self, devices):
+        """比较新的快照 {设备ID（大写）: 设备记录}，返回并发布新产生的事件；第一次调用只记录快照"""
+        signatures = {key: _signature(record) for key, record in devices.items()}
+        fingerprint = _fingerprint(signatures)
+
+        with self._lock:
+            previous, previous_records = self._signatures, self._records
+            if previous is not None and fingerprint == self._fingerprint and len(previous) == len(signatures):
+                return []
+            self._signatures, self._records, self._fingerprint = signatures, devices, fingerprint
+            if previous is None:
+                return []
+
+            changes = []
+            for key, signature in signatures.items():
+                old = previous.get(key)
+                if old != signature:
+                    changes.append((key, devices[key], old))
+            for key, old in previous.items():
+                if key not in signatures:
+                    changes.append((key, previous_records[key], old))
+
+            events = []
+            for key, record, old in changes:
+                new = signatures.get(key)
+                kind = _event_kind(old and old[0], new and new[0])
+                if kind is None:
+                    continue
+                self._seq += 1
+                events.append(DeviceEvent(
+                    self._seq, kind, record.instance_id, record.description,
+                    old_state=old[0].value if old else None,
+                    new_state=new[0].value if new else None,
+                    problem_code=new[1] if new else None,
+                ))
+            self._events.extend(events)
+
+        self.publish(events)
+        return events
+
+    def publish(self, events):
+        """把事件发给所有订阅者（也用于转发后端进程中产生的事件）"""
+        if not events:
+            return
+        for event in events:
+            metrics.increment("hotplug_events_total", kind=event.kind)
+        for callback in list(self._subscribers):
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"处理设备事件出错: {e!r}")
+
+    def events_since(self, seq):
+        """返回序号大于 seq 的事件；seq 比当前序号还大时（例如后端进程重启过）返回保留的全部事件"""
+        with self._lock:
+            if seq > self._seq:
+                seq = 0
+            return [event for event in self._events if event.seq > seq]
+
+class HookRunner:
+    """收到设备事件时运行 config.json 中的 hotplug_hook 命令，不等待命令结束
+
+    事件通过环境变量传给命令：DMCONTROL_EVENT、DMCONTROL_DEVICE_ID、DMCONTROL_DEVICE_NAME、
+    DMCONTROL_OLD_STATE、DMCONTROL_NEW_STATE
+    """
+
+    def __init__(self, command):
+        self.command = command
+
+    def __call__(self, events):
+        for event in events:
+            env = dict(os.environ,
+                       DMCONTROL_EVENT=event.kind,
+                       DMCONTROL_DEVICE_ID=event.instance_id,
+                       DMCONTROL_DEVICE_NAME=event.description,
+                       DMCONTROL_OLD_STATE=event.old_state or "",
+                       DMCONTROL_NEW_STATE=event.new_state or "")
+            metrics.increment("spawns_total", tool="hook")
+            try:
+                subprocess.Popen(self.command, shell=True, env=env,
+                                 creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+            except OSError as e:
+                metrics.increment("spawn_failures_total", tool="hook")
+                print(f"运行设备事件命令失败: {e}")
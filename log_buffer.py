@@ -0,0 +1,148 @@
+"""界面日志的固定容量环形缓冲区，以及按大小轮转的日志文件"""
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# 界面日志默认保留的行数
+DEFAULT_LOG_CAPACITY = 1000
+# output.log/error.log 超过该大小时轮转，保留的旧文件数量
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+@dataclass
+class LogEntry:
+    """一行日志，连续重复的相同消息合并为一行并计数"""
+    seq: int
+    message: str
+    first_time: float
+    last_time: float
+    count: int = 1
+
+    def text(self):
+        line = f"[{time.strftime('%H:%M:%S', time.localtime(self.first_time))}] {self.message}"
+        if self.count > 1:
+            line += f" (×{self.count}，最近 {time.strftime('%H:%M:%S', time.localtime(self.last_time))})"
+        return line
+
+@dataclass
+class LogUpdate:
+    """把文本框从上次的状态更新到当前缓冲区所需的操作"""
+    # 需要从顶部删除的行数（已被挤出缓冲区）
+    drop: int
+    # 文本框最后一行的新内容（重复次数变化），不需要修改时为None
+    replace_last: str
+    # 需要追加的行
+    append: list
+
+class LogBuffer:
+    """固定容量的线程安全日志缓冲区，超出容量时丢弃最旧的行
+
+    文本框只在需要时通过 updates_since() 增量同步，而不是每条消息都操作一次控件
+    """
+
+    def __init__(self, capacity=DEFAULT_LOG_CAPACITY):
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=self.capacity)
+        self._next_seq = 1
+
+    def append(self, message, now=None):
+        """添加一条消息，与上一行相同时只增加上一行的计数"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._entries and self._entries[-1].message == message:
+                last = self._entries[-1]
+                last.count += 1
+                last.last_time = now
+                return
+            self._entries.append(LogEntry(self._next_seq, message, now, now))
+            self._next_seq += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def lines(self):
+        """当前缓冲区中的所有行"""
+        with self._lock:
+            return [entry.text() for entry in self._entries]
+
+    def updates_since(self, shown):
+        """计算文本框的增量更新
+
+        shown 为文本框当前显示的 (第一行序号, 最后一行序号, 最后一行的重复次数)，
+        空文本框为 (0, 0, 0)；返回 (LogUpdate, 更新后的 shown)
+        """
+        first_seq, last_seq, last_count = shown
+        with self._lock:
+            if not self._entries:
+                return LogUpdate(0, None, []), shown
+            head_seq = self._entries[0].seq
+            tail = self._entries[-1]
+
+            # 文本框为空，或显示的行已全部被挤出缓冲区
+            if last_seq < head_seq:
+                shown_lines = last_seq - first_seq + 1 if last_seq else 0
+                update = LogUpdate(shown_lines, None, [entry.text() for entry in self._entries])
+                return update, (head_seq, tail.seq, tail.count)
+
+            drop = max(0, head_seq - first_seq)
+            last_entry = self._entries[last_seq - head_seq]
+            replace_last = last_entry.text() if last_entry.count != last_count else None
+            append = [self._entries[i].text() for i in range(last_seq - head_seq + 1, len(self._entries))]
+            return LogUpdate(drop, replace_last, append), (head_seq, tail.seq, tail.count)
+
+class RotatingFile:
+    """按大小轮转的文本文件，可以替代 sys.stdout/sys.stderr
+
+    文件超过 max_bytes 时依次改名为 .1、.2 ...，最多保留 backups 个旧文件
+    """
+
+    def __init__(self, path, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS, encoding="utf-8"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding=encoding)
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        """调用方需持有锁"""
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "w", encoding=self.encoding)
+        self._size = 0
+
+    def write(self, text):
+        with self._lock:
+            size = len(text.encode(self.encoding, errors="replace"))
+            if self._size and self._size + size > self.max_bytes:
+                try:
+                    self._rotate()
+                except OSError:
+                    # 旧文件被占用等原因无法轮转时继续写入当前文件
+                    if self._file.closed:
+                        self._file = open(self.path, "a", encoding=self.encoding)
+            self._file.write(text)
+            self._file.flush()
+            self._size += size
+            return len(text)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def isatty(self):
+        return False
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,260 @@
+"""轻量的运行指标：命令耗时直方图、进程启动/失败计数和命令形式回退命中率
+
+所有后端调用共享模块级的 metrics 实例，可以写入JSON或Prometheus文本格式的指标文件
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from app_paths import app_path
+
+# 直方图各个桶的上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 指标文件路径，优先于config.json中的 "metrics_file"；以 .prom 或 .txt 结尾时写Prometheus文本格式
+METRICS_FILE_ENV = "DMCONTROL_METRICS_FILE"
+# 设置后用cProfile分析第一次状态刷新；值为1时结果写入程序目录，否则为结果文件路径
+PROFILE_ENV = "DMCONTROL_PROFILE"
+
+PROMETHEUS_PREFIX = "dmcontrol_"
+
+class LatencyHistogram:
+    """固定桶的耗时直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # 最后一个桶为 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """根据桶内线性插值估算分位数（秒）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if n and cumulative + n >= rank:
+                return min(lower + (upper - lower) * (rank - cumulative) / n, self.max)
+            cumulative += n
+            lower = upper
+        return self.max
+
+def _labels_text(labels):
+    return " ".join(f"{name}={value}" for name, value in labels)
+
+def _prometheus_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in items) + "}"
+
+class Metrics:
+    """线程安全的计数器和耗时直方图集合，指标按 (名称, 标签) 区分"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def increment(self, name, amount=1, **labels):
+        """计数器加 amount"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时（秒）"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录代码块的耗时，代码块抛出异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """返回计数器的当前值"""
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """返回所有指标的可序列化副本"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "max": round(h.max, 6),
+                    "p50": round(h.quantile(0.5), 6),
+                    "p99": round(h.quantile(0.99), 6),
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+        return {
+            "started": self.started,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self):
+        """Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = PROMETHEUS_PREFIX + name
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+
+            for (name, labels), h in sorted(self._histograms.items()):
+                metric = PROMETHEUS_PREFIX + name
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{_prometheus_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{_prometheus_labels(labels)} {h.sum:.6f}")
+                lines.append(f"{metric}_count{_prometheus_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """写入指标文件（先写临时文件再替换）"""
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+# 本进程共享的指标
+metrics = Metrics()
+
+def _counter_sum(snapshot, name, **labels):
+    """快照中名称相同、且包含指定标签的所有计数器之和"""
+    return sum(c["value"] for c in snapshot["counters"]
+               if c["name"] == name and all(c["labels"].get(k) == v for k, v in labels.items()))
+
+def format_report(snapshot):
+    """把指标快照格式化为统计页面显示的文本"""
+    hours = max(snapshot["uptime_seconds"], 1) / 3600
+    lines = [f"运行时间: {snapshot['uptime_seconds'] / 60:.1f} 分钟", "", "启动进程:"]
+
+    tools = sorted({c["labels"].get("tool") for c in snapshot["counters"] if c["name"] == "spawns_total"})
+    for tool in tools:
+        spawns = _counter_sum(snapshot, "spawns_total", tool=tool)
+        failures = _counter_sum(snapshot, "spawn_failures_total", tool=tool)
+        timeouts = _counter_sum(snapshot, "command_timeouts_total", tool=tool)
+        rejected = _counter_sum(snapshot, "circuit_rejections_total", tool=tool)
+        lines.append(f"  {tool:<10} {spawns:6d} 次  {spawns / hours:8.1f} 次/小时  失败 {failures}"
+                     f"  超时 {timeouts}  暂停时拒绝 {rejected}")
+    if not tools:
+        lines.append("  (无)")
+
+    lines += ["", "命令形式回退:"]
+    kinds = sorted({c["labels"].get("kind") for c in snapshot["counters"] if c["name"] == "backend_operations_total"})
+    for kind in kinds:
+        total = _counter_sum(snapshot, "backend_operations_total", kind=kind)
+        fallbacks = _counter_sum(snapshot, "fallbacks_total", kind=kind)
+        devcon = _counter_sum(snapshot, "backend_operations_total", kind=kind, form="devcon")
+        lines.append(f"  {kind:<10} 回退 {fallbacks}/{total} ({fallbacks / total:.1%})  使用devcon {devcon}")
+    if not kinds:
+        lines.append("  (无)")
+
+    lines += ["", "耗时:"]
+    for h in snapshot["histograms"]:
+        lines.append(
+            f"  {h['name']} {_labels_text(sorted(h['labels'].items()))}\n"
+            f"      {h['count']} 次  平均 {h['sum'] / h['count'] * 1000:.1f} ms"
+            f"  p50 {h['p50'] * 1000:.1f} ms  p99 {h['p99'] * 1000:.1f} ms  最大 {h['max'] * 1000:.1f} ms"
+        )
+    if not snapshot["histograms"]:
+        lines.append("  (无)")
+    return "\n".join(lines)
+
+def metrics_file_path(config=None):
+    """指标文件路径：环境变量优先，其次是config.json中的 "metrics_file"，相对路径相对于程序目录"""
+    path = os.environ.get(METRICS_FILE_ENV) or (config or {}).get("metrics_file")
+    if not path:
+        return None
+    return path if os.path.isabs(path) else app_path(path)
+
+_profile_lock = threading.Lock()
+_profiled = set()
+
+def profile_once(name, fn, *args):
+    """设置了 DMCONTROL_PROFILE 时，用cProfile分析 name 的第一次调用，之后直接调用 fn
+
+    只分析调用线程，结果写入 .prof 文件，并把累计耗时最多的函数打印到标准输出（日志）
+    """
+    target = os.environ.get(PROFILE_ENV)
+    if not target:
+        return fn(*args)
+    with _profile_lock:
+        first = name not in _profiled
+        _profiled.add(name)
+    if not first:
+        return fn(*args)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn, *args)
+    finally:
+        path = app_path(f"profile_{name}.prof") if target == "1" else target
+        try:
+            profiler.dump_stats(path)
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(20)
+            print(f"性能分析结果已保存到 {path}\n{output.getvalue()}")
+        except Exception as e:
+            print(f"保存性能分析结果失败: {e}")
@@ -0,0 +1,191 @@
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from command_runner import KILL_WAIT, CommandTimeout, Watchdog, breaker, command_timeout, kill_process, popen
+from device_state import DeviceState
+from metrics import metrics
+
+# 每种系统语言下 pnputil 输出中的字段名，映射到设备记录中的属性
+FIELD_TABLES = {
+    "zh-CN": {
+        "实例 ID": "instance_id",
+        "设备描述": "description",
+        "类名": "class_name",
+        "状态": "status",
+        "问题代码": "problem_code",
+        "驱动程序名称": "driver",
+        "父级": "parent",
+        "子级": "children",
+    },
+    "en-US": {
+        "Instance ID": "instance_id",
+        "Device Description": "description",
+        "Class Name": "class_name",
+        "Status": "status",
+        "Problem Code": "problem_code",
+        "Driver Name": "driver",
+        "Parent": "parent",
+        "Children": "children",
+    },
+}
+
+# 每种系统语言下的状态文本
+STATE_TABLES = {
+    "zh-CN": {
+        "已启动": DeviceState.STARTED,
+        "已禁用": DeviceState.DISABLED,
+        "问题": DeviceState.PROBLEM,
+        "已断开连接": DeviceState.DISCONNECTED,
+    },
+    "en-US": {
+        "Started": DeviceState.STARTED,
+        "Disabled": DeviceState.DISABLED,
+        "Problem": DeviceState.PROBLEM,
+        "Disconnected": DeviceState.DISCONNECTED,
+    },
+}
+
+# 根据实例ID的字段名判断输出的语言
+LOCALE_BY_INSTANCE_LABEL = {
+    label: locale
+    for locale, fields in FIELD_TABLES.items()
+    for label, key in fields.items() if key == "instance_id"
+}
+
+# 本进程中检测到的系统语言，之后的解析直接使用该语言的字段表
+_detected_locale = "zh-CN"
+
+@dataclass
+class DeviceRecord:
+    """pnputil /enum-devices 输出中的一个设备块"""
+    instance_id: str
+    description: str = ""
+    class_name: str = ""
+    status: str = ""
+    driver: str = ""
+    state: DeviceState = DeviceState.UNKNOWN
+    problem_code: Optional[int] = None
+    # 带 /relations 枚举时的父设备和子设备实例ID
+    parent: str = ""
+    children: List[str] = field(default_factory=list)
+
+def split_field(line):
+    """把 "字段名:   值" 形式的一行拆成 (字段名, 值)，不是字段行时字段名为空"""
+    label, sep, value = line.partition(":")
+    if not sep:
+        label, sep, value = line.partition("：")
+        if not sep:
+            return "", ""
+    return label.strip(), value.strip()
+
+def parse_problem_code(value):
+    """问题代码字段形如 "43 (0x2B) [CM_PROB_FAILED_POST_START]"，返回其中的十进制代码"""
+    code = value.split(" ", 1)[0]
+    return int(code) if code.isdigit() else None
+
+def iter_device_records(lines):
+    """逐行解析 pnputil /enum-devices 的输出，每解析完一个设备块就产出一条记录
+
+    使用上次检测到的语言的字段表，遇到其他语言的实例ID字段时切换并记住新的语言；
+    子设备有多个时，第一个之后的子设备在没有字段名的续行中
+    """
+    global _detected_locale
+    fields = FIELD_TABLES[_detected_locale]
+    states = STATE_TABLES[_detected_locale]
+    current = None
+    key = None
+
+    for line in lines:
+        # 空行表示当前设备块结束
+        if not line.strip():
+            if current is not None:
+                yield current
+                current = None
+            continue
+
+        if line[:1].isspace() and key == "children" and current is not None:
+            current.children.append(line.strip())
+            continue
+
+        label, value = split_field(line)
+        key = fields.get(label)
+        if key is None:
+            locale = LOCALE_BY_INSTANCE_LABEL.get(label)
+            if locale is None:
+                continue
+            _detected_locale = locale
+            fields = FIELD_TABLES[locale]
+            states = STATE_TABLES[locale]
+            key = "instance_id"
+
+        # 遇到实例ID表示开始一个新的设备块
+        if key == "instance_id":
+            if current is not None:
+                yield current
+            current = DeviceRecord(instance_id=value)
+        elif current is None:
+            continue
+        elif key == "status":
+            current.status = value
+            current.state = states.get(value, DeviceState.UNKNOWN)
+        elif key == "problem_code":
+            current.problem_code = parse_problem_code(value)
+        elif key == "children":
+            current.children.append(value)
+        else:
+            setattr(current, key, value)
+
+    if current is not None:
+        yield current
+
+def parse_devices(output):
+    """解析完整的 pnputil /enum-devices 输出，返回设备记录列表"""
+    with metrics.timer("parse_duration_seconds"):
+        return list(iter_device_records(output.splitlines()))
+
+def stream_devices(cmd, timeout=None):
+    """启动pnputil并逐行读取其输出，边读边产出设备记录
+
+    命令返回非零退出码时，在产出所有已解析的记录之后抛出 CalledProcessError；超过 timeout
+    （默认为命令超时）时结束进程树并抛出 CommandTimeout；熔断器打开时抛出 BackendUnavailable
+    """
+    tool_breaker = breaker("pnputil")
+    tool_breaker.check()
+    timeout = command_timeout() if timeout is None else timeout
+    metrics.increment("spawns_total", tool="pnputil")
+    start = time.perf_counter()
+    try:
+        process = popen(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        metrics.increment("spawn_failures_total", tool="pnputil")
+        tool_breaker.record_failure()
+        raise
+    watchdog = Watchdog(process, timeout)
+    try:
+        yield from iter_device_records(process.stdout)
+    finally:
+        watchdog.cancel()
+        process.stdout.close()
+        # 调用方提前停止迭代时结束子进程
+        if process.poll() is None:
+            kill_process(process)
+        try:
+            returncode = process.wait(timeout=KILL_WAIT)
+        except subprocess.TimeoutExpired:
+            returncode = None
+        # 包含调用方处理记录的时间
+        metrics.observe("command_duration_seconds", time.perf_counter() - start, tool="pnputil", kind="stream")
+        # 调用方提前停止迭代时同样要记录结果，否则处于试探状态的熔断器不会恢复
+        if watchdog.expired:
+            metrics.increment("command_timeouts_total", tool="pnputil", kind="stream")
+            tool_breaker.record_failure()
+        else:
+            tool_breaker.record_success()
+
+    if watchdog.expired:
+        raise CommandTimeout(cmd, timeout)
+    if returncode != 0:
+        metrics.increment("spawn_failures_total", tool="pnputil")
+        raise subprocess.CalledProcessError(returncode, cmd)
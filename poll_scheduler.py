@@ -0,0 +1,70 @@
+import threading
+import time
+
+# 默认轮询参数，可在config.json的 "polling" 中覆盖
+DEFAULT_POLLING = {
+    # 状态变化或出错后的轮询间隔
+    "min_interval_ms": 1000,
+    # 状态一直不变时，间隔按倍数增长到的上限
+    "max_interval_ms": 60000,
+    "backoff": 2.0,
+    # 启用/禁用操作完成后第一次检查状态的延迟
+    "post_action_delay_ms": 300,
+    # 操作完成后在这段时间内保持最短间隔，等待设备完成状态切换
+    "fast_window_ms": 10000,
+}
+
+class AdaptivePollScheduler:
+    """自适应状态轮询间隔：状态变化或操作之后快速轮询，状态不变时指数退避"""
+
+    def __init__(self, min_interval_ms=1000, max_interval_ms=60000, backoff=2.0,
+                 post_action_delay_ms=300, fast_window_ms=10000):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max(max_interval_ms, min_interval_ms)
+        self.backoff = max(backoff, 1.0)
+        self.post_action_delay_ms = post_action_delay_ms
+        self.fast_window_ms = fast_window_ms
+        self.paused = False
+        self._lock = threading.Lock()
+        self._interval = min_interval_ms
+        self._last_observation = None
+        self._fast_until = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """根据config.json中的 "polling" 配置创建"""
+        options = dict(DEFAULT_POLLING)
+        options.update(config.get("polling", {}))
+        return cls(**{key: options[key] for key in DEFAULT_POLLING})
+
+    def observe(self, observation):
+        """记录一次轮询结果（例如 "enabled"/"disabled"/"not_found"/"error"），返回下次轮询的间隔(毫秒)"""
+        with self._lock:
+            if observation != self._last_observation or time.monotonic() < self._fast_until:
+                self._interval = self.min_interval_ms
+            else:
+                self._interval = min(self._interval * self.backoff, self.max_interval_ms)
+            self._last_observation = observation
+            return int(self._interval)
+
+    def kick(self):
+        """启用/禁用操作之后调用，返回第一次检查状态前的延迟(毫秒)"""
+        with self._lock:
+            self._interval = self.min_interval_ms
+            self._fast_until = time.monotonic() + self.fast_window_ms / 1000
+            return self.post_action_delay_ms
+
+    @property
+    def interval_ms(self):
+        """当前的轮询间隔(毫秒)"""
+        return int(self._interval)
+
+    def pause(self):
+        """暂停轮询，例如窗口最小化时"""
+        self.paused = True
+
+    def resume(self):
+        """恢复轮询，下一次轮询使用最短间隔"""
+        with self._lock:
+            self.paused = False
+            self._interval = self.min_interval_ms
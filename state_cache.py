@@ -0,0 +1,155 @@
+"""上次得到的设备清单和设备状态，保存在程序目录下，程序启动时先显示上次的结果，再在后台确认
+
+文件内容紧凑，每个设备一行数组：
+    {"version": 1, "saved_at": 时间戳,
+     "devices": [[实例ID, 描述, 类名, 状态, 问题代码, 父设备ID, [子设备ID, ...]], ...],
+     "status": {"设备ID（大写）": [设备ID, 描述, 状态, 问题代码, 记录时间]}}
+"""
+import json
+import os
+import threading
+import time
+
+from app_paths import app_path
+from device_index import DeviceTopology
+from device_state import DeviceState, DeviceStatus
+from pnputil_parser import DeviceRecord
+
+CACHE_VERSION = 1
+# 修改后延迟写入的时间（秒），定时刷新频繁时只写最后一次
+SAVE_DELAY = 2.0
+
+def _state(value):
+    try:
+        return DeviceState(value)
+    except ValueError:
+        return DeviceState.UNKNOWN
+
+class DeviceStateCache:
+    """设备清单快照和单个设备状态的磁盘缓存，内容没有变化时不写文件
+
+    修改后延迟写入，先写临时文件再替换；读取到的结果只用于启动时的显示，需要由新的查询确认
+    """
+
+    def __init__(self, path=None, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._devices = []
+        self._status = {}
+        self._saved_at = 0.0
+        self._dirty = False
+        self._save_timer = None
+        # 设备ID（大写）-> 设备清单中的行，第一次按ID查询时建立
+        self._rows = None
+
+    def _ensure_loaded(self):
+        """第一次使用时从文件加载，调用方需持有锁"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return
+            self._devices = [list(row) for row in data.get("devices", [])]
+            self._status = {key: list(entry) for key, entry in data.get("status", {}).items()}
+            self._saved_at = data.get("saved_at", 0.0)
+        except Exception as e:
+            print(f"读取设备状态缓存失败: {e}")
+
+    def _write(self):
+        """写入缓存文件（先写临时文件再替换），调用方需持有锁"""
+        self._dirty = False
+        if not self.path:
+            return
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": CACHE_VERSION, "saved_at": self._saved_at,
+                           "devices": self._devices, "status": self._status},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"保存设备状态缓存失败: {e}")
+
+    def _schedule_save(self):
+        """延迟写入，调用方需持有锁"""
+        self._saved_at = time.time()
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def update_inventory(self, devices):
+        """保存新的设备清单快照 {设备ID（大写）: 设备记录}，可以直接作为设备清单的监听函数"""
+        rows = [[record.instance_id, record.description, record.class_name, record.state.value,
+                 record.problem_code, record.parent, record.children]
+                for record in devices.values()]
+        with self._lock:
+            self._ensure_loaded()
+            if rows == self._devices:
+                return
+            self._devices = rows
+            self._rows = None
+            self._schedule_save()
+
+    def update_status(self, device_id, status, description=""):
+        """保存单个设备查询到的状态（DeviceStatus），设备不存在时 status 为None"""
+        key = device_id.upper()
+        with self._lock:
+            self._ensure_loaded()
+            if status is None:
+                if self._status.pop(key, None) is not None:
+                    self._schedule_save()
+                return
+            entry = [device_id, description, status.state.value, status.problem_code]
+            previous = self._status.get(key)
+            if previous is not None and previous[:4] == entry:
+                return
+            self._status[key] = entry + [time.time()]
+            self._schedule_save()
+
+    def cached_status(self, device_id):
+        """返回上次记录的 (DeviceStatus, 描述, 记录时间)，没有记录时返回None"""
+        key = device_id.strip('"\'').strip().upper()
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._status.get(key)
+            if entry is not None:
+                _, description, state, problem_code, saved_at = entry
+                return DeviceStatus(_state(state), problem_code), description, saved_at
+            if self._rows is None:
+                self._rows = {row[0].upper(): row for row in self._devices}
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            return DeviceStatus(_state(row[3]), row[4]), row[1], self._saved_at
+
+    def cached_topology(self):
+        """由上次的设备清单建立的父子关系索引，没有记录时返回None"""
+        with self._lock:
+            self._ensure_loaded()
+            rows = list(self._devices)
+        if not rows:
+            return None
+        return DeviceTopology(DeviceRecord(instance_id, description, class_name, state=_state(state),
+                                           problem_code=problem_code, parent=parent or "", children=list(children))
+                              for instance_id, description, class_name, state, problem_code, parent, children in rows)
+
+    def flush(self):
+        """立即写入未保存的修改，例如程序退出前"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._write()
+
+# 程序共用的设备状态缓存
+state_cache = DeviceStateCache(app_path("device_state_cache.json"))
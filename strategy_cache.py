@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+
+# 缺失工具的记录在这段时间后失效，以便重新检测（例如之后安装了devcon）
+MISSING_TOOL_TTL = 24 * 3600
+# 最多记住的设备命令形式数量，超过时丢弃最久没有更新的记录
+MAX_FORMS = 1000
+
+class StrategyCache:
+    """记住每个设备可用的命令形式（/instanceid、/deviceid、devcon），以及系统中缺失的命令行工具
+
+    结果保存在JSON文件中，程序重启后继续使用；某种命令形式失败时对应的记录立即失效
+    """
+
+    def __init__(self, path=None, missing_tool_ttl=MISSING_TOOL_TTL, max_forms=MAX_FORMS):
+        self.path = path
+        self.missing_tool_ttl = missing_tool_ttl
+        self.max_forms = max_forms
+        self._lock = threading.Lock()
+        self._loaded = False
+        # "操作类别|设备ID" -> 可用的命令形式，按最后更新的顺序排列
+        self._forms = {}
+        # 工具名 -> 发现缺失的时间戳
+        self._missing_tools = {}
+
+    def _ensure_loaded(self):
+        """第一次使用时从文件加载，调用方需持有锁"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._forms = dict(data.get("forms", {}))
+            self._prune()
+            self._missing_tools = dict(data.get("missing_tools", {}))
+        except Exception as e:
+            print(f"读取命令策略缓存失败: {e}")
+
+    def _save(self):
+        """写入缓存文件（先写临时文件再替换），调用方需持有锁"""
+        if not self.path:
+            return
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"forms": self._forms, "missing_tools": self._missing_tools},
+                          f, indent=4, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"保存命令策略缓存失败: {e}")
+
+    def _prune(self):
+        """丢弃超出数量上限的最旧记录，调用方需持有锁"""
+        excess = len(self._forms) - self.max_forms
+        if excess > 0:
+            for key in list(self._forms)[:excess]:
+                del self._forms[key]
+
+    @staticmethod
+    def _key(kind, device_id):
+        return f"{kind}|{device_id.upper()}"
+
+    def order(self, kind, device_id, forms, tool_of):
+        """按尝试顺序返回命令形式：上次成功的形式排在最前，跳过缺失工具的形式"""
+        with self._lock:
+            self._ensure_loaded()
+            preferred = self._forms.get(self._key(kind, device_id))
+            ordered = sorted(forms, key=lambda form: form != preferred)
+            return [form for form in ordered if not self._is_missing(tool_of(form))]
+
+    def record_success(self, kind, device_id, form):
+        """记录某设备可用的命令形式"""
+        with self._lock:
+            self._ensure_loaded()
+            key = self._key(kind, device_id)
+            if self._forms.get(key) != form:
+                self._forms.pop(key, None)
+                self._forms[key] = form
+                self._prune()
+                self._save()
+
+    def record_failure(self, kind, device_id, form):
+        """某种命令形式失败时，如果它是记住的形式则使其失效"""
+        with self._lock:
+            self._ensure_loaded()
+            key = self._key(kind, device_id)
+            if self._forms.get(key) == form:
+                del self._forms[key]
+                self._save()
+
+    def _is_missing(self, tool):
+        marked = self._missing_tools.get(tool)
+        if marked is None:
+            return False
+        if time.time() - marked > self.missing_tool_ttl:
+            del self._missing_tools[tool]
+            return False
+        return True
+
+    def is_tool_missing(self, tool):
+        """工具是否被记录为缺失"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._is_missing(tool)
+
+    def mark_tool_missing(self, tool):
+        """记录系统中缺失的命令行工具"""
+        with self._lock:
+            self._ensure_loaded()
+            if not self._is_missing(tool):
+                self._missing_tools[tool] = time.time()
+                self._save()
+
+    def clear(self):
+        """清空所有记录"""
+        with self._lock:
+            self._loaded = True
+            self._forms = {}
+            self._missing_tools = {}
+            self._save()
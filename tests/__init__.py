@@ -0,0 +1,18 @@
+"""单元测试：使用 benchmarks/ 中的假 pnputil/devcon/wmi，可以在非Windows环境下运行
+
+    python -m pytest tests
+    python -m unittest discover -s tests -t .
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+sys.path.insert(0, ROOT)
+
+# 在导入程序模块之前设置：缓存文件写入临时目录，命令使用假的工具，默认不使用WMI
+os.environ["DMCONTROL_APP_DIR"] = tempfile.mkdtemp(prefix="dmcontrol_test_")
+os.environ["DMCONTROL_PNPUTIL"] = f'"{sys.executable}" "{os.path.join(BENCHMARKS, "fake_pnputil.py")}"'
+os.environ["DMCONTROL_DEVCON"] = f'"{sys.executable}" "{os.path.join(BENCHMARKS, "fake_devcon.py")}"'
+os.environ["DMCONTROL_BACKEND"] = "pnputil"
@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import sys
+import unittest
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock
+
+from tests import BENCHMARKS
+from tests.support import ENCLOSURE, MISSING, STORAGE, FakeToolsTestCase
+
+from backend_worker import INVENTORY_TTL_ENV, BackendWorkerClient, BackendWorkerError, serve, worker_command
+
+STAND_IN = [sys.executable, os.path.join(BENCHMARKS, "stand_in_worker.py")]
+
+class StandInWorkerTest(unittest.TestCase):
+    """使用替身后端进程测试客户端：流水线、后端进程退出和超时"""
+
+    def setUp(self):
+        self.client = BackendWorkerClient(command=STAND_IN)
+        self.addCleanup(self.client.close)
+
+    def test_pipelined_requests(self):
+        futures = [self.client.submit("status", device_id=f"D{i}") for i in range(50)]
+        self.client.call("disable", timeout=10, device_id="D7")
+        self.assertEqual([future.result(10) for future in futures], [False] * 50)
+        self.assertIs(self.client.call("status", timeout=10, device_id="D7"), True)
+        self.assertEqual(self.client.pending(), 0)
+
+    def test_worker_exit_fails_pending_requests_and_restarts(self):
+        pid = self.client.call("ping", timeout=10)
+        with self.assertRaises(BackendWorkerError):
+            self.client.call("exit", timeout=10)
+        self.assertEqual(self.client.pending(), 0)
+        self.assertNotEqual(self.client.call("ping", timeout=10), pid)
+
+    def test_timeout_drops_the_request(self):
+        with self.assertRaises(FutureTimeoutError):
+            self.client.call("hang", timeout=0.2)
+        self.assertEqual(self.client.pending(), 0)
+        # 后端进程仍然可用
+        self.assertIsInstance(self.client.call("ping", timeout=10), int)
+
+class BackendWorkerTest(FakeToolsTestCase):
+    """真实的后端进程，使用假的pnputil"""
+
+    def test_status_and_control(self):
+        client = BackendWorkerClient(command=worker_command())
+        self.addCleanup(client.close)
+        self.assertEqual(client.call("status", timeout=30, device_id=ENCLOSURE)["state"], "started")
+        self.assertIsNone(client.call("status", timeout=30, device_id=MISSING))
+        self.assertIs(client.call("disable", timeout=30, device_id=ENCLOSURE), True)
+        statuses = client.call("statuses", timeout=30, device_ids=[ENCLOSURE, STORAGE, MISSING])
+        self.assertEqual(statuses[ENCLOSURE]["state"], "disabled")
+        self.assertEqual(statuses[STORAGE]["description"], "USB Mass Storage Device")
+        self.assertIsNone(statuses[MISSING])
+
+    def serve_status_requests(self, ttl, count=3):
+        """在本进程中运行后端主循环处理 count 个状态请求，返回启动pnputil的次数"""
+        open(self.calls_path, "w").close()
+        requests = "".join(json.dumps({"id": i, "op": "status", "device_id": ENCLOSURE}) + "\n" for i in range(count))
+        stdout = io.StringIO()
+        with mock.patch.dict(os.environ, {INVENTORY_TTL_ENV: ttl}):
+            serve(stdin=io.StringIO(requests), stdout=stdout, max_workers=1)
+        responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([response["result"]["state"] for response in responses], ["started"] * count)
+        return len(self.calls("pnputil"))
+
+    def test_serve_uses_inventory_ttl_from_env(self):
+        # 有效期内所有请求共用一次枚举，有效期为0时每个请求都重新枚举
+        self.assertEqual(self.serve_status_requests("60"), 1)
+        self.assertGreaterEqual(self.serve_status_requests("0"), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from unittest import mock
+
+from tests.support import ENCLOSURE, FakeToolsTestCase
+
+from command_runner import (RETRY_BASE_DELAY, BackendUnavailable, CircuitBreaker, CommandTimeout, backend_health, breaker,
+                            run_command)
+from device_backend import device_exists, pnputil_cmd
+from device_inventory import DeviceInventory
+from pnputil_parser import stream_devices
+
+# 启动一个子进程后一直等待，子进程的PID写入 argv[1]
+SPAWN_AND_HANG = (
+    "import subprocess, sys, time; "
+    "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3600)']); "
+    "open(sys.argv[1], 'w').write(str(child.pid)); "
+    "time.sleep(3600)"
+)
+
+def process_alive(pid):
+    """进程是否仍在运行（已结束但未被回收的僵尸进程不算）"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_threshold_and_probes_with_backoff(self):
+        tool_breaker = CircuitBreaker("test", failure_threshold=2, base_delay=0.05, max_delay=0.1)
+        tool_breaker.check()
+        tool_breaker.record_failure()
+        self.assertEqual(tool_breaker.state, "closed")
+        tool_breaker.record_failure()
+        self.assertEqual(tool_breaker.state, "open")
+        with self.assertRaises(BackendUnavailable) as raised:
+            tool_breaker.check()
+        self.assertEqual(raised.exception.tool, "test")
+
+        # 等待结束后只放行一个试探调用
+        time.sleep(0.06)
+        tool_breaker.check()
+        self.assertEqual(tool_breaker.state, "half_open")
+        with self.assertRaises(BackendUnavailable):
+            tool_breaker.check()
+
+        # 试探失败：等待时间加倍（不超过最长等待时间）
+        tool_breaker.record_failure()
+        self.assertEqual(tool_breaker.state, "open")
+        self.assertGreater(tool_breaker.snapshot()["retry_in"], 0.05)
+        time.sleep(0.11)
+        tool_breaker.check()
+        tool_breaker.record_success()
+        self.assertEqual(tool_breaker.snapshot(), {"tool": "test", "state": "closed", "failures": 0, "retry_in": 0.0})
+
+    def test_success_resets_failure_count(self):
+        tool_breaker = CircuitBreaker("test", failure_threshold=2)
+        tool_breaker.record_failure()
+        tool_breaker.record_success()
+        tool_breaker.record_failure()
+        self.assertEqual(tool_breaker.state, "closed")
+
+class RunCommandTest(FakeToolsTestCase):
+
+    def test_output_and_exit_code(self):
+        self.assertIn(ENCLOSURE, run_command(pnputil_cmd("/enum-devices"), "pnputil", "query"))
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_command(pnputil_cmd("/unknown"), "pnputil", "query")
+        # 非零退出码也说明工具可用
+        self.assertEqual(breaker("pnputil").state, "closed")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "通过 /proc 检查进程")
+    def test_timeout_kills_process_tree(self):
+        pid_path = os.path.join(self.workdir, "child.pid")
+        cmd = f'"{sys.executable}" -c "{SPAWN_AND_HANG}" "{pid_path}"'
+        start = time.monotonic()
+        with self.assertRaises(CommandTimeout):
+            run_command(cmd, "pnputil", "query", timeout=1)
+        self.assertLess(time.monotonic() - start, 5)
+        with open(pid_path, "r") as f:
+            child = int(f.read())
+        deadline = time.monotonic() + 5
+        while process_alive(child) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(process_alive(child))
+
+class HangingBackendTest(FakeToolsTestCase):
+    """假的pnputil/devcon不返回时：超时后结束，连续超时后熔断器打开，不再启动进程"""
+
+    def setUp(self):
+        super().setUp()
+        self.hang_flag = os.path.join(self.workdir, "hang")
+        open(self.hang_flag, "w").close()
+        os.environ["FAKE_PNPUTIL_HANG"] = self.hang_flag
+        os.environ["FAKE_DEVCON_HANG"] = self.hang_flag
+
+    def test_stream_timeout(self):
+        with self.assertRaises(CommandTimeout):
+            list(stream_devices(pnputil_cmd("/enum-devices"), timeout=0.5))
+
+    def test_breaker_stops_spawning_and_recovers(self):
+        tool_breaker = breaker("pnputil")
+        tool_breaker.base_delay = 0.2
+        self.addCleanup(setattr, tool_breaker, "base_delay", RETRY_BASE_DELAY)
+        for _ in range(tool_breaker.failure_threshold):
+            with self.assertRaises(CommandTimeout):
+                run_command(pnputil_cmd("/enum-devices"), "pnputil", "query", timeout=0.5)
+        self.assertEqual([item["tool"] for item in backend_health()], ["pnputil"])
+
+        spawned = len(self.calls())
+        with self.assertRaises(BackendUnavailable):
+            run_command(pnputil_cmd("/enum-devices"), "pnputil", "query")
+        # 枚举失败时清单不可用，不会卡住
+        self.assertFalse(DeviceInventory().available)
+        self.assertEqual(len(self.calls()), spawned)
+
+        # 工具恢复后，等待结束的试探调用成功，熔断器关闭
+        os.remove(self.hang_flag)
+        time.sleep(0.25)
+        self.assertTrue(DeviceInventory().exists(ENCLOSURE))
+        self.assertEqual(backend_health(), [])
+
+    def test_per_device_query_raises_when_every_form_times_out(self):
+        with mock.patch("command_runner._command_timeout", 0.5):
+            with self.assertRaises(subprocess.TimeoutExpired):
+                device_exists(ENCLOSURE)
+
+if __name__ == "__main__":
+    unittest.main()
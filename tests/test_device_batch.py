@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+
+from device_batch import CYCLE_ERROR, dependencies, dependency_order, parse_device_group, run_batch, submit_batch
+from device_tasks import DeviceTaskExecutor
+from device_transition import TransitionResult
+
+class RunBatchTest(unittest.TestCase):
+
+    def test_failed_transition_is_reported_as_failure(self):
+        results = run_batch(["A", "B"], "enable", operation=lambda d: TransitionResult(d, "enable", False))
+        self.assertEqual([(result.success, result.error) for result in results],
+                         [(False, "操作失败"), (False, "操作失败")])
+
+    def test_unconfirmed_transition_is_reported_as_failure(self):
+        def operation(device_id):
+            return TransitionResult(device_id, "disable", True, confirmed=device_id == "A")
+
+        results = run_batch(["A", "B"], "disable", operation=operation)
+        self.assertEqual([(result.success, result.error) for result in results],
+                         [(True, ""), (False, "未进入目标状态")])
+
+    def test_boolean_results_and_exceptions(self):
+        def operation(device_id):
+            if device_id == "C":
+                raise RuntimeError("超时")
+            return device_id == "A"
+
+        results = run_batch(["A", "B", "C"], "enable", operation=operation)
+        self.assertEqual([(result.success, result.error) for result in results],
+                         [(True, ""), (False, "操作失败"), (False, "超时")])
+
+    def test_dependency_order(self):
+        order = []
+        lock = threading.Lock()
+
+        def operation(device_id):
+            with lock:
+                order.append(device_id)
+            return True
+
+        _, parents = parse_device_group({"devices": ["HUB", {"id": "DISK", "parent": "HUB"}]})
+        run_batch(["HUB", "DISK"], "disable", parents, operation=operation)
+        self.assertEqual(order, ["DISK", "HUB"])
+        order.clear()
+        run_batch(["HUB", "DISK"], "enable", parents, operation=operation)
+        self.assertEqual(order, ["HUB", "DISK"])
+
+    def test_cycle_is_not_executed(self):
+        results = run_batch(["A", "B", "C"], "enable", {"A": "B", "B": "A"}, operation=lambda d: True)
+        self.assertEqual([(result.success, result.error) for result in results],
+                         [(False, CYCLE_ERROR), (False, CYCLE_ERROR), (True, "")])
+
+class SubmitBatchTest(unittest.TestCase):
+    """每个设备的操作交给按设备串行的执行器"""
+
+    def setUp(self):
+        self.executor = DeviceTaskExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds=0.0):
+        with self.lock:
+            self.events.append(("start", name))
+        time.sleep(seconds)
+        with self.lock:
+            self.events.append(("end", name))
+
+    def run_batch(self, device_ids, action, parents=None, max_workers=4):
+        done = threading.Event()
+        results = []
+
+        def operation(device_id):
+            self.record(device_id, 0.05)
+            return True
+
+        submit_batch(self.executor.submit, device_ids, action, parents, max_workers, operation,
+                     lambda batch_results: (results.extend(batch_results), done.set()))
+        self.assertTrue(done.wait(5))
+        return results
+
+    def test_waits_for_running_task_of_same_device(self):
+        self.executor.submit("A", self.record, "refresh A", 0.2)
+        time.sleep(0.05)
+        results = self.run_batch(["A", "B"], "disable")
+        self.assertTrue(all(result.success for result in results))
+        self.assertLess(self.events.index(("end", "refresh A")), self.events.index(("start", "A")))
+        # 其他设备不等待
+        self.assertLess(self.events.index(("start", "B")), self.events.index(("end", "refresh A")))
+
+    def test_dependencies_and_limit(self):
+        results = self.run_batch(["HUB", "A", "B", "C"], "disable", {"A": "HUB", "B": "HUB", "C": "HUB"}, max_workers=2)
+        self.assertEqual([result.device_id for result in results], ["HUB", "A", "B", "C"])
+        self.assertEqual(self.events[-2:], [("start", "HUB"), ("end", "HUB")])
+        running = peak = 0
+        for kind, _ in self.events:
+            running += 1 if kind == "start" else -1
+            peak = max(peak, running)
+        self.assertEqual(peak, 2)
+
+    def test_rejected_submit_is_reported(self):
+        self.executor.shutdown()
+        results = []
+        submit_batch(lambda *args: None, ["A", "B"], "enable", on_complete=results.extend,
+                     operation=lambda device_id: True)
+        self.assertEqual([result.error for result in results], ["已取消", "已取消"])
+
+class DependencyOrderTest(unittest.TestCase):
+
+    def test_order(self):
+        device_ids = ["DISK", "HUB", "MOUSE", "ROOT"]
+        parents = {"DISK": "HUB", "HUB": "ROOT", "MOUSE": "ROOT", "OTHER": "HUB"}
+        self.assertEqual(dependency_order(device_ids, dependencies(device_ids, parents, "enable")),
+                         ["ROOT", "HUB", "MOUSE", "DISK"])
+        self.assertEqual(dependency_order(device_ids, dependencies(device_ids, parents, "disable")),
+                         ["DISK", "MOUSE", "HUB", "ROOT"])
+
+    def test_cycle_is_left_out(self):
+        device_ids = ["A", "B", "C"]
+        self.assertEqual(dependency_order(device_ids, dependencies(device_ids, {"A": "B", "B": "A"}, "enable")), ["C"])
+
+if __name__ == "__main__":
+    unittest.main()
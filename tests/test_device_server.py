@@ -0,0 +1,133 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from tests.support import ENCLOSURE, HUB, MISSING, SERIAL, STORAGE, FakeToolsTestCase
+
+from command_runner import BackendUnavailable
+from device_server import AsyncDeviceService, ControlServer, is_loopback, serve_forever
+
+class ControlServerTest(FakeToolsTestCase):
+    """在本进程中启动HTTP控制接口，使用假的pnputil/devcon"""
+
+    def request(self, raw, token=None):
+        """发送原始请求，返回 (状态码, 响应数据)"""
+        async def run():
+            server = ControlServer(AsyncDeviceService(ttl=5.0), token)
+            listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+            async with listener:
+                port = listener.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(raw)
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = int(head.split(b" ", 2)[1])
+                length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+                body = json.loads(await reader.readexactly(length))
+                writer.close()
+                return status, body
+        return asyncio.run(run())
+
+    def post(self, path, data, headers="Host: 127.0.0.1:8765\r\nContent-Type: application/json\r\n", token=None):
+        body = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+        return self.request(f"POST {path} HTTP/1.1\r\nConnection: close\r\n"
+                            f"Content-Length: {len(body)}\r\n{headers}\r\n".encode("latin-1") + body, token)
+
+    def get(self, target):
+        return self.request(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode("latin-1"))
+
+    def test_invalid_content_length(self):
+        for value in ("abc", "-1"):
+            status, body = self.request(f"POST /enable HTTP/1.1\r\nContent-Length: {value}\r\n\r\n".encode("latin-1"))
+            self.assertEqual(status, 400, value)
+            self.assertIn("Content-Length", body["error"])
+
+    def test_invalid_bodies(self):
+        cases = [
+            ("/enable", {"device_id": ENCLOSURE, "wait": "abc"}),
+            ("/enable", {"device_id": ENCLOSURE, "wait": -1}),
+            ("/disable", {"wait": 1}),
+            ("/disable", {"device_id": 5}),
+            ("/batch", {"action": "disable"}),
+            ("/batch", {"action": "disable", "device_ids": ENCLOSURE}),
+            ("/batch", {"action": "disable", "device_ids": [ENCLOSURE, None]}),
+            ("/batch", {"action": "disable", "device_ids": [ENCLOSURE], "parents": [HUB]}),
+            ("/batch", {"action": "reboot", "device_ids": [ENCLOSURE]}),
+            ("/enable", b"[1, 2]"),
+            ("/enable", b"{"),
+        ]
+        for path, data in cases:
+            self.assertEqual(self.post(path, data)[0], 400, (path, data))
+        self.assertEqual(self.calls(), [])
+
+    def test_rejects_requests_from_web_pages(self):
+        body = {"device_id": ENCLOSURE}
+        cases = [
+            ("Host: 127.0.0.1\r\nContent-Type: text/plain\r\n", 415),
+            ("Host: 127.0.0.1\r\n", 415),
+            ("Host: 127.0.0.1\r\nContent-Type: application/json\r\nOrigin: http://evil.example\r\n", 403),
+            ("Host: evil.example\r\nContent-Type: application/json\r\n", 403),
+            ("Content-Type: application/json\r\n", 403),
+        ]
+        for headers, expected in cases:
+            self.assertEqual(self.post("/disable", body, headers)[0], expected, headers)
+        self.assertEqual(self.calls(), [])
+        status, result = self.post("/disable", body, "Host: [::1]:8765\r\nContent-Type: application/json; charset=utf-8\r\n")
+        self.assertEqual((status, result["success"]), (200, True))
+
+    def test_token(self):
+        headers = "Host: localhost\r\nContent-Type: application/json\r\n"
+        self.assertEqual(self.post("/enable", {"device_id": ENCLOSURE}, headers, token="secret")[0], 401)
+        self.assertEqual(self.post("/enable", {"device_id": ENCLOSURE}, headers + "Authorization: Bearer secret\r\n",
+                                   token="secret")[0], 200)
+
+    def test_non_loopback_requires_token(self):
+        self.assertTrue(is_loopback("127.0.0.1") and is_loopback("::1") and is_loopback("localhost"))
+        self.assertFalse(is_loopback("0.0.0.0") or is_loopback("192.168.1.10"))
+        with self.assertRaises(ValueError):
+            asyncio.run(serve_forever("0.0.0.0", 0))
+
+    def test_status(self):
+        status, body = self.get(f"/status?id={ENCLOSURE.replace('&', '%26')}&id={MISSING.replace('&', '%26')}")
+        self.assertEqual(status, 200)
+        self.assertEqual(body[0]["state"], "started")
+        self.assertFalse(body[1]["found"])
+
+    def test_batch_runs_dependencies_in_order(self):
+        status, body = self.post("/batch", {"action": "disable", "device_ids": [HUB, ENCLOSURE, STORAGE, SERIAL],
+                                            "parents": {ENCLOSURE: HUB, STORAGE: HUB, SERIAL: HUB}, "wait": 10})
+        self.assertEqual(status, 200)
+        self.assertTrue(all(item["success"] and item["confirmed"] for item in body), body)
+        controls = [call for call in self.calls("pnputil") if "/disable-device" in call]
+        self.assertTrue(controls[-1].endswith(HUB), controls)
+        # 并发禁用的设备的结果都被保存
+        status, body = self.get("/status?" + "&".join(f"id={d.replace('&', '%26')}" for d in (ENCLOSURE, STORAGE, SERIAL)))
+        self.assertEqual([item["state"] for item in body], ["disabled"] * 3)
+
+class BatchErrorTest(FakeToolsTestCase):
+
+    def test_backend_error_fails_device_and_its_dependents(self):
+        service = AsyncDeviceService(ttl=5.0)
+        control = service._control
+
+        async def failing_control(device_id, action):
+            if device_id == ENCLOSURE:
+                raise BackendUnavailable("devcon", 5.0)
+            return await control(device_id, action)
+
+        with mock.patch.object(service, "_control", failing_control):
+            results = asyncio.run(service.batch([HUB, ENCLOSURE, STORAGE], "disable",
+                                                {ENCLOSURE: HUB, STORAGE: HUB}))
+        by_id = {item["device_id"]: item for item in results}
+        self.assertFalse(by_id[ENCLOSURE]["success"])
+        self.assertIn("devcon", by_id[ENCLOSURE]["error"])
+        self.assertEqual(by_id[ENCLOSURE]["retry_in"], 5.0)
+        # 兄弟设备照常执行，依赖出错设备的集线器不执行
+        self.assertTrue(by_id[STORAGE]["success"])
+        self.assertFalse(by_id[HUB]["success"])
+        self.assertIn(ENCLOSURE, by_id[HUB]["error"])
+        self.assertFalse(any(call.endswith(HUB) for call in self.calls("pnputil") if "/disable-device" in call))
+
+if __name__ == "__main__":
+    unittest.main()
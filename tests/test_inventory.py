@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+from tests.support import BLUETOOTH, ENCLOSURE, MISSING, SERIAL, STORAGE, FakeToolsTestCase
+
+from device_backend import device_exists, disable_device, enable_device, get_device_state, iter_usb_devices
+from device_inventory import DeviceInventory
+from device_state import DeviceState
+
+class DeviceInventoryTest(FakeToolsTestCase):
+
+    def test_lookups_share_one_enumeration(self):
+        inventory = DeviceInventory(ttl=60)
+        self.assertTrue(inventory.exists(ENCLOSURE))
+        self.assertEqual(inventory.get_description(ENCLOSURE), "USB Attached SCSI (UAS) Mass Storage Device")
+        self.assertIs(inventory.is_disabled(STORAGE), True)
+        self.assertEqual(inventory.query_status(SERIAL).problem_code, 43)
+        self.assertIs(inventory.query_status(BLUETOOTH).state, DeviceState.DISCONNECTED)
+        self.assertIsNone(inventory.query_status(MISSING))
+        self.assertEqual(len(self.calls("pnputil")), 1)
+
+    def test_lookup_is_case_insensitive_and_accepts_partial_ids(self):
+        inventory = DeviceInventory(ttl=60)
+        self.assertEqual(inventory.lookup(f'"{ENCLOSURE.lower()}"').instance_id, ENCLOSURE)
+        self.assertEqual(inventory.lookup("USB\\VID_174C&PID_1153").instance_id, ENCLOSURE)
+        self.assertIsNone(inventory.lookup("USB\\VID_174C&PID_11"))
+
+    def test_ttl_and_invalidate(self):
+        inventory = DeviceInventory(ttl=0)
+        inventory.exists(ENCLOSURE)
+        inventory.exists(ENCLOSURE)
+        self.assertEqual(len(self.calls("pnputil")), 2)
+
+        inventory = DeviceInventory(ttl=60)
+        inventory.exists(ENCLOSURE)
+        inventory.invalidate()
+        inventory.exists(ENCLOSURE)
+        self.assertEqual(len(self.calls("pnputil")), 4)
+
+    def test_state_after_disable_and_enable(self):
+        inventory = DeviceInventory(ttl=60)
+        self.assertIs(inventory.query_status(ENCLOSURE).state, DeviceState.STARTED)
+        self.assertTrue(disable_device(ENCLOSURE))
+        inventory.invalidate()
+        self.assertIs(inventory.query_status(ENCLOSURE).state, DeviceState.DISABLED)
+        self.assertTrue(enable_device(ENCLOSURE))
+        inventory.invalidate()
+        self.assertIs(inventory.query_status(ENCLOSURE).state, DeviceState.STARTED)
+
+    def test_usb_devices_skip_disconnected(self):
+        ids = {device["id"] for device in DeviceInventory().usb_devices()}
+        self.assertIn(ENCLOSURE, ids)
+        self.assertNotIn(BLUETOOTH, ids)
+
+class StreamUsbDevicesTest(FakeToolsTestCase):
+    """扫描设备：快照过期时边枚举边产出，枚举完成后载入快照"""
+
+    def test_stale_snapshot_streams_then_loads(self):
+        inventory = DeviceInventory(ttl=60)
+        ids = [device["id"] for device in iter_usb_devices(inventory)]
+        self.assertIn(ENCLOSURE, ids)
+        self.assertNotIn(BLUETOOTH, ids)
+        self.assertEqual(len(self.calls("pnputil")), 1)
+        # 扫描得到的记录已载入快照
+        self.assertIs(inventory.query_status(STORAGE).state, DeviceState.DISABLED)
+        self.assertEqual(list(iter_usb_devices(inventory)), list(inventory.usb_devices()))
+        self.assertEqual(len(self.calls("pnputil")), 1)
+
+    def test_first_device_before_enumeration_finishes(self):
+        finished = threading.Event()
+        records = list(DeviceInventory(ttl=0).snapshot().values())
+
+        def source():
+            yield from records[:len(records) // 2]
+            finished.wait(5)
+            yield from records[len(records) // 2:]
+
+        inventory = DeviceInventory(ttl=60, source=source)
+        devices = inventory.stream_usb_devices()
+        self.assertTrue(next(devices)["id"].upper().startswith("USB\\VID_"))
+        self.assertFalse(finished.is_set())
+        finished.set()
+        list(devices)
+        self.assertTrue(inventory.exists(ENCLOSURE))
+
+    def test_invalidated_during_scan_is_not_loaded(self):
+        inventory = DeviceInventory(ttl=60)
+        devices = inventory.stream_usb_devices()
+        next(devices)
+        inventory.invalidate()
+        list(devices)
+        inventory.exists(ENCLOSURE)
+        self.assertEqual(len(self.calls("pnputil")), 2)
+
+class PerDeviceQueryTest(FakeToolsTestCase):
+    """逐个设备查询（没有快照时的回退路径）"""
+
+    locale = "zh-CN"
+
+    def test_exists_and_state(self):
+        self.assertTrue(device_exists(ENCLOSURE))
+        self.assertTrue(device_exists("USB\\VID_174C&PID_1153"))
+        self.assertIs(get_device_state(STORAGE).state, DeviceState.DISABLED)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from tests.support import BLUETOOTH, DISK, ENCLOSURE, HUB, ROOT_HUB, SERIAL, STORAGE, FakeToolsTestCase, read_fixture
+
+from device_backend import pnputil_cmd
+from device_state import DeviceState
+from pnputil_parser import iter_device_records, parse_devices, parse_problem_code, split_field, stream_devices
+
+EXPECTED_STATES = {
+    ROOT_HUB: DeviceState.STARTED,
+    ENCLOSURE: DeviceState.STARTED,
+    STORAGE: DeviceState.DISABLED,
+    SERIAL: DeviceState.PROBLEM,
+    BLUETOOTH: DeviceState.DISCONNECTED,
+}
+
+class FixtureParsingTest(unittest.TestCase):
+
+    def check_fixture(self, locale):
+        records = {record.instance_id: record for record in parse_devices(read_fixture(locale))}
+        self.assertEqual(len(records), 9)
+        for device_id, state in EXPECTED_STATES.items():
+            self.assertIs(records[device_id].state, state, device_id)
+        self.assertEqual(records[SERIAL].problem_code, 43)
+        self.assertIsNone(records[ENCLOSURE].problem_code)
+        self.assertEqual(records[ENCLOSURE].parent, HUB)
+        self.assertEqual(records[ENCLOSURE].children, [DISK])
+        # 多个子设备时第一个之后的在续行中
+        self.assertEqual(len(records[HUB].children), 3)
+        self.assertEqual(records[ENCLOSURE].driver, "uaspstor.inf")
+        return records
+
+    def test_en_us(self):
+        records = self.check_fixture("en-US")
+        self.assertEqual(records[ENCLOSURE].description, "USB Attached SCSI (UAS) Mass Storage Device")
+        self.assertEqual(records[STORAGE].status, "Disabled")
+
+    def test_zh_cn(self):
+        records = self.check_fixture("zh-CN")
+        self.assertEqual(records[STORAGE].status, "已禁用")
+
+    def test_locale_switches_between_outputs(self):
+        for locale in ("zh-CN", "en-US", "zh-CN"):
+            self.assertIs(self.check_fixture(locale)[STORAGE].state, DeviceState.DISABLED)
+
+    def test_records_are_yielded_incrementally(self):
+        lines = iter(read_fixture("en-US").splitlines())
+        first = next(iter_device_records(lines))
+        self.assertEqual(first.instance_id, ROOT_HUB)
+        # 第一个设备块之后的行还没有被读取
+        self.assertTrue(any(line.startswith("Instance ID:") for line in lines))
+
+    def test_unknown_status_and_fields(self):
+        text = "Instance ID:   USB\\VID_1234&PID_5678\\1\nStatus:   Reticulating\nFoo:   bar\n"
+        record, = parse_devices(text)
+        self.assertIs(record.state, DeviceState.UNKNOWN)
+        self.assertEqual(record.status, "Reticulating")
+
+    def test_helpers(self):
+        self.assertEqual(split_field("实例 ID：  USB\\X"), ("实例 ID", "USB\\X"))
+        self.assertEqual(split_field("    continuation"), ("", ""))
+        self.assertEqual(parse_problem_code("43 (0x2B) [CM_PROB_FAILED_POST_START]"), 43)
+        self.assertIsNone(parse_problem_code("unknown"))
+
+class StreamDevicesTest(FakeToolsTestCase):
+
+    locale = "zh-CN"
+
+    def test_stream_from_fake_pnputil(self):
+        records = list(stream_devices(pnputil_cmd("/enum-devices /relations")))
+        self.assertEqual(len(records), 9)
+        self.assertEqual({record.instance_id: record.parent for record in records}[ENCLOSURE], HUB)
+
+    def test_relations_are_stripped_without_option(self):
+        records = list(stream_devices(pnputil_cmd("/enum-devices")))
+        self.assertFalse(any(record.parent or record.children for record in records))
+
+if __name__ == "__main__":
+    unittest.main()
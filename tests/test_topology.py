@@ -0,0 +1,72 @@
+import os
+import unittest
+from unittest import mock
+
+from tests.support import DISK, ENCLOSURE, HUB, ROOT_HUB, STORAGE, FakeToolsTestCase, read_fixture
+
+import device_inventory
+from device_index import DeviceTopology
+from device_inventory import DeviceInventory
+from pnputil_parser import DeviceRecord, parse_devices
+
+MOUSE_INTERFACE = "USB\\VID_046D&PID_C52B&MI_00\\7&2F8C6A1&0&0000"
+HID = "HID\\VID_046D&PID_C52B&MI_00\\8&1C2D3E4F&0&0000"
+
+class DeviceTopologyTest(unittest.TestCase):
+
+    def test_fixture_relations(self):
+        for locale in ("en-US", "zh-CN"):
+            topology = DeviceTopology(parse_devices(read_fixture(locale)))
+            self.assertEqual(topology.parent(ENCLOSURE), HUB)
+            self.assertEqual(topology.parent(DISK), ENCLOSURE)
+            self.assertIsNone(topology.parent("ACPI\\PNP0A08\\0"))
+            self.assertEqual(topology.hub_of(DISK), HUB)
+            self.assertEqual(topology.hub_of(MOUSE_INTERFACE), ROOT_HUB)
+            self.assertIsNone(topology.hub_of(ROOT_HUB))
+            self.assertEqual(topology.ancestors(DISK)[:3], [ENCLOSURE, HUB, ROOT_HUB])
+            self.assertEqual(topology.descendants(ENCLOSURE), [DISK])
+            self.assertEqual(topology.descendants(HUB)[:3], [ENCLOSURE, DISK, STORAGE])
+            self.assertEqual(topology.descendants(STORAGE), [])
+
+    def test_devices_only_named_in_relations(self):
+        # 子设备没有被枚举到（例如HID设备在其他类中）时仍然出现在关系中
+        topology = DeviceTopology(parse_devices(read_fixture("en-US")))
+        self.assertIn(HID, topology)
+        self.assertIsNone(topology.record(HID))
+        self.assertEqual(topology.parent(HID.lower()), MOUSE_INTERFACE)
+
+    def test_cycle_terminates(self):
+        topology = DeviceTopology([DeviceRecord("A", parent="B"), DeviceRecord("B", parent="A")])
+        self.assertEqual(topology.ancestors("A"), ["B", "A"])
+        self.assertEqual(topology.descendants("A"), ["B"])
+
+class RelationsFallbackTest(FakeToolsTestCase):
+    """pnputil不支持 /relations 时改用普通枚举，一段时间后再尝试"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(device_inventory, "_relations_retry_at", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.flag = os.path.join(self.workdir, "no_relations")
+        os.environ["FAKE_PNPUTIL_NO_RELATIONS"] = self.flag
+
+    def test_transient_failure_is_retried(self):
+        open(self.flag, "w").close()
+        inventory = DeviceInventory(ttl=0)
+        self.assertTrue(inventory.exists(ENCLOSURE))
+        self.assertIsNone(inventory.topology(refresh=False))
+
+        # 失败后的等待时间内不再尝试 /relations
+        os.remove(self.flag)
+        inventory.invalidate()
+        inventory.exists(ENCLOSURE)
+        self.assertEqual(sum("/relations" in call for call in self.calls("pnputil")), 1)
+
+        # 等待时间结束后重新得到设备关系
+        device_inventory._relations_retry_at = 0.0
+        inventory.invalidate()
+        self.assertEqual(inventory.topology().parent(ENCLOSURE), HUB)
+
+if __name__ == "__main__":
+    unittest.main()
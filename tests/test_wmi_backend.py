@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import unittest
+
+from tests import BENCHMARKS
+from tests.support import ENCLOSURE, HUB, MISSING, SERIAL, STORAGE, FakeToolsTestCase
+
+from device_backend import device_exists, disable_device, find_devices_by_partial_id, get_device_state
+from device_inventory import DeviceInventory
+from device_state import DeviceState
+from wmi_backend import backend_name, select_backend, wmi_backend, wql_like_prefix, wql_string
+
+FAKE_WMI = os.path.join(BENCHMARKS, "fake_wmi")
+
+class WqlTest(unittest.TestCase):
+
+    def test_escaping(self):
+        self.assertEqual(wql_string("USB\\VID_1'2"), "'USB\\\\VID_1\\'2'")
+        self.assertEqual(wql_like_prefix("USB\\VID_174C&PID_1153"), "'USB\\\\VID[_]174C&PID[_]1153%'")
+        self.assertEqual(wql_like_prefix("A%B[C"), "'A[%]B[[]C%'")
+
+class WmiBackendTest(FakeToolsTestCase):
+    """使用假的 wmi 模块（benchmarks/fake_wmi）"""
+
+    def setUp(self):
+        super().setUp()
+        sys.path.insert(0, FAKE_WMI)
+        self.addCleanup(sys.path.remove, FAKE_WMI)
+
+    def use_wmi(self):
+        self.assertEqual(select_backend("wmi"), "wmi")
+        open(self.calls_path, "w").close()
+
+    def test_queries_do_not_spawn_pnputil(self):
+        self.use_wmi()
+        self.assertIs(get_device_state(ENCLOSURE).state, DeviceState.STARTED)
+        status = get_device_state(SERIAL)
+        self.assertEqual((status.state, status.problem_code), (DeviceState.PROBLEM, 43))
+        self.assertIs(get_device_state(STORAGE).state, DeviceState.DISABLED)
+        self.assertTrue(device_exists("USB\\VID_174C&PID_1153"))
+        self.assertFalse(device_exists(MISSING))
+        self.assertIn(ENCLOSURE, find_devices_by_partial_id("USB\\VID_174C&PID_1153"))
+        self.assertTrue(DeviceInventory().exists(ENCLOSURE))
+        self.assertEqual(self.calls("pnputil"), [])
+        self.assertTrue(self.calls("wmi"))
+
+    def test_control_results_are_visible(self):
+        self.use_wmi()
+        self.assertTrue(disable_device(ENCLOSURE))
+        self.assertIs(get_device_state(ENCLOSURE).state, DeviceState.DISABLED)
+
+    def test_topology_comes_from_pnputil_relations(self):
+        self.use_wmi()
+        inventory = DeviceInventory()
+        self.assertEqual(inventory.topology().parent(ENCLOSURE), HUB)
+        self.assertEqual(self.calls("pnputil"), ["pnputil /enum-devices /relations"])
+
+    def test_connection_failure_selects_pnputil(self):
+        os.environ["FAKE_WMI_FAIL"] = "1"
+        self.assertEqual(select_backend("auto"), "pnputil")
+        self.assertEqual(backend_name(), "pnputil")
+        self.assertIs(get_device_state(ENCLOSURE).state, DeviceState.STARTED)
+        self.assertTrue(self.calls("pnputil"))
+
+    def test_query_failures_fall_back_to_pnputil_and_recover(self):
+        self.use_wmi()
+        backend = wmi_backend()
+        backend.breaker.base_delay = 0.2
+        flag = os.path.join(self.workdir, "wmi_fail")
+        open(flag, "w").close()
+        os.environ["FAKE_WMI_FAIL"] = flag
+
+        for _ in range(backend.breaker.failure_threshold + 1):
+            self.assertIs(get_device_state(STORAGE).state, DeviceState.DISABLED)
+        self.assertEqual(backend.breaker.state, "open")
+        # 熔断器打开后不再查询WMI，直接使用pnputil
+        queries = [call for call in self.calls("wmi") if call.startswith("wmi query")]
+        self.assertEqual(len(queries), backend.breaker.failure_threshold)
+        self.assertTrue(self.calls("pnputil"))
+        self.assertTrue(DeviceInventory().exists(ENCLOSURE))
+
+        os.remove(flag)
+        time.sleep(0.25)
+        open(self.calls_path, "w").close()
+        self.assertIs(get_device_state(STORAGE).state, DeviceState.DISABLED)
+        self.assertEqual(backend.breaker.state, "closed")
+        self.assertEqual(self.calls("pnputil"), [])
+
+if __name__ == "__main__":
+    unittest.main()
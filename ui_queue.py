@@ -0,0 +1,84 @@
+"""后台线程到界面线程的更新队列：后台线程只提交更新，界面线程每帧执行一次队列中的所有更新
+
+带键的更新（例如同一设备的状态结果）在执行之前被新的更新替换，一帧之内只执行最新的一个
+"""
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+class UiUpdateQueue:
+    """线程安全的界面更新队列，post()/post_latest() 可以在任何线程中调用，drain() 只在界面线程中调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 待执行的 [键, 函数, 参数, 版本]，被替换的项函数置为None
+        self._pending = deque()
+        # 键 -> 队列中该键的项
+        self._keyed = {}
+        self.posted = 0
+        self.coalesced = 0
+        self.applied = 0
+
+    def post(self, fn, *args):
+        """提交一个更新，按提交顺序执行"""
+        with self._lock:
+            self._pending.append([None, fn, args, None])
+            self.posted += 1
+
+    def post_latest(self, key, fn, *args, version=None):
+        """提交一个带键的更新，替换队列中尚未执行的同键更新（新的更新排在队尾）
+
+        给出 version（例如查询序号）时，比队列中同键更新的版本旧的更新直接丢弃，
+        避免后提交的旧结果替换较新的结果
+        """
+        with self._lock:
+            self.posted += 1
+            previous = self._keyed.get(key)
+            if previous is not None:
+                self.coalesced += 1
+                metrics.increment("ui_updates_coalesced_total")
+                if version is not None and previous[3] is not None and version < previous[3]:
+                    return
+                previous[1] = None
+            entry = [key, fn, args, version]
+            self._pending.append(entry)
+            self._keyed[key] = entry
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for entry in self._pending if entry[1] is not None)
+
+    def drain(self):
+        """执行调用时已在队列中的所有更新（执行期间提交的更新留到下一帧），返回执行的数量
+
+        单个更新出错不影响其余的更新
+        """
+        with self._lock:
+            entries = self._pending
+            self._pending = deque()
+            self._keyed = {}
+        if not entries:
+            return 0
+
+        applied = 0
+        start = time.perf_counter()
+        for _, fn, args, _ in entries:
+            if fn is None:
+                continue
+            applied += 1
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"界面更新出错: {e!r}")
+        metrics.observe("ui_drain_seconds", time.perf_counter() - start)
+        with self._lock:
+            self.applied += applied
+        return applied
+
+    def stats(self):
+        """{"posted", "coalesced", "applied", "pending"}"""
+        with self._lock:
+            return {"posted": self.posted, "coalesced": self.coalesced, "applied": self.applied,
+                    "pending": sum(1 for entry in self._pending if entry[1] is not None)}
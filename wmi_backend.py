@@ -0,0 +1,198 @@
+"""进程内的WMI设备查询后端（Win32_PnPEntity），枚举和查询设备不再启动pnputil进程
+
+启动时按能力检测选择后端：能导入 wmi 模块并且试探查询成功时使用WMI，否则使用pnputil。
+WMI调用出错（或连续出错后被熔断器暂停）时由调用方回退到原来的pnputil/devcon路径。
+WMI不提供设备的父子关系，设备关系仍由pnputil /relations 枚举得到；启用/禁用仍使用pnputil/devcon
+
+后端接口（pnputil路径由 device_backend 和 device_inventory 中原有的函数实现）：
+    enumerate()               所有设备的记录列表
+    query(device_id)          单个设备的记录，不存在时为None
+    find_by_vid_pid(vid, pid) 指定VID/PID的USB设备记录列表
+    usb_devices()             已连接的USB设备记录列表
+"""
+import os
+import threading
+import time
+
+from command_runner import BackendUnavailable, CircuitBreaker
+from device_index import extract_vid_pid
+from device_state import DeviceState
+from metrics import metrics
+from pnputil_parser import DeviceRecord
+
+# 使用的后端：auto（默认，能用WMI时使用WMI）、wmi 或 pnputil，可通过环境变量或config.json中的 "backend" 修改
+BACKEND_ENV = "DMCONTROL_BACKEND"
+BACKENDS = ("auto", "wmi", "pnputil")
+
+FIELDS = "PNPDeviceID, Name, Description, PNPClass, Status, ConfigManagerErrorCode"
+
+# ConfigManagerErrorCode 中表示设备状态的代码，其余非零代码为设备问题
+CM_PROB_DISABLED = 22
+CM_PROB_PHANTOM = 45
+
+class WmiError(Exception):
+    """WMI查询失败（连接失败、COM错误或熔断器打开），调用方应回退到pnputil"""
+
+def wql_string(value):
+    """WQL字符串字面量（反斜杠和单引号需要转义）"""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+def wql_like_prefix(value):
+    """匹配以 value 开头的 LIKE 模式（_、%、[ 在LIKE中是通配符，需要放在方括号中）"""
+    escaped = "".join(f"[{c}]" if c in "_%[" else c for c in value)
+    return wql_string(escaped + "%")
+
+def _device_state(error_code):
+    """由 ConfigManagerErrorCode 得到 (设备状态, 问题代码)"""
+    if error_code is None:
+        return DeviceState.UNKNOWN, None
+    if error_code == 0:
+        return DeviceState.STARTED, None
+    if error_code == CM_PROB_DISABLED:
+        return DeviceState.DISABLED, None
+    if error_code == CM_PROB_PHANTOM:
+        return DeviceState.DISCONNECTED, None
+    return DeviceState.PROBLEM, error_code
+
+def to_record(entity):
+    """把 Win32_PnPEntity 对象转换为与pnputil输出相同的设备记录"""
+    error_code = entity.ConfigManagerErrorCode
+    state, problem_code = _device_state(None if error_code is None else int(error_code))
+    return DeviceRecord(instance_id=entity.PNPDeviceID or "",
+                        description=entity.Name or entity.Description or "",
+                        class_name=entity.PNPClass or "",
+                        status=entity.Status or "",
+                        state=state, problem_code=problem_code)
+
+class WmiBackend:
+    """通过 Win32_PnPEntity 查询设备
+
+    每个线程使用一个WMI连接并重复使用（COM对象不能在线程之间共用）；连续出错时熔断器打开，
+    等待期间直接抛出 WmiError
+    """
+
+    name = "wmi"
+
+    def __init__(self, module):
+        # wmi 模块（测试时可以是假的模块）
+        self._module = module
+        self._local = threading.local()
+        self.breaker = CircuitBreaker("wmi")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # 只在真正使用WMI时才导入pywin32，使用pnputil后端时不增加启动时间
+            try:
+                import pythoncom
+            except ImportError:
+                pass
+            else:
+                pythoncom.CoInitialize()
+            connection = self._local.connection = self._module.WMI()
+            metrics.increment("wmi_connections_total")
+        return connection
+
+    def _query(self, kind, where=""):
+        """执行一次查询，返回设备记录列表"""
+        try:
+            self.breaker.check()
+        except BackendUnavailable as e:
+            raise WmiError(str(e)) from e
+
+        wql = f"SELECT {FIELDS} FROM Win32_PnPEntity" + (f" WHERE {where}" if where else "")
+        metrics.increment("wmi_queries_total", kind=kind)
+        start = time.perf_counter()
+        try:
+            records = [to_record(entity) for entity in self._connection().query(wql)]
+        except Exception as e:
+            # COM错误的类型取决于pywin32，统一转换；连接可能已经失效，下次重新连接
+            self._local.connection = None
+            self.breaker.record_failure()
+            metrics.increment("wmi_failures_total", kind=kind)
+            raise WmiError(f"WMI查询失败: {e}") from e
+        finally:
+            metrics.observe("command_duration_seconds", time.perf_counter() - start, tool="wmi", kind=kind)
+        self.breaker.record_success()
+        return records
+
+    def probe(self):
+        """试探查询（根设备一定存在），失败时抛出 WmiError"""
+        self._query("probe", "PNPDeviceID = " + wql_string("HTREE\\ROOT\\0"))
+
+    def enumerate(self):
+        return self._query("enumerate")
+
+    def query(self, device_id):
+        """按实例ID查询设备，找不到时与 pnputil /deviceid 一样按实例ID前缀匹配"""
+        device_id = device_id.strip('"\'').strip()
+        records = self._query("query", "PNPDeviceID = " + wql_string(device_id))
+        if not records:
+            records = [record for record in self._query("query", "PNPDeviceID LIKE " + wql_like_prefix(device_id))
+                       if record.instance_id.upper().startswith((device_id.upper() + "\\", device_id.upper() + "&"))]
+        return records[0] if records else None
+
+    def find_by_vid_pid(self, vid, pid):
+        prefix = f"USB\\VID_{vid}&PID_{pid}"
+        return [record for record in self._query("find", "PNPDeviceID LIKE " + wql_like_prefix(prefix))
+                if extract_vid_pid(record.instance_id) == (vid, pid)]
+
+    def usb_devices(self):
+        return [record for record in self._query("list", "PNPDeviceID LIKE " + wql_like_prefix("USB\\VID_"))
+                if record.state is not DeviceState.DISCONNECTED]
+
+_lock = threading.Lock()
+_preference = None
+_selected = None
+_selection_done = False
+
+def _probe_wmi():
+    """能导入 wmi 模块并且试探查询成功时返回 WmiBackend，否则返回None"""
+    try:
+        import wmi
+    except ImportError:
+        return None
+    backend = WmiBackend(wmi)
+    try:
+        backend.probe()
+    except WmiError:
+        return None
+    return backend
+
+def _select(preference):
+    """按配置和能力检测选择后端，调用方需持有锁"""
+    global _selected, _selection_done
+    preference = (preference or _preference or os.environ.get(BACKEND_ENV) or "auto").lower()
+    backend = None if preference == "pnputil" else _probe_wmi()
+    if backend is None and preference == "wmi":
+        print("配置要求使用WMI，但WMI不可用，使用pnputil")
+    _selected = backend
+    _selection_done = True
+    name = "pnputil" if backend is None else backend.name
+    metrics.increment("backend_selected_total", backend=name)
+    return name
+
+def set_backend_preference(preference):
+    """设置使用的后端（例如config.json中的 "backend"），下一次使用后端时重新检测"""
+    global _preference, _selection_done
+    with _lock:
+        _preference = preference
+        _selection_done = False
+
+def select_backend(preference=None):
+    """立即检测并选择后端，返回实际使用的后端名称（"wmi" 或 "pnputil"）
+
+    preference 为None时使用 set_backend_preference() 的设置或环境变量 DMCONTROL_BACKEND，默认为 auto
+    """
+    with _lock:
+        return _select(preference)
+
+def wmi_backend():
+    """当前使用的WMI后端，使用pnputil时返回None；第一次调用时检测（检测期间其他线程等待）"""
+    with _lock:
+        if not _selection_done:
+            _select(None)
+        return _selected
+
+def backend_name():
+    return "pnputil" if wmi_backend() is None else "wmi"